@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Measure DOT building time and peak memory for a wide synthetic table.
+
+Compares the old `cols_html +=` / line-list builder with the streaming
+DotWriter, both into an in-memory buffer and straight into a file (which
+is what piping into `dot` stdin looks like from Python's side).
+
+Usage:
+    python scripts/bench_dot_writer.py
+    python scripts/bench_dot_writer.py --columns 5000 --repeat 5
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from dot_writer import DotWriter
+from generate_bq_erd import build_table_dot, write_table_dot
+
+
+def legacy_table_dot(table_name, columns, is_fact=False):
+    """The pre-DotWriter builder, kept here as the reference."""
+    header_color, bg_color = ("#FFD700", "#FFFACD") if is_fact else ("#87CEEB", "#E6F3FF")
+    dot_lines = [
+        'digraph table_schema {',
+        '  graph [rankdir=TB];',
+        '  node [shape=none, fontname="Helvetica", fontsize=11];',
+        ''
+    ]
+    cols_html = ""
+    for col in columns:
+        nullable = "NULL" if col["nullable"] else "NOT NULL"
+        cols_html += f'<TR><TD ALIGN="LEFT">{col["name"]}</TD><TD ALIGN="LEFT">{col["type"]}</TD><TD ALIGN="LEFT">{nullable}</TD></TR>'
+    dot_lines.append(f'  {table_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0" BGCOLOR="{bg_color}">')
+    dot_lines.append(f'    <TR><TD COLSPAN="3" BGCOLOR="{header_color}"><B>{table_name}</B></TD></TR>')
+    dot_lines.append('    <TR><TD BGCOLOR="#DDDDDD"><B>Column</B></TD><TD BGCOLOR="#DDDDDD"><B>Type</B></TD><TD BGCOLOR="#DDDDDD"><B>Nullable</B></TD></TR>')
+    dot_lines.append(f'    {cols_html}')
+    dot_lines.append('  </TABLE>>];')
+    dot_lines.append('}')
+    return "\n".join(dot_lines)
+
+
+def stream_table_to_file(table_name, columns, path=os.devnull):
+    with open(path, "w", encoding="utf-8") as f:
+        writer = DotWriter(f)
+        write_table_dot(writer, table_name, columns)
+    return writer.chars_written
+
+
+def measure(fn, *args, repeat=3):
+    """Return (best seconds, peak traced bytes) for fn(*args)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOT building for wide tables")
+    parser.add_argument("--columns", type=int, default=5000, help="Columns in the synthetic table")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    columns = [
+        {"name": f"denormalized_attribute_{i:05d}", "type": "STRING" if i % 3 else "INT64", "nullable": i % 7 != 0}
+        for i in range(args.columns)
+    ]
+    table_name = "fact_wide_synthetic"
+
+    if legacy_table_dot(table_name, columns) != build_table_dot(table_name, columns):
+        raise AssertionError("DotWriter output differs from the legacy builder")
+
+    size = len(build_table_dot(table_name, columns))
+    print(f"{args.columns} columns, {size / 1024:.0f} KiB of DOT\n")
+    print(f"{'builder':<28} {'time':>10} {'peak memory':>12}")
+    for label, fn in [
+        ("legacy += / join", legacy_table_dot),
+        ("DotWriter -> StringIO", build_table_dot),
+        ("DotWriter -> file", stream_table_to_file),
+    ]:
+        seconds, peak = measure(fn, table_name, columns, repeat=args.repeat)
+        print(f"{label:<28} {seconds * 1000:>8.1f}ms {peak / 1024:>9.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the ERD generators across schema sizes.
+
+Synthesizes BigQuery DDL shaped like Netflix_BigQuery_DDL.sql (dimensions
+with a `<x>_key` PK, facts with role-playing date keys and `<role>_<x>_key`
+FKs, a long tail of wide tables) for every size, then times each phase
+separately, best of --repeat runs:
+
+    schema_load    parse_ddl() + schema_to_tables()
+    quickdbd       generate_quickdbd_format()
+    descriptions   generate_bq_erd_descriptions()
+    dot_build      full ERD + star DOT of both scripts, plus generate_bq_erd table DOTs
+    fk_inference   build_fk_index() + the star relations generate_star_erd() draws
+    render         the first --render-limit star diagrams (skipped above --render-max-tables)
+
+Sizes are TABLESxMAX_COLUMNS; column counts per table run from 10 up to
+MAX_COLUMNS, most tables narrow. Results are written as JSON; --baseline
+compares the run with stored results and exits with status 1 when any
+phase is slower than --max-slowdown times its baseline.
+
+Usage:
+    python scripts/bench_erd_suite.py                                # default sizes, print only
+    python scripts/bench_erd_suite.py --save-baseline                # store bench_results/erd_baseline.json
+    python scripts/bench_erd_suite.py --baseline --max-slowdown 1.3  # fail on a >30% slowdown
+    python scripts/bench_erd_suite.py --sizes 30x40 10000x2000 --output run.json
+    python scripts/bench_erd_suite.py --compare old.json new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from ddl_parser import parse_ddl, schema_to_tables
+from dot_writer import dot_to_string
+from erd_render import RENDER_BACKENDS, render_many, resolve_backend
+from generate_bq_erd import build_fk_index, build_full_dot, build_star_dot, build_table_dot
+from generate_erd import build_star_schema_dot, generate_bq_erd_descriptions, generate_quickdbd_format, write_erd_dot
+
+DEFAULT_SIZES = ["30x40", "250x200", "1000x500"]
+PHASES = ["schema_load", "quickdbd", "descriptions", "dot_build", "fk_inference", "render"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results", "erd_baseline.json")
+MIN_COLUMNS = 10
+
+
+def parse_size(text):
+    """"1000x500" -> (1000, 500)."""
+    tables, _, columns = text.lower().partition("x")
+    return int(tables), int(columns or MIN_COLUMNS)
+
+
+def synthetic_ddl(table_count, max_columns, seed=42, dim_share=0.4, fks_per_fact=10):
+    """CREATE TABLE statements for a SCHEMA-shaped warehouse of table_count tables."""
+    rng = random.Random(seed)
+    dim_count = max(1, int(table_count * dim_share))
+    fact_count = max(1, table_count - dim_count)
+
+    def width():
+        # Long tail: most tables stay narrow, a few approach max_columns
+        return MIN_COLUMNS + int((max_columns - MIN_COLUMNS) * rng.random() ** 6)
+
+    statements = []
+    statements.append(
+        "CREATE TABLE IF NOT EXISTS `YOUR_PROJECT.YOUR_DATASET.dim_date` (\n"
+        "  date_key INT64 NOT NULL,\n  calendar_date DATE NOT NULL,\n  year INT64,\n  month INT64\n);"
+    )
+    entities = [f"entity{i}" for i in range(dim_count - 1)]
+    for entity in entities:
+        columns = [f"  {entity}_key INT64 NOT NULL", f"  {entity}_id STRING NOT NULL"]
+        columns += [f"  attr_{j} STRING" for j in range(width() - len(columns))]
+        statements.append(f"CREATE TABLE IF NOT EXISTS `YOUR_PROJECT.YOUR_DATASET.dim_{entity}` (\n"
+                          + ",\n".join(columns) + "\n);")
+
+    for i in range(fact_count):
+        columns = [f"  fact{i}_id STRING NOT NULL", "  event_date DATE NOT NULL", "  event_date_key INT64 NOT NULL"]
+        if rng.random() < 0.3:
+            columns.append("  end_date_key INT64")
+        for entity in rng.sample(entities, min(fks_per_fact, len(entities))):
+            role = f"role{rng.randint(0, 3)}_" if rng.random() < 0.3 else ""
+            columns.append(f"  {role}{entity}_key INT64")
+        columns += [f"  measure_{j} NUMERIC" for j in range(max(1, width() - len(columns)))]
+        statements.append(f"CREATE TABLE IF NOT EXISTS `YOUR_PROJECT.YOUR_DATASET.fact_{i:05d}` (\n"
+                          + ",\n".join(columns) + "\n)\nPARTITION BY event_date;")
+
+    return "\n\n".join(statements)
+
+
+def load_schema(ddl):
+    """Both scripts' schema shapes from DDL text: (SCHEMA dict, generate_bq_erd tables)."""
+    schema = parse_ddl(ddl)
+    return schema, schema_to_tables(schema)
+
+
+def best_of(repeat, fn, *args):
+    """Return (best seconds, last result) over repeat calls of fn(*args)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def build_all_dots(schema, tables, fk_index):
+    """Every DOT source both scripts build for a run; returns total characters."""
+    chars = len(dot_to_string(write_erd_dot, schema))
+    for fact_name, fact_def in schema["facts"].items():
+        chars += len(build_star_schema_dot(fact_name, fact_def, schema)[0])
+    for table_name, columns in tables.items():
+        chars += len(build_table_dot(table_name, columns, table_name.startswith("fact_")))
+    for fact_name, columns in tables.items():
+        if fact_name.startswith("fact_"):
+            chars += len(build_star_dot(fact_name, columns, tables, fk_index)[0])
+    return chars + len(build_full_dot(tables, fk_index))
+
+
+def infer_relations(tables):
+    """FK inference as generate_star_erd() runs it: one index, then per-fact lookups."""
+    fk_index = build_fk_index(tables)
+    return sum(
+        1 for name, columns in tables.items() if name.startswith("fact_")
+        for c in columns if c["name"] in fk_index
+    )
+
+
+def render_stars(tables, limit, backend):
+    """Render the first `limit` star diagrams into a temp dir; returns the failure count."""
+    fk_index = build_fk_index(tables)
+    facts = [name for name in tables if name.startswith("fact_")][:limit]
+    with tempfile.TemporaryDirectory() as output_dir:
+        jobs = [(os.path.join(output_dir, name), build_star_dot(name, tables[name], tables, fk_index)[0])
+                for name in facts]
+        return sum(1 for _, error in render_many(jobs, backend=backend) if error)
+
+
+def run_size(size, args):
+    """Time every phase for one TABLESxMAX_COLUMNS size. Returns its JSON entry."""
+    table_count, max_columns = parse_size(size)
+    ddl = synthetic_ddl(table_count, max_columns, args.seed)
+
+    phases = {}
+    phases["schema_load"], (schema, tables) = best_of(args.repeat, load_schema, ddl)
+    phases["quickdbd"], _ = best_of(args.repeat, generate_quickdbd_format, schema)
+    phases["descriptions"], _ = best_of(args.repeat, generate_bq_erd_descriptions, schema)
+    fk_index = build_fk_index(tables)
+    phases["dot_build"], dot_chars = best_of(args.repeat, build_all_dots, schema, tables, fk_index)
+    phases["fk_inference"], relations = best_of(args.repeat, infer_relations, tables)
+
+    if args.backend is not None and table_count <= args.render_max_tables:
+        phases["render"], failures = best_of(args.repeat, render_stars, tables, args.render_limit, args.backend)
+        if failures:
+            print(f"  {size}: {failures} star diagram(s) failed to render")
+
+    return {
+        "tables": len(tables),
+        "columns": sum(len(columns) for columns in tables.values()),
+        "relations": relations,
+        "dot_chars": dot_chars,
+        "phases": phases,
+    }
+
+
+def print_results(results):
+    print(f"{'size':>12} {'tables':>7} {'columns':>9}" + "".join(f"{p:>14}" for p in PHASES))
+    for size, entry in results.items():
+        cells = "".join(
+            f"{entry['phases'][p] * 1000:>12.1f}ms" if p in entry["phases"] else f"{'-':>14}" for p in PHASES
+        )
+        print(f"{size:>12} {entry['tables']:>7} {entry['columns']:>9}{cells}")
+
+
+def compare(baseline, current, max_slowdown, min_seconds):
+    """
+    Print current vs baseline per size and phase. Returns the regressions:
+    phases slower than max_slowdown x baseline, ignoring phases whose
+    baseline is under min_seconds (timer noise).
+    """
+    regressions = []
+    print(f"{'size':>12} {'phase':<14} {'baseline':>11} {'current':>11} {'ratio':>7}")
+    for size, entry in current["results"].items():
+        base_entry = baseline["results"].get(size)
+        if base_entry is None:
+            print(f"{size:>12} (not in baseline)")
+            continue
+        for phase in PHASES:
+            if phase not in entry["phases"] or phase not in base_entry["phases"]:
+                continue
+            old, new = base_entry["phases"][phase], entry["phases"][phase]
+            ratio = new / old if old else float("inf")
+            flag = ""
+            if ratio > max_slowdown and old >= min_seconds:
+                regressions.append((size, phase, ratio))
+                flag = "  REGRESSION"
+            print(f"{size:>12} {phase:<14} {old * 1000:>9.1f}ms {new * 1000:>9.1f}ms {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ERD generators across schema sizes")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="TABLESxMAX_COLUMNS, e.g. 30x40 10000x2000")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per phase (best is kept)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for synthetic schemas")
+    parser.add_argument("--render-backend", choices=["auto", "none", *RENDER_BACKENDS], default="auto",
+                        help="Backend for the render phase (none skips it)")
+    parser.add_argument("--render-limit", type=int, default=10, help="Star diagrams rendered per size")
+    parser.add_argument("--render-max-tables", type=int, default=1000, help="Skip the render phase above this many tables")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Store results as the baseline")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, help="Compare the run against a baseline JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two result files without running")
+    parser.add_argument("--max-slowdown", type=float, default=1.25, help="Fail when a phase takes longer than this x baseline")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="Never fail phases whose baseline is below this")
+    args = parser.parse_args()
+
+    missing = [path for path in (args.compare or []) + [args.baseline]
+               if path and path != args.save_baseline and not os.path.exists(path)]
+    if missing:
+        print(f"Error: {missing[0]} not found (store one first with --save-baseline or --output)")
+        sys.exit(1)
+
+    if args.compare:
+        regressions = compare(load_results(args.compare[0]), load_results(args.compare[1]),
+                              args.max_slowdown, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} phase(s) slower than {args.max_slowdown:g}x baseline")
+            sys.exit(1)
+        return
+
+    args.backend = None if args.render_backend == "none" else resolve_backend(args.render_backend)
+    if args.backend == "subprocess" and shutil.which("dot") is None:
+        print("Render phase skipped: dot binary not found (or pip install pygraphviz)")
+        args.backend = None
+
+    results = {
+        "suite": "erd",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "render_backend": args.backend,
+        "results": {},
+    }
+    for size in args.sizes:
+        results["results"][size] = run_size(size, args)
+    print_results(results["results"])
+
+    if args.output:
+        save_results(args.output, results)
+        print(f"\nResults saved to {args.output}")
+    if args.save_baseline:
+        save_results(args.save_baseline, results)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if args.baseline:
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(load_results(args.baseline), results, args.max_slowdown, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} phase(s) slower than {args.max_slowdown:g}x baseline")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
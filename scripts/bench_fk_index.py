@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark FK inference in generate_bq_erd on synthetic datasets.
+
+Compares the per-diagram nested dimension scan that build_star_dot and
+build_full_dot used to run against one shared build_fk_index() per run.
+Both approaches must infer exactly the same relationships.
+
+Usage:
+    python scripts/bench_fk_index.py
+    python scripts/bench_fk_index.py --sizes 100 1000 2000 --seed 7
+"""
+
+import argparse
+import random
+import time
+
+from generate_bq_erd import build_fk_index
+
+
+def synthetic_tables(table_count, seed=42, dim_share=0.4, cols_per_dim=12, fks_per_fact=10):
+    """Build a fetch_bq_schemas()-shaped dataset with roughly table_count tables."""
+    rng = random.Random(seed)
+    dim_count = max(1, int(table_count * dim_share))
+    fact_count = max(1, table_count - dim_count)
+
+    tables = {}
+    dim_names = [f"dim_entity{i}" for i in range(dim_count)]
+    for dim_name in dim_names:
+        key = dim_name.replace("dim_", "") + "_key"
+        columns = [{"name": key, "type": "INT64", "nullable": False}]
+        columns += [{"name": f"attr_{j}", "type": "STRING", "nullable": True} for j in range(cols_per_dim)]
+        tables[dim_name] = columns
+
+    for i in range(fact_count):
+        columns = [{"name": f"fact{i}_id", "type": "STRING", "nullable": False}]
+        for dim_name in rng.sample(dim_names, min(fks_per_fact, dim_count)):
+            key = dim_name.replace("dim_", "") + "_key"
+            # Mix plain, role-playing and unmatched key columns
+            roll = rng.random()
+            if roll < 0.6:
+                name = key
+            elif roll < 0.9:
+                name = f"role{rng.randint(0, 3)}_{key}"
+            else:
+                name = f"orphan{rng.randint(0, 99)}_ref_key"
+            columns.append({"name": name, "type": "INT64", "nullable": True})
+        columns += [{"name": f"measure_{j}", "type": "NUMERIC", "nullable": True} for j in range(5)]
+        tables[f"fact_{i:05d}"] = columns
+
+    return dict(sorted(tables.items()))
+
+
+def legacy_star_relations(fact_columns, all_tables):
+    """The original per-star nested scan, kept here as the reference."""
+    relations = []
+    for col in fact_columns:
+        col_name = col["name"]
+        if col_name.endswith("_key"):
+            for dim_name in all_tables.keys():
+                if dim_name.startswith("dim_"):
+                    dim_suffix = dim_name.replace("dim_", "") + "_key"
+                    if col_name == dim_suffix or col_name.endswith(f"_{dim_suffix}"):
+                        relations.append((col_name, dim_name))
+                        break
+                    if col_name in [c["name"] for c in all_tables[dim_name]]:
+                        relations.append((col_name, dim_name))
+                        break
+    return relations
+
+
+def indexed_star_relations(fact_columns, fk_index):
+    return [(c["name"], fk_index[c["name"]]) for c in fact_columns if c["name"] in fk_index]
+
+
+def run(table_count, seed):
+    tables = synthetic_tables(table_count, seed)
+    facts = {k: v for k, v in tables.items() if k.startswith("fact_")}
+
+    start = time.perf_counter()
+    legacy = {name: legacy_star_relations(cols, tables) for name, cols in facts.items()}
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fk_index = build_fk_index(tables)
+    indexed = {name: indexed_star_relations(cols, fk_index) for name, cols in facts.items()}
+    indexed_seconds = time.perf_counter() - start
+
+    if legacy != indexed:
+        raise AssertionError(f"FK index disagrees with nested scan at {table_count} tables")
+
+    edges = sum(len(r) for r in indexed.values())
+    return len(tables), edges, legacy_seconds, indexed_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FK inference for generate_bq_erd")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 250, 1000, 2000], help="Table counts")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for synthetic schemas")
+    args = parser.parse_args()
+
+    print(f"{'tables':>8} {'edges':>8} {'nested scan':>12} {'fk index':>10} {'speedup':>8}")
+    for size in args.sizes:
+        tables, edges, legacy_seconds, indexed_seconds = run(size, args.seed)
+        speedup = legacy_seconds / indexed_seconds if indexed_seconds else float("inf")
+        print(f"{tables:>8} {edges:>8} {legacy_seconds:>11.3f}s {indexed_seconds:>9.4f}s {speedup:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
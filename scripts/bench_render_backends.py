@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Compare render backends on the 43-diagram run of generate_bq_erd.py
+(30 tables, 12 stars, 1 full ERD) built from Netflix_BigQuery_DDL.sql.
+
+"subprocess" forks `dot` per diagram through a temp .gv file; "pygraphviz"
+lays out and renders in-process. The render cache is off so every diagram
+is really rendered.
+
+Usage:
+    python scripts/bench_render_backends.py
+    python scripts/bench_render_backends.py --repeat 5 --format svg --jobs 4
+
+Requires: pip install graphviz pygraphviz (and the dot binary)
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from ddl_parser import DEFAULT_DDL_PATH, load_ddl_schema, schema_to_tables
+from erd_render import RENDER_BACKENDS, backend_available, render_many
+from generate_bq_erd import build_fk_index, build_full_dot, build_star_dot, build_table_dot
+
+
+def build_jobs(tables):
+    """Return {section: [(name, dot_content)]} matching render_dataset()."""
+    fk_index = build_fk_index(tables)
+    sections = {"tables": [], "stars": [], "full": []}
+    for table_name, columns in sorted(tables.items()):
+        sections["tables"].append((table_name, build_table_dot(table_name, columns, table_name.startswith("fact_"))))
+        if table_name.startswith("fact_"):
+            dot_content, _ = build_star_dot(table_name, columns, tables, fk_index)
+            sections["stars"].append((f"star_{table_name}", dot_content))
+    sections["full"].append(("full_erd", build_full_dot(tables, fk_index)))
+    return sections
+
+
+def time_section(jobs, backend, output_format, workers):
+    """Render one section into a temp dir. Returns (seconds, failures)."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        render_jobs = [(os.path.join(output_dir, name), dot_content, output_format) for name, dot_content in jobs]
+        started = time.perf_counter()
+        failures = sum(1 for _, error in render_many(render_jobs, workers=workers, backend=backend) if error)
+        return time.perf_counter() - started, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ERD render backends")
+    parser.add_argument("--ddl", default=DEFAULT_DDL_PATH, help="BigQuery DDL file the diagrams are built from")
+    parser.add_argument("--backends", nargs="+", choices=list(RENDER_BACKENDS), default=list(RENDER_BACKENDS))
+    parser.add_argument("--format", default="png", help="Output format")
+    parser.add_argument("--jobs", type=int, default=1, help="Parallel renders (pygraphviz renders stay serialized)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend (best is reported)")
+    args = parser.parse_args()
+
+    sections = build_jobs(schema_to_tables(load_ddl_schema(args.ddl)))
+    total_diagrams = sum(len(jobs) for jobs in sections.values())
+    print(f"{total_diagrams} diagrams ({', '.join(f'{len(j)} {s}' for s, j in sections.items())}), "
+          f"format={args.format}, jobs={args.jobs}, best of {args.repeat}\n")
+
+    header = f"{'backend':<12}" + "".join(f"{s:>12}" for s in sections) + f"{'total':>12}{'per diagram':>14}"
+    print(header)
+    totals = {}
+    for backend in args.backends:
+        if not backend_available(backend):
+            print(f"{backend:<12} skipped (pip install {backend})")
+            continue
+        best = {}
+        for section, jobs in sections.items():
+            runs = []
+            for _ in range(args.repeat):
+                seconds, failures = time_section(jobs, backend, args.format, args.jobs)
+                if failures:
+                    raise SystemExit(f"{backend}: {failures} {section} diagram(s) failed to render")
+                runs.append(seconds)
+            best[section] = min(runs)
+        totals[backend] = sum(best.values())
+        print(f"{backend:<12}" + "".join(f"{best[s] * 1000:>10.0f}ms" for s in sections)
+              + f"{totals[backend] * 1000:>10.0f}ms{totals[backend] / total_diagrams * 1000:>12.1f}ms")
+
+    if len(totals) > 1 and "subprocess" in totals:
+        for backend, seconds in totals.items():
+            if backend != "subprocess":
+                print(f"\n{backend}: {totals['subprocess'] / seconds:.2f}x vs subprocess")
+
+
+if __name__ == "__main__":
+    main()
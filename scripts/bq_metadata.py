@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Arrow-based metadata and table-statistics harvesting for generate_bq_erd.py.
+
+Four INFORMATION_SCHEMA views are queried concurrently and decoded in bulk
+through Arrow (`QueryJob.to_arrow()`), not row by row:
+
+    COLUMNS         columns, types, partitioning column, clustering order
+    TABLE_OPTIONS   table options (partition expiration, require filter, ...)
+    PARTITIONS      partition count per table (aggregated in BigQuery)
+    TABLE_STORAGE   rows and logical/physical bytes (region-level view)
+
+decode_metadata() turns the results into the {table: columns} shape of
+fetch_bq_schemas() plus per-table stats that annotate the table and star
+diagrams (generate_bq_erd.py --stats). A view that fails (TABLE_STORAGE
+needs extra permissions) only drops its part of the stats.
+
+FixtureClient answers the same queries from Arrow files recorded with
+--record, so the harvest, decode and annotation path runs without BigQuery.
+
+Usage:
+    python scripts/bq_metadata.py --fixture scripts/fixtures/netflix_dw_metadata
+    python scripts/bq_metadata.py --project my-project --dataset netflix_dw --record scripts/fixtures/netflix_dw_metadata
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --stats
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --fixture scripts/fixtures/netflix_dw_metadata
+
+Requires: pip install google-cloud-bigquery pyarrow
+"""
+
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from dw_common import format_bytes, format_count
+from erd_profile import count, span
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "netflix_dw_metadata")
+FIXTURE_META = "fixture.json"
+
+METADATA_QUERIES = {
+    "COLUMNS": """
+    SELECT table_name, column_name, data_type, is_nullable, ordinal_position,
+           is_partitioning_column, clustering_ordinal_position
+    FROM `{project}.{dataset}.INFORMATION_SCHEMA.COLUMNS`
+    {columns_filter}
+    ORDER BY table_name, ordinal_position
+    """,
+    "TABLE_OPTIONS": """
+    SELECT table_name, option_name, option_value
+    FROM `{project}.{dataset}.INFORMATION_SCHEMA.TABLE_OPTIONS`
+    """,
+    "PARTITIONS": """
+    SELECT table_name, COUNTIF(partition_id IS NOT NULL AND partition_id != '__NULL__') AS partitions
+    FROM `{project}.{dataset}.INFORMATION_SCHEMA.PARTITIONS`
+    GROUP BY table_name
+    """,
+    "TABLE_STORAGE": """
+    SELECT table_name, total_rows, total_logical_bytes, total_physical_bytes
+    FROM `{project}.region-{region}.INFORMATION_SCHEMA.TABLE_STORAGE`
+    WHERE table_schema = '{dataset}' AND NOT deleted
+    """,
+}
+
+
+def decode_columns(arrow_table, group_by="table_name"):
+    """
+    Decode INFORMATION_SCHEMA.COLUMNS rows (in ordinal order) into
+    {table_name: [{"name", "type", "nullable"}]}; one to_pydict() call
+    instead of a Python row object per column.
+    """
+    data = arrow_table.to_pydict()
+    tables = {}
+    for table_name, name, data_type, nullable in zip(
+        data[group_by], data["column_name"], data["data_type"], data["is_nullable"]
+    ):
+        tables.setdefault(table_name, []).append({"name": name, "type": data_type, "nullable": nullable == "YES"})
+    return tables
+
+
+def table_names_job_config(table_names):
+    """
+    QueryJobConfig binding @table_names. Without google-cloud-bigquery (fake
+    clients) a plain object with the same query_parameters is returned.
+    """
+    values = sorted(table_names)
+    try:
+        from google.cloud import bigquery
+    except ImportError:
+        return SimpleNamespace(query_parameters=[SimpleNamespace(name="table_names", values=values)])
+    return bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter("table_names", "STRING", values)])
+
+
+def fetch_metadata(project_id, dataset_id, client, region=None, workers=4, table_names=None):
+    """
+    Run the METADATA_QUERIES concurrently. Returns ({view: pyarrow.Table},
+    {view: exception}) for the views that succeeded and failed.
+    `table_names` limits COLUMNS to those tables (incremental snapshot refresh).
+    """
+    if region is None:
+        region = client.get_dataset(f"{project_id}.{dataset_id}").location.lower()
+
+    job_config = None
+    columns_filter = ""
+    if table_names is not None:
+        columns_filter = "WHERE table_name IN UNNEST(@table_names)"
+        job_config = table_names_job_config(table_names)
+
+    def run(view):
+        sql = METADATA_QUERIES[view].format(project=project_id, dataset=dataset_id, region=region,
+                                            columns_filter=columns_filter)
+        with span("bq_query", view=view, dataset=dataset_id):
+            return client.query(sql, job_config=job_config if view == "COLUMNS" else None).to_arrow()
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {view: pool.submit(run, view) for view in METADATA_QUERIES}
+        for view, future in futures.items():
+            try:
+                results[view] = future.result()
+                count("bq_rows", results[view].num_rows)
+            except Exception as e:
+                errors[view] = e
+    return results, errors
+
+
+def decode_metadata(results, previous=None):
+    """
+    Decode fetch_metadata() results into (tables, stats). stats maps each
+    table to {"rows", "logical_bytes", "physical_bytes", "partitions",
+    "partition_by", "cluster_by", "options"}; values a failed view would
+    have supplied stay None (or empty).
+
+    `previous` ({table: stats entry}) covers tables left out of COLUMNS by
+    table_names: their partition/cluster keys carry over, and the size
+    views refresh the rest.
+    """
+    columns = results["COLUMNS"].to_pydict()
+    tables = decode_columns(results["COLUMNS"])
+    stats = {name: dict(entry, options=dict(entry.get("options") or {}))
+             for name, entry in (previous or {}).items() if name not in tables}
+    stats.update({
+        name: {"rows": None, "logical_bytes": None, "physical_bytes": None, "partitions": None,
+               "partition_by": None, "cluster_by": [], "options": {}}
+        for name in tables
+    })
+
+    clustering = {}
+    for table_name, name, partitioning, cluster_pos in zip(
+        columns["table_name"], columns["column_name"],
+        columns["is_partitioning_column"], columns["clustering_ordinal_position"]
+    ):
+        if partitioning == "YES":
+            stats[table_name]["partition_by"] = name
+        if cluster_pos is not None:
+            clustering.setdefault(table_name, []).append((cluster_pos, name))
+    for table_name, keys in clustering.items():
+        stats[table_name]["cluster_by"] = [name for _, name in sorted(keys)]
+
+    if "TABLE_OPTIONS" in results:
+        for entry in stats.values():
+            entry["options"] = {}
+        data = results["TABLE_OPTIONS"].to_pydict()
+        for table_name, option, value in zip(data["table_name"], data["option_name"], data["option_value"]):
+            if table_name in stats:
+                stats[table_name]["options"][option] = value
+
+    if "PARTITIONS" in results:
+        data = results["PARTITIONS"].to_pydict()
+        for table_name, partitions in zip(data["table_name"], data["partitions"]):
+            if table_name in stats:
+                stats[table_name]["partitions"] = partitions
+
+    if "TABLE_STORAGE" in results:
+        data = results["TABLE_STORAGE"].to_pydict()
+        for table_name, rows, logical, physical in zip(
+            data["table_name"], data["total_rows"], data["total_logical_bytes"], data["total_physical_bytes"]
+        ):
+            if table_name in stats:
+                stats[table_name].update(rows=rows, logical_bytes=logical, physical_bytes=physical)
+
+    return tables, stats
+
+
+def harvest_metadata(project_id, dataset_id, client, region=None, workers=4, table_names=None, previous=None):
+    """fetch_metadata() + decode_metadata(). Returns (tables, stats, {view: error})."""
+    results, errors = fetch_metadata(project_id, dataset_id, client, region, workers, table_names)
+    if "COLUMNS" not in results:
+        raise errors["COLUMNS"]
+    with span("decode_metadata", dataset=dataset_id):
+        tables, stats = decode_metadata(results, previous)
+    return tables, stats, errors
+
+
+def ddl_stats(schema):
+    """Partition and cluster keys from a DDL-parsed SCHEMA dict, in the stats shape (no sizes)."""
+    stats = {}
+    for section in ("dimensions", "facts"):
+        for table_name, table_def in schema[section].items():
+            stats[table_name] = {
+                "rows": None, "logical_bytes": None, "physical_bytes": None, "partitions": None,
+                "partition_by": table_def.get("partition_by"), "cluster_by": table_def.get("cluster_by", []),
+                "options": {},
+            }
+    return stats
+
+
+def stats_lines(entry):
+    """Short annotation lines for one table: size first, then layout keys."""
+    if not entry:
+        return []
+    lines = []
+    size = []
+    if entry.get("rows") is not None:
+        size.append(f"{format_count(entry['rows'])} rows")
+    if entry.get("logical_bytes") is not None:
+        size.append(format_bytes(entry["logical_bytes"]))
+    if size:
+        lines.append(", ".join(size))
+    if entry.get("partition_by"):
+        partitions = entry.get("partitions")
+        required = (entry.get("options") or {}).get("require_partition_filter") == "true"
+        lines.append(f"PARTITION BY {entry['partition_by']}" + (f" ({partitions:,})" if partitions else "")
+                     + (", filter required" if required else ""))
+    if entry.get("cluster_by"):
+        lines.append(f"CLUSTER BY {', '.join(entry['cluster_by'])}")
+    return lines
+
+
+def stats_rows(entry, colspan=2):
+    """stats_lines() as <TR> header rows for DotWriter.table_node()."""
+    return [
+        f'<TR><TD COLSPAN="{colspan}" ALIGN="LEFT"><FONT POINT-SIZE="9" COLOR="#555555">{line}</FONT></TD></TR>'
+        for line in stats_lines(entry)
+    ]
+
+
+class FixtureJob:
+    """Query job over an Arrow table, for FixtureClient and other fake clients."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def to_arrow(self, **kwargs):
+        return self.table
+
+    def result(self):
+        return [SimpleNamespace(**row) for row in self.table.to_pylist()]
+
+
+class FixtureClient:
+    """
+    Stand-in for bigquery.Client that answers INFORMATION_SCHEMA queries from
+    Arrow files recorded by record_fixture(), one <VIEW>.arrow per view.
+    __TABLES__ reports every recorded table as modified at recorded_at;
+    change `modified` ({table: epoch ms}) to replay later runs. Each query's
+    view is appended to `queries`.
+    """
+
+    def __init__(self, path=DEFAULT_FIXTURE_DIR):
+        import pyarrow.feather as feather
+
+        with open(os.path.join(path, FIXTURE_META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.project = self.meta["project"]
+        self.tables = {
+            view: feather.read_table(os.path.join(path, f"{view}.arrow"))
+            for view in self.meta["views"]
+        }
+        recorded = datetime.fromisoformat(self.meta.get("recorded_at", "1970-01-01T00:00:00+00:00"))
+        self.modified = dict.fromkeys(sorted(set(self.tables["COLUMNS"]["table_name"].to_pylist())),
+                                      int(recorded.timestamp() * 1000))
+        self.queries = []
+
+    def get_dataset(self, ref):
+        return SimpleNamespace(dataset_id=self.meta["dataset"], location=self.meta["location"])
+
+    def query(self, sql, job_config=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if "__TABLES__" in sql:
+            self.queries.append("__TABLES__")
+            return FixtureJob(pa.table({"table_id": list(self.modified),
+                                        "last_modified_time": list(self.modified.values())}))
+        match = re.search(r"INFORMATION_SCHEMA\.(\w+)", sql)
+        view = match.group(1) if match else None
+        self.queries.append(view)
+        if view not in self.tables:
+            raise RuntimeError(f"fixture has no recording for INFORMATION_SCHEMA.{view}")
+        table = self.tables[view]
+        # fetch_bq_schemas() narrows COLUMNS to changed tables with @table_names
+        for param in getattr(job_config, "query_parameters", None) or []:
+            if param.name == "table_names":
+                table = table.filter(pc.is_in(table["table_name"], value_set=pc.cast(param.values, "string")))
+        return FixtureJob(table)
+
+
+def record_fixture(results, path, project_id, dataset_id, location):
+    """Write fetch_metadata() results as a fixture FixtureClient can serve."""
+    import pyarrow.feather as feather
+
+    os.makedirs(path, exist_ok=True)
+    for view, table in results.items():
+        feather.write_feather(table, os.path.join(path, f"{view}.arrow"), compression="uncompressed")
+    with open(os.path.join(path, FIXTURE_META), "w", encoding="utf-8") as f:
+        json.dump({
+            "project": project_id,
+            "dataset": dataset_id,
+            "location": location,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "views": sorted(results),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def print_stats(tables, stats):
+    print(f"{'table':<36} {'cols':>5} {'rows':>10} {'logical':>12}  layout")
+    for table_name in sorted(tables):
+        entry = stats[table_name]
+        rows = format_count(entry["rows"]) if entry["rows"] is not None else "-"
+        size = format_bytes(entry["logical_bytes"]) if entry["logical_bytes"] is not None else "-"
+        layout = "; ".join(stats_lines({**entry, "rows": None, "logical_bytes": None})) or "-"
+        print(f"{table_name:<36} {len(tables[table_name]):>5} {rows:>10} {size:>12}  {layout}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harvest BigQuery table metadata and statistics through Arrow")
+    parser.add_argument("--project", default="project-534688f2-c3a9-4bff-95a", help="GCP Project ID")
+    parser.add_argument("--dataset", default="netflix_dw", help="BigQuery Dataset ID")
+    parser.add_argument("--region", help="Region of the TABLE_STORAGE view (default: the dataset's location)")
+    parser.add_argument("--fixture", nargs="?", const=DEFAULT_FIXTURE_DIR, help="Read a recorded fixture instead of BigQuery")
+    parser.add_argument("--record", metavar="DIR", help="Save the live query results as a fixture")
+    args = parser.parse_args()
+
+    if args.fixture:
+        client = FixtureClient(args.fixture)
+        project_id, dataset_id = client.project, client.meta["dataset"]
+    else:
+        try:
+            from google.cloud import bigquery
+            client = bigquery.Client(project=args.project)
+        except ImportError:
+            print("Error: pip install google-cloud-bigquery pyarrow")
+            return
+        project_id, dataset_id = args.project, args.dataset
+
+    try:
+        region = args.region or client.get_dataset(f"{project_id}.{dataset_id}").location.lower()
+        results, errors = fetch_metadata(project_id, dataset_id, client, region)
+    except Exception as e:
+        print(f"Error fetching from BigQuery: {e}")
+        print("Make sure you're authenticated: gcloud auth application-default login")
+        return
+    for view, error in errors.items():
+        print(f"  ✗ {view}: {error}")
+    if "COLUMNS" not in results:
+        return
+
+    tables, stats = decode_metadata(results)
+    print_stats(tables, stats)
+
+    if args.record:
+        record_fixture(results, args.record, project_id, dataset_id, region)
+        print(f"\nFixture saved to {args.record}")
+
+
+if __name__ == "__main__":
+    main()
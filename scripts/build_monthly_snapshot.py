@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Incremental builder for fact_subscription_monthly_snapshot.
+
+Each fact_subscription_event is an active interval from event_date to
+event_date + months_purchased. A subscription is active at a month start M
+when event_date <= M < event_date + months_purchased months, so one event
+covers exactly months_purchased consecutive month starts (from its own month
+when it starts on the 1st, otherwise from the next one).
+
+The snapshot holds one row per subscription per covered month start. When
+several events of a subscription cover the same month (renewals), the latest
+one (by event_date, then subscription_event_id) supplies plan, geo, term,
+status and MRR.
+
+Only months touched by events not yet reflected in the snapshot are rebuilt.
+New events are found with an anti-join against snapshot_processed_events,
+their month ranges are swept with a NumPy difference array, and each run of
+touched months is rebuilt in windows from the events overlapping it.
+snapshot_subscription_start keeps each subscription's first month for
+tenure_months; a late event that moves it earlier also touches every month
+of that subscription.
+
+Usage:
+    python scripts/build_monthly_snapshot.py --database netflix_dw.duckdb --full
+    python scripts/build_monthly_snapshot.py --database netflix_dw.duckdb --new-events events_2025_01.parquet
+    python scripts/build_monthly_snapshot.py --database netflix_dw.duckdb --verify
+
+Requires: pip install duckdb numpy
+"""
+
+import argparse
+import time
+
+SNAPSHOT_TABLE = "fact_subscription_monthly_snapshot"
+EVENT_TABLE = "fact_subscription_event"
+STATE_TABLE = "snapshot_processed_events"
+START_TABLE = "snapshot_subscription_start"
+DEFAULT_WINDOW_MONTHS = 12
+
+# Month index = months since 1970-01, so month arithmetic stays integer
+_MONTH_INDEX_SQL = "((year({col}) - 1970) * 12 + month({col}) - 1)"
+_MONTH_START_SQL = "make_date(CAST(1970 + {idx} // 12 AS INTEGER), CAST({idx} % 12 + 1 AS INTEGER), 1)"
+_SUBSCRIPTION_SQL = "coalesce(subscription_id, subscription_event_id)"
+
+
+def month_start_sql(idx):
+    return _MONTH_START_SQL.format(idx=idx)
+
+
+def covered_months(start_month, mid_month, months_purchased):
+    """First covered month index and count per event (vectorized)."""
+    import numpy as np
+
+    first = start_month.astype(np.int64) + mid_month.astype(np.int64)
+    return first, np.maximum(months_purchased.astype(np.int64), 0)
+
+
+def touched_months(first, count):
+    """
+    Sorted array of month indexes covered by any interval [first, first + count),
+    via a difference-array sweep: O(events + months), no per-event expansion.
+    """
+    import numpy as np
+
+    keep = count > 0
+    first, count = first[keep], count[keep]
+    if len(first) == 0:
+        return np.array([], dtype=np.int64)
+    base = first.min()
+    diff = np.zeros(int((first + count).max() - base) + 1, dtype=np.int64)
+    np.add.at(diff, first - base, 1)
+    np.add.at(diff, first + count - base, -1)
+    return np.flatnonzero(np.cumsum(diff)[:-1] > 0) + base
+
+
+def month_runs(months, window_months=DEFAULT_WINDOW_MONTHS):
+    """Split sorted month indexes into contiguous windows of at most window_months."""
+    runs = []
+    for month in months.tolist():
+        if runs and month == runs[-1][1] and month - runs[-1][0] < window_months:
+            runs[-1][1] = month + 1
+        else:
+            runs.append([month, month + 1])
+    return [tuple(run) for run in runs]
+
+
+def expand_intervals(first, count, lo, hi):
+    """
+    Clip each [first, first + count) to [lo, hi) and expand it to one entry per month.
+    Returns (interval index, month index) arrays.
+    """
+    import numpy as np
+
+    start = np.maximum(first, lo)
+    lengths = np.maximum(np.minimum(first + count, hi) - start, 0)
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(first)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner, start[owner] + offsets
+
+
+def latest_per_subscription_month(subscription, month, event_day, owner):
+    """Mask keeping the latest event for each (subscription, month) pair."""
+    import numpy as np
+
+    order = np.lexsort((owner, event_day, month, subscription))
+    sub_sorted, month_sorted = subscription[order], month[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (sub_sorted[1:] != sub_sorted[:-1]) | (month_sorted[1:] != month_sorted[:-1])
+    return order[last]
+
+
+def create_state_tables(con):
+    con.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (subscription_event_id VARCHAR)")
+    con.execute(f"CREATE TABLE IF NOT EXISTS {START_TABLE} (subscription VARCHAR, first_month BIGINT)")
+
+
+def update_subscription_starts(con):
+    """
+    Fold _new_events into snapshot_subscription_start. Returns the number of
+    existing subscriptions whose first month moved earlier (left in _moved_starts).
+    """
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE _new_starts AS
+        SELECT subscription, min(start_month + mid_month) AS first_month
+        FROM _new_events WHERE months_purchased > 0 GROUP BY subscription
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _moved_starts AS
+        SELECT n.subscription FROM _new_starts n JOIN {START_TABLE} s USING (subscription)
+        WHERE n.first_month < s.first_month
+    """)
+    con.execute(f"""
+        UPDATE {START_TABLE} s SET first_month = n.first_month
+        FROM _new_starts n WHERE s.subscription = n.subscription AND n.first_month < s.first_month
+    """)
+    con.execute(f"""
+        INSERT INTO {START_TABLE}
+        SELECT n.subscription, n.first_month FROM _new_starts n ANTI JOIN {START_TABLE} s USING (subscription)
+    """)
+    return con.execute("SELECT COUNT(*) FROM _moved_starts").fetchone()[0]
+
+
+def _snapshot_columns(con):
+    """Snapshot columns that exist (SCHEMA tables lack the DDL's etl_* columns)."""
+    return {row[0] for row in con.execute(f"DESCRIBE {SNAPSHOT_TABLE}").fetchall()}
+
+
+def rebuild_months(con, lo, hi, only_months=None, batch_id=None):
+    """
+    Recompute snapshot rows for month indexes [lo, hi) from every overlapping
+    event. `only_months` restricts the rewrite to a subset of that window.
+    Returns the number of rows written.
+    """
+    import numpy as np
+    from local_dw import register_arrays
+
+    max_months = con.execute(f"SELECT coalesce(max(months_purchased), 0) FROM {EVENT_TABLE}").fetchone()[0]
+    # event_date bounds keep partition pruning; the exact clip happens in NumPy
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _snapshot_events AS
+        SELECT row_number() OVER (ORDER BY event_date, subscription_event_id) - 1 AS pos, e.*
+        FROM (
+            SELECT subscription_event_id, subscription_id, event_date, user_key, geo_key, plan_key,
+                   term_key, status_key, net_amount, months_purchased,
+                   {_SUBSCRIPTION_SQL} AS subscription,
+                   {_MONTH_INDEX_SQL.format(col='event_date')} AS start_month,
+                   CAST(day(event_date) > 1 AS INTEGER) AS mid_month
+            FROM {EVENT_TABLE}
+            WHERE event_date < {month_start_sql(hi)}
+              AND event_date >= {month_start_sql(lo - max_months - 1)}
+              AND months_purchased > 0
+        ) e
+    """)
+    # Tenure counts from the subscription's first month ever, which can lie
+    # far before the event window; build_snapshot() keeps START_TABLE current
+    events = con.execute(f"""
+        SELECT e.pos, hash(e.subscription) AS subscription_hash, e.start_month, e.mid_month,
+               e.months_purchased, date_diff('day', DATE '1970-01-01', e.event_date) AS event_day,
+               s.first_month
+        FROM _snapshot_events e
+        JOIN {START_TABLE} s USING (subscription)
+        ORDER BY e.pos
+    """).fetchnumpy()
+
+    first, count = covered_months(events["start_month"], events["mid_month"], events["months_purchased"])
+    owner, month = expand_intervals(first, count, lo, hi)
+    if only_months is not None:
+        keep = np.isin(month, only_months)
+        owner, month = owner[keep], month[keep]
+
+    subscription = np.asarray(events["subscription_hash"])[owner]
+    keep = latest_per_subscription_month(subscription, month, np.asarray(events["event_day"])[owner], owner)
+    owner, month = owner[keep], month[keep]
+    tenure = month - np.asarray(events["first_month"])[owner] + 1
+
+    months = np.arange(lo, hi) if only_months is None else np.asarray(only_months)
+    register_arrays(con, "_snapshot_rows", {
+        "pos": np.asarray(events["pos"])[owner],
+        "month_idx": month.astype(np.int64),
+        "tenure_months": tenure.astype(np.int64),
+    })
+
+    month_list = ", ".join(f"{month_start_sql(int(m))}" for m in months)
+    etl = ""
+    etl_values = ""
+    if "etl_batch_id" in _snapshot_columns(con):
+        etl, etl_values = ", etl_inserted_ts, etl_batch_id", ", current_timestamp, ?"
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute(f"DELETE FROM {SNAPSHOT_TABLE} WHERE snapshot_month_start IN ({month_list})")
+        con.execute(f"""
+            INSERT INTO {SNAPSHOT_TABLE} (
+                snapshot_id, subscription_id, snapshot_month_start, month_start_date_key,
+                user_key, geo_key, plan_key, term_key, status_key,
+                active_flag, active_subscriptions, mrr_amount, tenure_months{etl}
+            )
+            SELECT e.subscription || '-' || strftime(m.month_start, '%Y%m'),
+                   e.subscription_id, m.month_start,
+                   CAST(strftime(m.month_start, '%Y%m%d') AS BIGINT),
+                   e.user_key, e.geo_key, e.plan_key, e.term_key, e.status_key,
+                   TRUE, 1, round(e.net_amount / e.months_purchased, 2), m.tenure_months{etl_values}
+            FROM (SELECT *, {month_start_sql('month_idx')} AS month_start FROM _snapshot_rows) m
+            JOIN _snapshot_events e ON e.pos = m.pos
+        """, [batch_id] if etl else None)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("_snapshot_rows")
+    return len(owner)
+
+
+def build_snapshot(con, full=False, window_months=DEFAULT_WINDOW_MONTHS, batch_id=None):
+    """
+    Bring the snapshot up to date with fact_subscription_event.
+    Returns {"new_events", "moved_starts", "months", "rows"}; a full build
+    rebuilds every month.
+    """
+    create_state_tables(con)
+    if full:
+        for table in (SNAPSHOT_TABLE, STATE_TABLE, START_TABLE):
+            con.execute(f"DELETE FROM {table}")
+
+    interval_columns = f"""
+        {_MONTH_INDEX_SQL.format(col='e.event_date')} AS start_month,
+        CAST(day(e.event_date) > 1 AS INTEGER) AS mid_month,
+        coalesce(e.months_purchased, 0) AS months_purchased"""
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _new_events AS
+        SELECT e.subscription_event_id, {_SUBSCRIPTION_SQL} AS subscription, {interval_columns}
+        FROM {EVENT_TABLE} e
+        ANTI JOIN {STATE_TABLE} s USING (subscription_event_id)
+    """)
+    new_events = con.execute("SELECT COUNT(*) FROM _new_events").fetchone()[0]
+    moved = update_subscription_starts(con)
+
+    # Intervals of the new events, plus every event of subscriptions whose tenure base moved
+    intervals = con.execute(f"""
+        SELECT start_month, mid_month, months_purchased FROM _new_events
+        UNION ALL
+        SELECT {interval_columns}
+        FROM {EVENT_TABLE} e
+        WHERE {_SUBSCRIPTION_SQL} IN (SELECT subscription FROM _moved_starts)
+    """).fetchnumpy()
+    first, count = covered_months(intervals["start_month"], intervals["mid_month"], intervals["months_purchased"])
+    months = touched_months(first, count)
+
+    rows = 0
+    for lo, hi in month_runs(months, window_months):
+        window = months[(months >= lo) & (months < hi)]
+        rows += rebuild_months(con, lo, hi, only_months=None if len(window) == hi - lo else window, batch_id=batch_id)
+
+    con.execute(f"INSERT INTO {STATE_TABLE} SELECT subscription_event_id FROM _new_events")
+    return {"new_events": new_events, "moved_starts": moved, "months": len(months), "rows": rows}
+
+
+def verify_tenure(con):
+    """
+    Recompute tenure_months from each subscription's first covered month over
+    all events. Returns the number of snapshot rows that disagree.
+    """
+    return con.execute(f"""
+        WITH first_months AS (
+            SELECT {_SUBSCRIPTION_SQL} AS subscription,
+                   min({_MONTH_INDEX_SQL.format(col='event_date')} + CAST(day(event_date) > 1 AS INTEGER)) AS first_month
+            FROM {EVENT_TABLE}
+            WHERE months_purchased > 0
+            GROUP BY 1
+        )
+        SELECT COUNT(*)
+        FROM {SNAPSHOT_TABLE} s
+        LEFT JOIN first_months f
+          ON f.subscription = left(s.snapshot_id, length(s.snapshot_id) - 7)
+        WHERE s.tenure_months IS DISTINCT FROM
+              {_MONTH_INDEX_SQL.format(col='s.snapshot_month_start')} - f.first_month + 1
+    """).fetchone()[0]
+
+
+def verify_snapshot(con):
+    """
+    Compare per-month, per-geo active counts in the snapshot with a direct
+    interval join over the events, keeping the latest event per subscription
+    and month as the build does. Returns the number of mismatched cells.
+    """
+    return con.execute(f"""
+        WITH covering AS (
+            SELECT d.calendar_date AS month_start, e.geo_key,
+                   row_number() OVER (
+                       PARTITION BY {_SUBSCRIPTION_SQL}, d.calendar_date
+                       ORDER BY e.event_date DESC, e.subscription_event_id DESC
+                   ) AS recency
+            FROM dim_date d
+            JOIN {EVENT_TABLE} e
+              ON e.event_date <= d.calendar_date
+             AND CAST(e.event_date + to_months(CAST(e.months_purchased AS INTEGER)) AS DATE) > d.calendar_date
+            WHERE d.month_start_flag AND e.months_purchased > 0
+        ),
+        expected AS (
+            SELECT month_start, geo_key, COUNT(*) AS active
+            FROM covering WHERE recency = 1
+            GROUP BY 1, 2
+        ),
+        actual AS (
+            SELECT snapshot_month_start AS month_start, geo_key, SUM(active_subscriptions) AS active
+            FROM {SNAPSHOT_TABLE}
+            GROUP BY 1, 2
+        )
+        SELECT COUNT(*)
+        FROM expected FULL OUTER JOIN actual USING (month_start, geo_key)
+        WHERE expected.active IS DISTINCT FROM actual.active
+          AND month_start BETWEEN (SELECT min(calendar_date) FROM dim_date) AND (SELECT max(calendar_date) FROM dim_date)
+    """).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally build fact_subscription_monthly_snapshot")
+    parser.add_argument("--database", default="netflix_dw.duckdb", help="DuckDB database file (see local_dw.py)")
+    parser.add_argument("--new-events", help="CSV/Parquet file of new fact_subscription_event rows to append first")
+    parser.add_argument("--full", action="store_true", help="Rebuild every month instead of only touched ones")
+    parser.add_argument("--window-months", type=int, default=DEFAULT_WINDOW_MONTHS,
+                        help="Months rebuilt per pass (bounds memory)")
+    parser.add_argument("--batch-id", help="etl_batch_id for written rows (DDL-created tables)")
+    parser.add_argument("--verify", action="store_true", help="Check snapshot counts and tenure against the raw events")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+        import numpy
+    except ImportError:
+        print("Error: pip install duckdb numpy")
+        return
+
+    from local_dw import connect, create_schema, load_table
+    from generate_erd import SCHEMA
+
+    con = connect(args.database)
+    create_schema(con)
+
+    if args.new_events:
+        columns = [c[0] for c in SCHEMA["facts"][EVENT_TABLE]["columns"]]
+        loaded = load_table(con, EVENT_TABLE, args.new_events, columns)
+        print(f"Appended {loaded:,} events from {args.new_events}")
+
+    started = time.perf_counter()
+    result = build_snapshot(con, full=args.full, window_months=args.window_months, batch_id=args.batch_id)
+    elapsed = time.perf_counter() - started
+    print(f"{result['new_events']:,} new event(s) touched {result['months']} month(s); "
+          f"wrote {result['rows']:,} snapshot rows in {elapsed:.2f}s")
+
+    if args.verify:
+        mismatches = verify_snapshot(con)
+        print(f"  {'✓' if mismatches == 0 else '✗'} {mismatches} month/geo cell(s) differ from the events")
+        mismatches = verify_tenure(con)
+        print(f"  {'✓' if mismatches == 0 else '✗'} {mismatches} snapshot row(s) have the wrong tenure_months")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Bus matrix generator and conformance index for the Netflix DW.
+
+Compiles the fact -> dimension FK graph of SCHEMA (or a DDL file) into a
+fact x dimension bitset index: one Python int per fact with a bit per
+dimension it references (role-playing FKs set the same bit), and one per
+dimension with a bit per fact. The bus matrix is emitted from the index as
+Markdown, CSV or XLSX, and drill-across questions are answered with bitwise
+ANDs instead of rescanning column lists:
+
+    facts_with(dims)    facts that reference every given dimension
+    shared_dims(facts)  conformed dimensions the given facts can be drilled across on
+
+Usage:
+    python scripts/bus_matrix.py                                   # Markdown to stdout
+    python scripts/bus_matrix.py --format csv --output bus_matrix.csv
+    python scripts/bus_matrix.py --format xlsx --output bus_matrix.xlsx
+    python scripts/bus_matrix.py --drill-across dim_user dim_promotion
+    python scripts/bus_matrix.py --drill-across fact_viewing_session fact_content_tx
+    python scripts/bus_matrix.py --diff                            # against the hand-written matrix
+    python scripts/bus_matrix.py --benchmark 500                   # synthetic schema, 500 tables
+
+Requires: pip install openpyxl (XLSX output only)
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import re
+import time
+
+from ddl_parser import DEFAULT_DDL_PATH, load_ddl_schema
+
+DEFAULT_MATRIX_PATH = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "Netflix_BusMatrix_Logical_Data_Model_BQ.md"
+))
+
+
+def dimension_label(dim_name):
+    """dim_rights_holder -> Rights Holder (the hand-written matrix's column headers)."""
+    return dim_name.replace("dim_", "", 1).replace("_", " ").title()
+
+
+def iter_bits(mask):
+    """Yield the positions of the set bits of mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BusIndex:
+    """Fact x dimension bitsets built once from (table, column, target, target_column) relations."""
+
+    def __init__(self, facts, dimensions, relations):
+        self.facts = list(facts)
+        self.dimensions = list(dimensions)
+        self.fact_pos = {name: i for i, name in enumerate(self.facts)}
+        self.dim_pos = {name: i for i, name in enumerate(self.dimensions)}
+        self.fact_bits = [0] * len(self.facts)
+        self.dim_bits = [0] * len(self.dimensions)
+        self.all_facts = (1 << len(self.facts)) - 1
+        self.all_dims = (1 << len(self.dimensions)) - 1
+
+        for src, _, dst, _ in relations:
+            if src in self.fact_pos and dst in self.dim_pos:
+                f, d = self.fact_pos[src], self.dim_pos[dst]
+                self.fact_bits[f] |= 1 << d
+                self.dim_bits[d] |= 1 << f
+
+    @classmethod
+    def from_schema(cls, schema):
+        from generate_erd import schema_relations
+
+        return cls(schema["facts"], schema["dimensions"], schema_relations(schema))
+
+    def facts_with(self, dims):
+        """Facts that reference every dimension in dims."""
+        mask = self.all_facts
+        for dim in dims:
+            if dim not in self.dim_pos:
+                raise KeyError(f"unknown dimension: {dim}")
+            mask &= self.dim_bits[self.dim_pos[dim]]
+        return [self.facts[i] for i in iter_bits(mask)]
+
+    def shared_dims(self, facts):
+        """Dimensions referenced by every fact in facts (the drill-across candidates)."""
+        mask = self.all_dims
+        for fact in facts:
+            if fact not in self.fact_pos:
+                raise KeyError(f"unknown fact: {fact}")
+            mask &= self.fact_bits[self.fact_pos[fact]]
+        return [self.dimensions[i] for i in iter_bits(mask)]
+
+    def conformance(self):
+        """[(dimension, fact count)], most conformed first; unused dimensions included."""
+        counts = [(dim, bin(self.dim_bits[i]).count("1")) for i, dim in enumerate(self.dimensions)]
+        return sorted(counts, key=lambda item: -item[1])
+
+    def rows(self):
+        """Bus matrix as a header row and one row per fact ("X" where referenced)."""
+        header = ["Fact table"] + [dimension_label(dim) for dim in self.dimensions]
+        body = [
+            [fact] + ["X" if bits >> d & 1 else "" for d in range(len(self.dimensions))]
+            for fact, bits in zip(self.facts, self.fact_bits)
+        ]
+        return header, body
+
+
+def to_markdown(header, body):
+    """Left-aligned pipe table in the layout of the hand-written bus matrix."""
+    widths = [max(len(row[i]) for row in [header] + body) for i in range(len(header))]
+    lines = ["| " + " | ".join(cell.ljust(w) for cell, w in zip(header, widths)) + " |"]
+    lines.append("|" + "|".join(":" + "-" * (w + 1) for w in widths) + "|")
+    for row in body:
+        lines.append("| " + " | ".join(cell.ljust(w) for cell, w in zip(row, widths)) + " |")
+    return "\n".join(lines)
+
+
+def to_csv(header, body):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(body)
+    return buffer.getvalue()
+
+
+def write_xlsx(header, body, path):
+    """Write the matrix to an XLSX sheet named "Bus Matrix" (openpyxl)."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Bus Matrix"
+    sheet.append(header)
+    for row in body:
+        sheet.append(row)
+
+    for cell in sheet[1]:
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill("solid", fgColor="87CEEB")
+        cell.alignment = Alignment(text_rotation=90 if cell.column > 1 else 0, horizontal="center")
+    for row in sheet.iter_rows(min_row=2, min_col=2):
+        for cell in row:
+            cell.alignment = Alignment(horizontal="center")
+    sheet.column_dimensions["A"].width = max(len(row[0]) for row in [header] + body) + 2
+    sheet.freeze_panes = "B2"
+    workbook.save(path)
+
+
+def load_matrix_markdown(path=DEFAULT_MATRIX_PATH):
+    """
+    Read the "Bus Matrix" table of the hand-written logical model.
+    Returns {fact table: set of dimension labels marked X}.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    matrix = {}
+    header = None
+    for line in lines:
+        if not line.startswith("|"):
+            if header is not None and matrix:
+                break
+            header = None
+            continue
+        cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+        if header is None:
+            if "Fact table" in cells:
+                header = cells
+            continue
+        if re.fullmatch(r"[:\- ]+", "".join(cells)):
+            continue
+        row = dict(zip(header, cells))
+        matrix[row["Fact table"]] = {label for label, cell in row.items() if cell == "X"}
+    return matrix
+
+
+def diff_matrix(index, documented):
+    """List differences between the index and a documented matrix (load_matrix_markdown)."""
+    differences = []
+    for fact in sorted(set(index.facts) ^ set(documented)):
+        differences.append(f"{fact}: only in {'SCHEMA' if fact in index.fact_pos else 'bus matrix'}")
+    for fact in index.facts:
+        if fact not in documented:
+            continue
+        generated = {dimension_label(index.dimensions[d]) for d in iter_bits(index.fact_bits[index.fact_pos[fact]])}
+        for label in sorted(generated - documented[fact]):
+            differences.append(f"{fact}: {label} referenced in SCHEMA, not marked in the bus matrix")
+        for label in sorted(documented[fact] - generated):
+            differences.append(f"{fact}: {label} marked in the bus matrix, no FK in SCHEMA")
+    return differences
+
+
+def benchmark(table_count, queries=10_000, seed=42):
+    """
+    Time facts_with() against a rescan of every fact's column list on a
+    synthetic schema. Both must return the same facts.
+    """
+    from bench_fk_index import synthetic_tables
+    from generate_bq_erd import build_fk_index, full_relations
+
+    tables = synthetic_tables(table_count, seed)
+    relations = full_relations(tables, build_fk_index(tables))
+    facts = [name for name in tables if name.startswith("fact_")]
+    dimensions = [name for name in tables if name.startswith("dim_")]
+
+    started = time.perf_counter()
+    index = BusIndex(facts, dimensions, relations)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(seed)
+    workload = [rng.sample(dimensions, rng.randint(1, 3)) for _ in range(queries)]
+    # Weight towards the most conformed dims so most queries have answers
+    common = [dim for dim, _ in index.conformance()[:10]]
+    workload += [rng.sample(common, 2) for _ in range(queries)]
+
+    started = time.perf_counter()
+    indexed = [index.facts_with(dims) for dims in workload]
+    indexed_seconds = time.perf_counter() - started
+
+    by_fact = {}
+    for src, _, dst, _ in relations:
+        by_fact.setdefault(src, []).append(dst)
+    started = time.perf_counter()
+    scanned = [[fact for fact in facts if all(dim in by_fact.get(fact, ()) for dim in dims)] for dims in workload]
+    scan_seconds = time.perf_counter() - started
+
+    if indexed != scanned:
+        raise AssertionError("bitset index and column scan disagree")
+
+    print(f"{len(facts)} facts x {len(dimensions)} dims, {len(relations)} FK relations; index built in {build_seconds * 1000:.1f} ms")
+    print(f"{len(workload)} drill-across queries:")
+    print(f"  column scan : {scan_seconds:.3f}s ({scan_seconds / len(workload) * 1e6:.1f} µs/query)")
+    print(f"  bitset index: {indexed_seconds:.3f}s ({indexed_seconds / len(workload) * 1e6:.1f} µs/query)")
+    print(f"  speedup     : {scan_seconds / indexed_seconds:.1f}x, identical answers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Netflix DW bus matrix from SCHEMA")
+    parser.add_argument("--ddl", nargs="?", const=DEFAULT_DDL_PATH,
+                        help="Build from a BigQuery DDL file instead of SCHEMA (default: Netflix_BigQuery_DDL.sql)")
+    parser.add_argument("--format", choices=["markdown", "csv", "xlsx"], default="markdown")
+    parser.add_argument("--output", help="Output file (stdout for markdown/csv when omitted)")
+    parser.add_argument("--drill-across", nargs="+", metavar="NAME",
+                        help="Dimensions: facts referencing all of them; facts: the dimensions they share")
+    parser.add_argument("--conformance", action="store_true", help="List dimensions by the number of facts using them")
+    parser.add_argument("--diff", nargs="?", const=DEFAULT_MATRIX_PATH,
+                        help="Compare with the hand-written bus matrix (default: Netflix_BusMatrix_Logical_Data_Model_BQ.md)")
+    parser.add_argument("--benchmark", type=int, metavar="TABLES", help="Time drill-across queries on a synthetic schema")
+    parser.add_argument("--queries", type=int, default=10_000, help="Random queries per benchmark pass")
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.queries)
+        return
+
+    if args.ddl:
+        schema = load_ddl_schema(args.ddl)
+    else:
+        from generate_erd import SCHEMA as schema
+    index = BusIndex.from_schema(schema)
+
+    if args.drill_across:
+        names = args.drill_across
+        try:
+            if all(name in index.fact_pos for name in names):
+                shared = index.shared_dims(names)
+                print(f"{len(shared)} shared dimension(s): {', '.join(shared) or '-'}")
+            else:
+                facts = index.facts_with(names)
+                print(f"{len(facts)} fact(s) with {', '.join(names)}: {', '.join(facts) or '-'}")
+        except KeyError as e:
+            print(f"Error: {e.args[0]} (pass only facts or only dimensions)")
+        return
+
+    if args.conformance:
+        for dim, count in index.conformance():
+            print(f"  {dim:<22} {count:>3} / {len(index.facts)} facts")
+        return
+
+    if args.diff:
+        differences = diff_matrix(index, load_matrix_markdown(args.diff))
+        for line in differences:
+            print(f"  {line}")
+        print(f"{len(differences)} difference(s) against {args.diff}")
+        return
+
+    header, body = index.rows()
+    if args.format == "xlsx":
+        if not args.output:
+            print("Error: --format xlsx needs --output")
+            return
+        try:
+            write_xlsx(header, body, args.output)
+        except ImportError:
+            print("Error: pip install openpyxl")
+            return
+        print(f"Bus matrix saved to {args.output}")
+        return
+
+    text = to_markdown(header, body) + "\n" if args.format == "markdown" else to_csv(header, body)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        print(f"Bus matrix saved to {args.output}")
+    else:
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    main()
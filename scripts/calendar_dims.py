@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Vectorized generator for the conformed calendar dimensions dim_date and dim_time.
+
+dim_date has one row per day (yyyymmdd date_key) for any range, e.g.
+1970-01-01..2100-12-31, built with NumPy datetime arithmetic in chunks of
+--chunk-days; dim_time has one row per second of the day (hhmmss time_key).
+Rows stream to CSV/Parquet or are inserted in batches into the local DuckDB
+warehouse (existing rows in the range are replaced).
+
+CalendarLookup keeps the keys as dense arrays indexed by day offset and
+second of day, so fact loaders turn datetime64 arrays into date/time keys
+with one gather instead of per-row datetime parsing:
+
+    calendar = CalendarLookup("2020-01-01", "2030-12-31")
+    start_date_key = calendar.date_keys(start_ts)
+    start_time_key = calendar.time_keys(start_ts)
+
+Usage:
+    python scripts/calendar_dims.py --start 1970-01-01 --end 2100-12-31 --output calendar
+    python scripts/calendar_dims.py --format parquet --output calendar
+    python scripts/calendar_dims.py --database netflix_dw.duckdb --start 2020-01-01 --end 2030-12-31
+    python scripts/calendar_dims.py --benchmark 10000000
+
+Requires: pip install numpy
+Optional: pip install pyarrow duckdb   (Parquet output, local warehouse inserts)
+"""
+
+import argparse
+import os
+import time
+
+DEFAULT_START_DATE = "1970-01-01"
+DEFAULT_END_DATE = "2100-12-31"
+DEFAULT_CHUNK_DAYS = 100_000
+SECONDS_PER_DAY = 86400
+DAY_PARTS = ["night", "morning", "afternoon", "evening"]
+
+
+def date_keys(dates):
+    """datetime64[D] array -> yyyymmdd int64 array."""
+    import numpy as np
+
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    days = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+    return years * 10000 + months * 100 + days
+
+
+def time_keys(timestamps):
+    """datetime64[s] array -> hhmmss int64 array."""
+    import numpy as np
+
+    seconds = (timestamps - timestamps.astype("datetime64[D]")).astype(np.int64)
+    return (seconds // 3600) * 10000 + (seconds // 60 % 60) * 100 + seconds % 60
+
+
+def _two_digits(values):
+    import numpy as np
+
+    return np.char.zfill(values.astype(str), 2)
+
+
+def date_dimension(start, end):
+    """dim_date columns for every day in [start, end]."""
+    import numpy as np
+
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1, dtype="datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    month = months.astype(np.int64) % 12 + 1
+    return {
+        "date_key": date_keys(dates),
+        "calendar_date": dates,
+        "year": dates.astype("datetime64[Y]").astype(np.int64) + 1970,
+        "quarter": (month - 1) // 3 + 1,
+        "month": month,
+        "day": (dates - months).astype(np.int64) + 1,
+        "day_of_week": (dates.astype(np.int64) + 3) % 7 + 1,  # ISO: Monday=1
+        "month_start_flag": dates == months.astype("datetime64[D]"),
+        "month_end_flag": dates == (months + 1).astype("datetime64[D]") - 1,
+    }
+
+
+def date_dimension_chunks(start, end, chunk_days=DEFAULT_CHUNK_DAYS):
+    """Yield dim_date column chunks of at most chunk_days rows covering [start, end]."""
+    import numpy as np
+
+    first, last = np.datetime64(start, "D"), np.datetime64(end, "D")
+    while first <= last:
+        chunk_end = min(first + (chunk_days - 1), last)
+        yield date_dimension(first, chunk_end)
+        first = chunk_end + 1
+
+
+def time_dimension():
+    """dim_time columns, one row per second of the day."""
+    import numpy as np
+
+    seconds = np.arange(SECONDS_PER_DAY)
+    hour, minute, second = seconds // 3600, seconds // 60 % 60, seconds % 60
+    hhmmss = np.char.add(np.char.add(np.char.add(_two_digits(hour), ":"), np.char.add(_two_digits(minute), ":")),
+                         _two_digits(second))
+    return {
+        "time_key": hour * 10000 + minute * 100 + second,
+        "hhmmss": hhmmss.astype(object),
+        "hour": hour,
+        "minute": minute,
+        "second": second,
+        "day_part": np.array(DAY_PARTS, dtype=object)[hour // 6],
+    }
+
+
+class CalendarLookup:
+    """
+    Dense key arrays for [start, end]: date_key by day offset and time_key by
+    second of day. Dates outside the range (and NaT) map to `missing`; an
+    empty range (CalendarLookup.empty()) maps every date to it.
+    """
+
+    def __init__(self, start=DEFAULT_START_DATE, end=DEFAULT_END_DATE, missing=-1):
+        import numpy as np
+
+        self.start = np.datetime64(start, "D")
+        self.end = np.datetime64(end, "D")
+        self.missing = missing
+        self.date_key_by_day = date_keys(np.arange(self.start, self.end + 1, dtype="datetime64[D]"))
+        self.time_key_by_second = time_dimension()["time_key"]
+        if not len(self.date_key_by_day):
+            self.first_key, self.day_by_key = 0, np.array([], dtype=np.int64)
+            return
+        self.first_key = int(self.date_key_by_day[0])
+        # yyyymmdd - first_key -> day offset (-1 for numbers that are not dates)
+        self.day_by_key = np.full(int(self.date_key_by_day[-1]) - self.first_key + 1, -1, dtype=np.int64)
+        self.day_by_key[self.date_key_by_day - self.first_key] = np.arange(len(self.date_key_by_day))
+
+    @classmethod
+    def empty(cls, missing=-1):
+        """A lookup without dates (dim_date not generated yet); time keys still resolve."""
+        import numpy as np
+
+        start = np.datetime64(DEFAULT_START_DATE, "D")
+        return cls(start, start - 1, missing)
+
+    def _day_offsets(self, values):
+        import numpy as np
+
+        days = values.astype("datetime64[D]")
+        offset = (days - self.start).astype(np.int64)
+        valid = ~np.isnat(days) & (offset >= 0) & (offset < len(self.date_key_by_day))
+        return offset, valid
+
+    def date_keys(self, values):
+        """datetime64 array (any unit) -> yyyymmdd date_key array."""
+        import numpy as np
+
+        offset, valid = self._day_offsets(values)
+        if not len(self.date_key_by_day):
+            return np.full(np.shape(offset), self.missing, dtype=np.int64)
+        return np.where(valid, self.date_key_by_day[np.where(valid, offset, 0)], self.missing)
+
+    def time_keys(self, values):
+        """datetime64 array (any unit) -> hhmmss time_key array."""
+        import numpy as np
+
+        seconds = values.astype("datetime64[s]")
+        second_of_day = (seconds - seconds.astype("datetime64[D]")).astype(np.int64)
+        valid = ~np.isnat(seconds)
+        return np.where(valid, self.time_key_by_second[np.where(valid, second_of_day, 0)], self.missing)
+
+    def dates(self, keys):
+        """yyyymmdd date_key array -> datetime64[D] array (NaT for unknown keys)."""
+        import numpy as np
+
+        index = np.asarray(keys, dtype=np.int64) - self.first_key
+        if not len(self.day_by_key):
+            return np.full(np.shape(index), np.datetime64("NaT"), dtype="datetime64[D]")
+        inside = (index >= 0) & (index < len(self.day_by_key))
+        day = np.where(inside, self.day_by_key[np.where(inside, index, 0)], -1)
+        return np.where(day >= 0, self.start + np.maximum(day, 0).astype("timedelta64[D]"), np.datetime64("NaT"))
+
+
+def write_dimensions(output_dir, start, end, output_format="csv", tables=("dim_date", "dim_time"),
+                     chunk_days=DEFAULT_CHUNK_DAYS):
+    """Write dim_date/dim_time files to output_dir. Returns {table: rows}."""
+    from generate_synthetic_data import write_table
+
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    for table in tables:
+        path = os.path.join(output_dir, f"{table}.{output_format}")
+        if table == "dim_date":
+            chunks = date_dimension_chunks(start, end, chunk_days)
+            columns = list(date_dimension(start, start))
+        else:
+            chunks = [time_dimension()]
+            columns = list(chunks[0])
+        counts[table] = write_table(path, columns, chunks, output_format)
+    return counts
+
+
+def insert_dimensions(con, start, end, tables=("dim_date", "dim_time"), chunk_days=DEFAULT_CHUNK_DAYS):
+    """Replace the range's rows in the local warehouse, one batch per chunk. Returns {table: rows}."""
+    from local_dw import register_arrays
+
+    counts = {}
+    con.execute("BEGIN TRANSACTION")
+    try:
+        for table in tables:
+            if table == "dim_date":
+                con.execute("DELETE FROM dim_date WHERE calendar_date BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)",
+                            [str(start), str(end)])
+                chunks = date_dimension_chunks(start, end, chunk_days)
+            else:
+                con.execute("DELETE FROM dim_time")
+                chunks = [time_dimension()]
+            counts[table] = 0
+            for chunk in chunks:
+                register_arrays(con, "_calendar_batch", chunk)
+                columns = ", ".join(chunk)
+                con.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM _calendar_batch")
+                con.unregister("_calendar_batch")
+                counts[table] += len(chunk[next(iter(chunk))])
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return counts
+
+
+def benchmark_lookup(rows, start, end):
+    """Time timestamp -> key conversion: lookup arrays, date arithmetic, per-row strftime."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    calendar = CalendarLookup(start, end)
+    span = (calendar.end - calendar.start).astype(np.int64) * SECONDS_PER_DAY
+    ts = calendar.start.astype("datetime64[s]") + rng.integers(0, span, rows).astype("timedelta64[s]")
+
+    timings = {}
+    started = time.perf_counter()
+    lookup = (calendar.date_keys(ts), calendar.time_keys(ts))
+    timings["lookup arrays"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    arithmetic = (date_keys(ts.astype("datetime64[D]")), time_keys(ts))
+    timings["datetime64 arithmetic"] = time.perf_counter() - started
+    assert all(np.array_equal(a, b) for a, b in zip(lookup, arithmetic))
+
+    sample = ts[:min(rows, 200_000)].astype(object)
+    started = time.perf_counter()
+    [(int(t.strftime("%Y%m%d")), int(t.strftime("%H%M%S"))) for t in sample]
+    timings["per-row strftime"] = (time.perf_counter() - started) * rows / len(sample)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate dim_date and dim_time")
+    parser.add_argument("--start", default=DEFAULT_START_DATE, help="First calendar date")
+    parser.add_argument("--end", default=DEFAULT_END_DATE, help="Last calendar date")
+    parser.add_argument("--tables", nargs="+", choices=["dim_date", "dim_time"], default=["dim_date", "dim_time"])
+    parser.add_argument("--output", help="Write <table>.csv/.parquet files to this directory")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output file format")
+    parser.add_argument("--database", help="Insert into this local DuckDB warehouse (see local_dw.py)")
+    parser.add_argument("--chunk-days", type=int, default=DEFAULT_CHUNK_DAYS, help="dim_date rows per batch")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS",
+                        help="Time timestamp -> key conversion for ROWS random timestamps")
+
+    args = parser.parse_args()
+
+    try:
+        import numpy
+    except ImportError:
+        print("Error: pip install numpy")
+        return
+
+    if not (args.output or args.database or args.benchmark):
+        args.output = "calendar"
+
+    if args.output:
+        if args.format == "parquet":
+            try:
+                import pyarrow
+            except ImportError:
+                print("Error: pip install pyarrow (required for --format parquet)")
+                return
+        started = time.perf_counter()
+        counts = write_dimensions(args.output, args.start, args.end, args.format, args.tables, args.chunk_days)
+        elapsed = time.perf_counter() - started
+        for table, rows in counts.items():
+            print(f"  ✓ {os.path.join(args.output, table)}.{args.format} ({rows:,} rows)")
+        print(f"Wrote {sum(counts.values()):,} rows in {elapsed:.2f}s")
+
+    if args.database:
+        try:
+            import duckdb
+        except ImportError:
+            print("Error: pip install duckdb")
+            return
+        from local_dw import connect, create_schema
+
+        con = connect(args.database)
+        create_schema(con)
+        started = time.perf_counter()
+        counts = insert_dimensions(con, args.start, args.end, args.tables, args.chunk_days)
+        elapsed = time.perf_counter() - started
+        print(f"Inserted {', '.join(f'{rows:,} {table}' for table, rows in counts.items())} rows "
+              f"into {args.database} in {elapsed:.2f}s")
+
+    if args.benchmark:
+        print(f"\nTimestamp -> date_key/time_key for {args.benchmark:,} rows ({args.start}..{args.end}):")
+        for method, seconds in benchmark_lookup(args.benchmark, args.start, args.end).items():
+            print(f"  {method:<24} {seconds:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
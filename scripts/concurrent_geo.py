@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Streaming concurrent-geolocation detector for fact_viewing_session.
+
+A session gets concurrent_stream_flag when another session of the same
+profile_key, from a different geo_key, overlaps it in time
+(a.start_ts < b.end_ts and b.start_ts < a.end_ts).
+
+Sessions are read once, in arrival (insertion) order, in record batches;
+the table is never sorted as a whole. The detector keeps only sessions that
+are still open at the watermark (latest start_ts seen minus the lateness
+window). Each batch is merged with that state, sorted by (profile, start),
+and swept: session i is compared with i+1, i+2, ... of the same profile
+until one starts after i ends, all sessions at once per offset. A session
+whose end_ts falls behind the watermark can no longer gain an overlap, so
+its flag is final and it leaves the state. end_ts is capped at start_ts +
+--max-session-hours (and a missing end_ts counts as start_ts), which bounds
+how long any session stays in the state.
+
+Sessions arriving more than the lateness window behind the watermark are
+still checked against the state but may miss partners that already left it;
+they are counted as late.
+
+Usage:
+    python scripts/concurrent_geo.py --database netflix_dw.duckdb
+    python scripts/concurrent_geo.py --database netflix_dw.duckdb --date 2025-01-15 --verify
+    python scripts/concurrent_geo.py --database netflix_dw.duckdb --lateness-minutes 30 --dry-run
+
+Requires: pip install duckdb numpy pyarrow
+"""
+
+import argparse
+import time
+
+SESSION_TABLE = "fact_viewing_session"
+
+DEFAULT_LATENESS_MINUTES = 15
+DEFAULT_MAX_SESSION_HOURS = 8
+DEFAULT_BATCH_SIZE = 500_000
+
+_US_PER_MINUTE = 60 * 1_000_000
+_FIELDS = ("row", "profile", "geo", "start", "end", "flag")
+
+
+class ConcurrentGeoDetector:
+    """
+    Feed session batches with push(); each call returns the (row, flag) arrays
+    of sessions whose flag became final. flush() returns the rest.
+    """
+
+    def __init__(self, lateness_minutes=DEFAULT_LATENESS_MINUTES, max_session_hours=DEFAULT_MAX_SESSION_HOURS):
+        import numpy as np
+
+        self.lateness = int(lateness_minutes * _US_PER_MINUTE)
+        self.max_session = int(max_session_hours * 60 * _US_PER_MINUTE)
+        self.state = {name: np.array([], dtype=bool if name == "flag" else np.int64) for name in _FIELDS}
+        self.watermark = None
+        self.rows = 0
+        self.late = 0
+        self.peak_state = 0
+
+    def push(self, row, profile, geo, start, end):
+        """Add a batch (int64 arrays; start/end in epoch microseconds)."""
+        import numpy as np
+
+        if not len(row):
+            return np.array([], dtype=np.int64), np.array([], dtype=bool)
+        end = np.clip(end, start, start + self.max_session)
+        if self.watermark is not None:
+            self.late += int(np.count_nonzero(start < self.watermark))
+        self.rows += len(row)
+
+        batch = {"row": row, "profile": profile, "geo": geo, "start": start, "end": end,
+                 "flag": np.zeros(len(row), dtype=bool)}
+        merged = {name: np.concatenate([self.state[name], batch[name]]) for name in _FIELDS}
+        order = np.lexsort((merged["start"], merged["profile"]))
+        merged = {name: values[order] for name, values in merged.items()}
+        sweep_overlaps(merged)
+
+        watermark = int(start.max()) - self.lateness
+        self.watermark = watermark if self.watermark is None else max(self.watermark, watermark)
+        final = merged["end"] <= self.watermark
+        self.state = {name: values[~final] for name, values in merged.items()}
+        self.peak_state = max(self.peak_state, len(self.state["row"]))
+        return merged["row"][final], merged["flag"][final]
+
+    def flush(self):
+        import numpy as np
+
+        row, flag = self.state["row"], self.state["flag"]
+        self.state = {name: values[:0] for name, values in self.state.items()}
+        return np.asarray(row), np.asarray(flag)
+
+
+def sweep_overlaps(sessions):
+    """
+    Set sessions["flag"] for every pair of same-profile, different-geo sessions
+    that overlap. Sessions must be sorted by (profile, start).
+    """
+    import numpy as np
+
+    profile, geo, start, end, flag = (sessions[name] for name in ("profile", "geo", "start", "end", "flag"))
+    i = np.arange(len(profile) - 1)
+    offset = 1
+    while len(i):
+        j = i + offset
+        # Sorted by start, so once j starts after i ends no later j can overlap i
+        open_ = (profile[j] == profile[i]) & (start[j] < end[i])
+        i, j = i[open_], j[open_]
+        hit = (geo[i] != geo[j]) & (start[i] < end[j])
+        flag[i[hit]] = True
+        flag[j[hit]] = True
+        i = i[j + 1 < len(profile)]
+        offset += 1
+
+
+def read_batches(con, date=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield (row, profile, geo, start, end) int64 arrays in table (arrival) order."""
+    where = "WHERE profile_key IS NOT NULL AND start_ts IS NOT NULL"
+    params = []
+    if date:
+        where += " AND start_date = CAST(? AS DATE)"
+        params.append(date)
+    result = con.execute(f"""
+        SELECT rowid, profile_key, coalesce(geo_key, -1),
+               epoch_us(start_ts), coalesce(epoch_us(end_ts), epoch_us(start_ts))
+        FROM {SESSION_TABLE}
+        {where}
+    """, params)
+    # to_arrow_reader() replaced fetch_record_batch() in newer DuckDB releases
+    fetch = getattr(result, "to_arrow_reader", None) or result.fetch_record_batch
+    for batch in fetch(batch_size):
+        yield tuple(column.to_numpy() for column in batch.columns)
+
+
+def detect(con, date=None, lateness_minutes=DEFAULT_LATENESS_MINUTES,
+           max_session_hours=DEFAULT_MAX_SESSION_HOURS, batch_size=DEFAULT_BATCH_SIZE):
+    """Run the detector over the table. Returns (flagged rowids, detector)."""
+    import numpy as np
+
+    detector = ConcurrentGeoDetector(lateness_minutes, max_session_hours)
+    flagged = []
+    for batch in read_batches(con, date, batch_size):
+        row, flag = detector.push(*batch)
+        flagged.append(row[flag])
+    row, flag = detector.flush()
+    flagged.append(row[flag])
+    return np.concatenate(flagged), detector
+
+
+def write_flags(con, flagged, date=None):
+    """Set concurrent_stream_flag: true for flagged rowids, false for the rest of the scope."""
+    from local_dw import register_arrays
+
+    where, params = "", []
+    if date:
+        where, params = "WHERE start_date = CAST(? AS DATE)", [date]
+    register_arrays(con, "concurrent_flagged", {"flagged_rowid": flagged})
+    con.execute("BEGIN")
+    try:
+        con.execute(f"UPDATE {SESSION_TABLE} SET concurrent_stream_flag = false {where}", params)
+        con.execute(f"""
+            UPDATE {SESSION_TABLE} SET concurrent_stream_flag = true
+            WHERE rowid IN (SELECT flagged_rowid FROM concurrent_flagged)
+        """)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("concurrent_flagged")
+
+
+def verify_flags(con, date=None, max_session_hours=DEFAULT_MAX_SESSION_HOURS):
+    """Count sessions whose stored flag differs from a self-join over the same scope."""
+    where, params = "", []
+    if date:
+        where, params = "AND start_date = CAST(? AS DATE)", [date]
+    max_session = int(max_session_hours * 60 * _US_PER_MINUTE)
+    return con.execute(f"""
+        WITH s AS (
+            SELECT rowid AS r, profile_key, coalesce(geo_key, -1) AS geo_key,
+                   epoch_us(start_ts) AS s,
+                   least(greatest(coalesce(epoch_us(end_ts), epoch_us(start_ts)), epoch_us(start_ts)),
+                         epoch_us(start_ts) + {max_session}) AS e,
+                   coalesce(concurrent_stream_flag, false) AS stored
+            FROM {SESSION_TABLE}
+            WHERE profile_key IS NOT NULL AND start_ts IS NOT NULL {where}
+        ),
+        expected AS (
+            SELECT DISTINCT a.r
+            FROM s a JOIN s b
+              ON b.profile_key = a.profile_key AND b.r <> a.r AND b.geo_key <> a.geo_key
+             AND a.s < b.e AND b.s < a.e
+        )
+        SELECT count(*) FROM s LEFT JOIN expected x ON x.r = s.r
+        WHERE s.stored <> (x.r IS NOT NULL)
+    """, params).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag concurrent streams from distinct geos in fact_viewing_session")
+    parser.add_argument("--database", default="netflix_dw.duckdb", help="DuckDB database file (see local_dw.py)")
+    parser.add_argument("--date", help="Only sessions with this start_date (YYYY-MM-DD)")
+    parser.add_argument("--lateness-minutes", type=float, default=DEFAULT_LATENESS_MINUTES,
+                        help="How far behind the latest start_ts a session may arrive")
+    parser.add_argument("--max-session-hours", type=float, default=DEFAULT_MAX_SESSION_HOURS,
+                        help="Cap on session length (bounds detector state)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Sessions read per batch")
+    parser.add_argument("--dry-run", action="store_true", help="Report counts without updating the table")
+    parser.add_argument("--verify", action="store_true", help="Check stored flags against a SQL self-join")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+        import numpy
+        import pyarrow
+    except ImportError:
+        print("Error: pip install duckdb numpy pyarrow")
+        return
+
+    from local_dw import connect, create_schema
+
+    con = connect(args.database)
+    create_schema(con)
+
+    started = time.perf_counter()
+    flagged, detector = detect(con, args.date, args.lateness_minutes, args.max_session_hours, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {detector.rows:,} sessions in {elapsed:.2f}s: {len(flagged):,} flagged, "
+          f"{detector.late:,} late, peak state {detector.peak_state:,} sessions")
+
+    if not args.dry_run:
+        write_flags(con, flagged, args.date)
+        print(f"  Updated concurrent_stream_flag in {SESSION_TABLE}")
+
+    if args.verify:
+        mismatches = verify_flags(con, args.date, args.max_session_hours)
+        print(f"  {'✓' if mismatches == 0 else '✗'} {mismatches} session(s) differ from the self-join")
+
+
+if __name__ == "__main__":
+    main()
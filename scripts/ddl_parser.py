@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Parse Netflix_BigQuery_DDL.sql into the SCHEMA structure generate_erd.py uses.
+
+Each CREATE TABLE becomes a SCHEMA entry with the same column tuples
+("name", "TYPE"[, "PK" | "FK" | "PK,FK"[, "dim_x.x_key"]]), plus the
+BigQuery details the hand-written dict never had:
+
+    "not_null":     ["date_key", ...]
+    "partition_by": "event_date"            (raw expression, or None)
+    "cluster_by":   ["user_key", "plan_key"]
+
+Keys come from PRIMARY KEY / FOREIGN KEY ... REFERENCES clauses when the
+DDL declares them. Otherwise the first column is the primary key and a
+`<role>_<dim pk>` column (event_date_key, from_plan_key, geo_key) is a
+foreign key to the dimension owning that primary key.
+
+Parsed results are cached on disk keyed by the file's SHA-256, so repeated
+runs skip parsing entirely.
+
+Usage:
+    python scripts/ddl_parser.py                      # summary of the parsed DDL
+    python scripts/ddl_parser.py --diff-schema        # compare with SCHEMA in generate_erd.py
+    python scripts/ddl_parser.py --json schema.json   # dump the parsed structure
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+
+DEFAULT_DDL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Netflix_BigQuery_DDL.sql"
+)
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("ERD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "netflix_dw_erd")), "ddl"
+)
+# Bump when the parsed structure changes so old cache entries are ignored
+PARSER_VERSION = 1
+
+_CREATE_RE = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?([\w.\-]+)`?\s*\(",
+    re.IGNORECASE,
+)
+_COLUMN_END_RE = re.compile(r"\s+(NOT\s+NULL|OPTIONS|DEFAULT|COLLATE|PRIMARY\s+KEY|REFERENCES)\b", re.IGNORECASE)
+_PK_RE = re.compile(r"^PRIMARY\s+KEY\s*\(([^)]*)\)", re.IGNORECASE)
+_FK_RE = re.compile(
+    r"^(?:CONSTRAINT\s+\w+\s+)?FOREIGN\s+KEY\s*\(([^)]*)\)\s*REFERENCES\s+`?([\w.\-]+)`?\s*\(([^)]*)\)",
+    re.IGNORECASE,
+)
+
+
+def strip_comments(sql):
+    """Remove -- and /* */ comments, leaving string literals alone."""
+    out = []
+    i, n = 0, len(sql)
+    quote = None
+    while i < n:
+        ch = sql[i]
+        if quote:
+            out.append(ch)
+            if ch == "\\" and i + 1 < n:
+                out.append(sql[i + 1])
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+            i += 1
+        elif ch in "'\"":
+            quote = ch
+            out.append(ch)
+            i += 1
+        elif sql.startswith("--", i) or ch == "#":
+            while i < n and sql[i] != "\n":
+                i += 1
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def split_top_level(text, sep=","):
+    """Split on `sep` outside (), <> and [] nesting."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch in "(<[":
+            depth += 1
+        elif ch in ")>]":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _matching_paren(text, open_pos):
+    depth = 0
+    for i in range(open_pos, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("unbalanced parentheses in DDL")
+
+
+def _names(text):
+    return [name.strip().strip("`") for name in text.split(",") if name.strip()]
+
+
+def parse_create_tables(sql):
+    """
+    Parse every CREATE TABLE statement.
+    Returns {table_name: {"columns": [(name, type)], "not_null", "partition_by",
+    "cluster_by", "primary_key", "foreign_keys": {col: "table.col"}}}.
+    """
+    sql = strip_comments(sql)
+    tables = {}
+    for match in _CREATE_RE.finditer(sql):
+        table_name = match.group(1).split(".")[-1]
+        body_end = _matching_paren(sql, match.end() - 1)
+        body = sql[match.end():body_end]
+        semicolon = sql.find(";", body_end)
+        tail = sql[body_end + 1:semicolon if semicolon != -1 else len(sql)]
+
+        table = {
+            "columns": [],
+            "not_null": [],
+            "partition_by": None,
+            "cluster_by": [],
+            "primary_key": [],
+            "foreign_keys": {},
+        }
+        for item in split_top_level(body):
+            pk = _PK_RE.match(item)
+            fk = _FK_RE.match(item)
+            if pk:
+                table["primary_key"] = _names(pk.group(1))
+                continue
+            if fk:
+                ref_table = fk.group(2).split(".")[-1]
+                for col, ref_col in zip(_names(fk.group(1)), _names(fk.group(3))):
+                    table["foreign_keys"][col] = f"{ref_table}.{ref_col}"
+                continue
+
+            name, _, rest = item.partition(" ")
+            name = name.strip("`")
+            end = _COLUMN_END_RE.search(" " + rest)
+            col_type = (rest[:end.start() - 1] if end else rest).strip()
+            table["columns"].append((name, re.sub(r"\s+", " ", col_type).upper()))
+            if re.search(r"\bNOT\s+NULL\b", rest, re.IGNORECASE):
+                table["not_null"].append(name)
+            if re.search(r"\bPRIMARY\s+KEY\b", rest, re.IGNORECASE):
+                table["primary_key"] = [name]
+            inline_fk = re.search(r"\bREFERENCES\s+`?([\w.\-]+)`?\s*\(\s*`?(\w+)`?\s*\)", rest, re.IGNORECASE)
+            if inline_fk:
+                table["foreign_keys"][name] = f"{inline_fk.group(1).split('.')[-1]}.{inline_fk.group(2)}"
+
+        partition = re.search(r"PARTITION\s+BY\s+(.+?)(?=\s+CLUSTER\s+BY|\s+OPTIONS\s*\(|$)", tail, re.IGNORECASE | re.DOTALL)
+        if partition:
+            table["partition_by"] = re.sub(r"\s+", " ", partition.group(1)).strip()
+        cluster = re.search(r"CLUSTER\s+BY\s+(.+?)(?=\s+OPTIONS\s*\(|$)", tail, re.IGNORECASE | re.DOTALL)
+        if cluster:
+            table["cluster_by"] = _names(cluster.group(1))
+
+        tables[table_name] = table
+    return tables
+
+
+def _infer_keys(tables):
+    """Fill in primary/foreign keys for tables whose DDL does not declare them."""
+    for table in tables.values():
+        if not table["primary_key"] and table["columns"]:
+            table["primary_key"] = [table["columns"][0][0]]
+
+    # Dimension PK column -> dimension (dim_geography owns geo_key)
+    pk_owner = {}
+    for table_name, table in tables.items():
+        if table_name.startswith("dim_") and len(table["primary_key"]) == 1:
+            pk_owner.setdefault(table["primary_key"][0], table_name)
+
+    for table_name, table in tables.items():
+        if table["foreign_keys"]:
+            continue
+        for col_name, _ in table["columns"]:
+            if col_name in table["primary_key"] and table_name.startswith("dim_"):
+                continue
+            # Longest `<pk>` suffix wins: month_start_date_key -> date_key
+            pos = 0
+            while pos != -1:
+                suffix = col_name[pos + 1:] if pos else col_name
+                owner = pk_owner.get(suffix)
+                if owner and owner != table_name:
+                    table["foreign_keys"][col_name] = f"{owner}.{suffix}"
+                    break
+                pos = col_name.find("_", pos + 1)
+
+
+def to_schema(tables):
+    """Convert parsed tables to the SCHEMA dict shape used by generate_erd.py."""
+    _infer_keys(tables)
+    schema = {"dimensions": {}, "facts": {}}
+    for table_name, table in tables.items():
+        columns = []
+        for col_name, col_type in table["columns"]:
+            flags = []
+            if col_name in table["primary_key"]:
+                flags.append("PK")
+            if col_name in table["foreign_keys"]:
+                flags.append("FK")
+            col = (col_name, col_type)
+            if flags:
+                col += (",".join(flags),)
+            if col_name in table["foreign_keys"]:
+                col += (table["foreign_keys"][col_name],)
+            columns.append(col)
+
+        section = "facts" if table_name.startswith("fact_") else "dimensions"
+        schema[section][table_name] = {
+            "columns": columns,
+            "not_null": table["not_null"],
+            "partition_by": table["partition_by"],
+            "cluster_by": table["cluster_by"],
+        }
+    return schema
+
+
+def parse_ddl(sql):
+    """Parse DDL text straight into a SCHEMA-shaped dict."""
+    return to_schema(parse_create_tables(sql))
+
+
+def _from_json(schema):
+    """JSON stores tuples as lists; restore the column tuples."""
+    for section in ("dimensions", "facts"):
+        for table_def in schema[section].values():
+            table_def["columns"] = [tuple(col) for col in table_def["columns"]]
+    return schema
+
+
+def load_ddl_schema(path=DEFAULT_DDL_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Parse a DDL file into a SCHEMA dict, reusing the cached parse when the
+    file's SHA-256 matches. Pass cache_dir=None to always parse.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    cache_path = None
+    if cache_dir:
+        digest = hashlib.sha256(raw + f"\nparser={PARSER_VERSION}".encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{digest}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                return _from_json(json.load(f))
+
+    schema = parse_ddl(raw.decode("utf-8"))
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+        os.replace(tmp_path, cache_path)
+    return schema
+
+
+def schema_to_tables(schema):
+    """Convert a SCHEMA dict to the {table: [{"name", "type", "nullable"}]} shape of generate_bq_erd."""
+    tables = {}
+    for section in ("dimensions", "facts"):
+        for table_name, table_def in schema[section].items():
+            not_null = set(table_def.get("not_null", []))
+            tables[table_name] = [
+                {"name": c[0], "type": c[1], "nullable": c[0] not in not_null}
+                for c in table_def["columns"]
+            ]
+    return dict(sorted(tables.items()))
+
+
+def diff_schemas(parsed, reference):
+    """List human-readable differences between two SCHEMA dicts (columns and keys)."""
+    differences = []
+    for section in ("dimensions", "facts"):
+        left, right = parsed[section], reference[section]
+        for name in sorted(set(left) ^ set(right)):
+            where = "DDL" if name in left else "SCHEMA"
+            differences.append(f"{name}: only in {where}")
+        for name in sorted(set(left) & set(right)):
+            left_cols = {c[0]: tuple(c) for c in left[name]["columns"]}
+            right_cols = {c[0]: tuple(c) for c in right[name]["columns"]}
+            for col in sorted(set(left_cols) | set(right_cols)):
+                if left_cols.get(col) != right_cols.get(col):
+                    differences.append(f"{name}.{col}: DDL {left_cols.get(col)} != SCHEMA {right_cols.get(col)}")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse Netflix_BigQuery_DDL.sql into the ERD SCHEMA structure")
+    parser.add_argument("--ddl", default=DEFAULT_DDL_PATH, help="BigQuery DDL file")
+    parser.add_argument("--json", help="Write the parsed schema to this JSON file")
+    parser.add_argument("--diff-schema", action="store_true", help="Compare with SCHEMA in generate_erd.py")
+    parser.add_argument("--ignore-columns", nargs="*", default=["etl_inserted_ts", "etl_updated_ts", "etl_batch_id"],
+                        help="Columns skipped by --diff-schema")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-parse the DDL")
+
+    args = parser.parse_args()
+
+    schema = load_ddl_schema(args.ddl, cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR)
+    print(f"Parsed {len(schema['dimensions'])} dimensions, {len(schema['facts'])} facts from {args.ddl}")
+    for table_name, table_def in schema["facts"].items():
+        cluster = ", ".join(table_def["cluster_by"]) or "-"
+        print(f"  {table_name}: PARTITION BY {table_def['partition_by'] or '-'} / CLUSTER BY {cluster}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=2)
+        print(f"Schema saved to {args.json}")
+
+    if args.diff_schema:
+        from generate_erd import SCHEMA
+
+        ignored = set(args.ignore_columns)
+        trimmed = {
+            section: {
+                name: {"columns": [c for c in table_def["columns"] if c[0] not in ignored]}
+                for name, table_def in schema[section].items()
+            }
+            for section in ("dimensions", "facts")
+        }
+        differences = diff_schemas(trimmed, SCHEMA)
+        print(f"\n{len(differences)} difference(s) from SCHEMA in generate_erd.py")
+        for difference in differences:
+            print(f"  {difference}")
+
+
+if __name__ == "__main__":
+    main()
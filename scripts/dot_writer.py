@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Streaming DOT writer shared by the ERD scripts.
+
+Table nodes and edges are written piece by piece to any text stream (a
+StringIO buffer, an open file, or the stdin of a `dot` process) instead of
+being assembled from `+=` strings and line lists, so wide tables and very
+large ERDs never hold more than one row of HTML at a time.
+
+Usage:
+    buffer = io.StringIO()
+    writer = DotWriter(buffer)
+    writer.begin("star_schema", 'graph [rankdir=LR];', 'node [shape=none];')
+    writer.table_node("dim_date", column_rows(columns), header_color="#87CEEB", bg_color="#E6F3FF")
+    writer.edge("fact_x", "date_key", "dim_date", "date_key")
+    writer.end()
+
+    # Or render without building the text in memory:
+    with pipe_to_dot("out/full_erd.png") as writer:
+        ...
+"""
+
+import io
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import erd_profile
+
+
+class DotWriter:
+    """Write a DOT digraph to a text stream one line at a time."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._started = False
+        self.chars_written = 0
+        self.nodes = 0
+        self.edges = 0
+
+    def write(self, text):
+        self.stream.write(text)
+        self.chars_written += len(text)
+
+    def line(self, text=""):
+        """Start a new line (lines are newline-separated, no trailing newline)."""
+        if self._started:
+            self.write("\n")
+        self._started = True
+        self.write(text)
+
+    def begin(self, graph_name, *attr_lines):
+        """Open the digraph and write its graph/node/edge attribute lines."""
+        self.line(f"digraph {graph_name} {{")
+        for attr in attr_lines:
+            self.line(f"  {attr}")
+        self.line("")
+
+    def table_node(self, name, rows, header_color, bg_color=None, border=1, colspan=2, header_rows=()):
+        """
+        Write one HTML-table node. `rows` is an iterable of <TR> strings and is
+        consumed lazily; `header_rows` are extra lines written after the title.
+        """
+        self.nodes += 1
+        bg_attr = f' BGCOLOR="{bg_color}"' if bg_color else ""
+        self.line(f'  {name} [label=<<TABLE BORDER="{border}" CELLBORDER="0" CELLSPACING="0"{bg_attr}>')
+        self.line(f'    <TR><TD COLSPAN="{colspan}" BGCOLOR="{header_color}"><B>{name}</B></TD></TR>')
+        for header_row in header_rows:
+            self.line(f"    {header_row}")
+        self.line("    ")
+        for row in rows:
+            self.write(row)
+        self.line("  </TABLE>>];")
+
+    def edge(self, src, src_port, dst, dst_port):
+        self.edges += 1
+        self.line(f"  {src}:{src_port} -> {dst}:{dst_port};")
+
+    def end(self):
+        self.line("}")
+
+
+def column_rows(columns, limit=None, ports=True):
+    """
+    Yield name/type <TR> rows for (name, type, ...) tuples or {"name", "type"} dicts.
+    With `limit`, rows past it collapse into a single "... +N more" row.
+    """
+    count = 0
+    for col in columns:
+        count += 1
+        if limit is not None and count > limit:
+            continue
+        name, col_type = (col["name"], col["type"]) if isinstance(col, dict) else (col[0], col[1])
+        port = f' PORT="{name}"' if ports else ""
+        yield f'<TR><TD ALIGN="LEFT"{port}>{name}</TD><TD ALIGN="LEFT">{col_type}</TD></TR>'
+    if limit is not None and count > limit:
+        yield f'<TR><TD COLSPAN="2">... +{count - limit} more</TD></TR>'
+
+
+def count_written(writer):
+    """Add a finished writer's nodes, edges and DOT size to the profile counters."""
+    erd_profile.count("dot_nodes", writer.nodes)
+    erd_profile.count("dot_edges", writer.edges)
+    erd_profile.count("dot_bytes", writer.chars_written)
+
+
+def dot_to_string(write_fn, *args, **kwargs):
+    """Run a write_*_dot(writer, ...) function against a buffer and return the DOT text."""
+    buffer = io.StringIO()
+    writer = DotWriter(buffer)
+    result = write_fn(writer, *args, **kwargs)
+    count_written(writer)
+    if result is None:
+        return buffer.getvalue()
+    return buffer.getvalue(), result
+
+
+@contextmanager
+def pipe_to_dot(output_file, output_format=None, engine="dot"):
+    """
+    Yield a DotWriter whose stream is the stdin of a `dot` process rendering
+    straight to output_file; no .gv temp file and no full DOT string in memory.
+    """
+    if output_format is None:
+        output_format = os.path.splitext(output_file)[1].lstrip(".") or "png"
+
+    # stderr goes to a temp file: dot can warn per edge, and a full stderr
+    # pipe would block it while we are still writing stdin
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as stderr_file:
+        proc = subprocess.Popen(
+            [engine, f"-T{output_format}", "-o", output_file],
+            stdin=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+            encoding="utf-8",
+        )
+        writer = DotWriter(proc.stdin)
+        try:
+            yield writer
+        except BrokenPipeError:
+            pass  # dot exited early; its status and stderr explain why
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = proc.wait()
+            count_written(writer)
+        if returncode != 0:
+            stderr_file.seek(0)
+            raise RuntimeError(f"{engine} exited with status {returncode}: {stderr_file.read().strip()}")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Small helpers shared by the warehouse tools (partition_advisor.py,
+rollups.py, bq_metadata.py): column widths for scan estimates, byte and
+row-count formatting, and walking DuckDB's serialized SQL (json_serialize_sql).
+"""
+
+# Approximate stored bytes per value
+TYPE_BYTES = {"INT64": 8, "FLOAT64": 8, "NUMERIC": 16, "BIGNUMERIC": 32, "BOOL": 1,
+              "DATE": 8, "DATETIME": 8, "TIME": 8, "TIMESTAMP": 8, "STRING": 16, "BYTES": 16}
+
+
+def table_columns(schema):
+    """{table: {column: type}} for every table in a SCHEMA-shaped dict."""
+    return {name: {c[0]: c[1] for c in table["columns"]}
+            for section in ("dimensions", "facts") for name, table in schema[section].items()}
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:,.1f} {unit}"
+        n /= 1024
+
+
+def format_count(n):
+    for unit in ("", "K", "M", "B"):
+        if abs(n) < 1000 or unit == "B":
+            return f"{n:,.0f}" if unit == "" else f"{n:,.1f}{unit}"
+        n /= 1000
+
+
+def is_select_node(obj):
+    return isinstance(obj, dict) and obj.get("type") == "SELECT_NODE"
+
+
+def select_nodes(obj):
+    """Every SELECT node in a serialized DuckDB statement (CTEs and subqueries included)."""
+    if isinstance(obj, dict):
+        if is_select_node(obj):
+            yield obj
+        for value in obj.values():
+            yield from select_nodes(value)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from select_nodes(value)
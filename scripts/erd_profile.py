@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing and profiling shared by the ERD scripts.
+
+Code marks phases with nested spans and bumps counters:
+
+    from erd_profile import count, span
+
+    with span("bq_query", dataset=dataset_id):
+        ...
+    count("tables", len(tables))
+
+Both are no-ops until a Profiler is active, so the instrumentation stays in
+place on normal runs. `--profile [TRACE]` (both scripts) activates one for
+the run and writes a Chrome trace-event JSON file (open it in
+chrome://tracing or https://ui.perfetto.dev): one complete event per span,
+per thread, so parallel renders show up side by side, plus the counter
+totals. A per-phase summary is printed to stderr at the end. `--profile-cprofile
+FILE` also runs cProfile on the main thread, dumps its stats to FILE and
+prints the hottest functions.
+
+Usage:
+    parser = argparse.ArgumentParser()
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiling(args):
+        ...
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_TRACE_PATH = "erd_profile.json"
+HOTTEST_FUNCTIONS = 15
+
+_active = None
+
+
+class Profiler:
+    """Collect spans and counters from any thread and write them as a Chrome trace."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _now_us(self):
+        return (time.perf_counter() - self.started) * 1e6
+
+    @contextmanager
+    def span(self, name, **args):
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": round(start, 1),
+                "dur": round(self._now_us() - start, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def trace(self):
+        """The run as a Chrome trace-event JSON object."""
+        main_tid = threading.main_thread().ident
+        workers = {}
+        for event in self.events:
+            if event["tid"] != main_tid:
+                workers.setdefault(event["tid"], f"worker-{len(workers) + 1}")
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in [(main_tid, "main"), *workers.items()]
+        ]
+        counter = {"name": "counters", "ph": "C", "ts": round(self._now_us(), 1), "pid": os.getpid(),
+                   "tid": 0, "args": dict(self.counters)}
+        return {
+            "traceEvents": metadata + sorted(self.events, key=lambda e: e["ts"]) + [counter],
+            "displayTimeUnit": "ms",
+            "otherData": {"argv": sys.argv, "counters": dict(self.counters)},
+        }
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+
+    def summary(self):
+        """
+        Total time and call count per span name, slowest first, plus the
+        counters. Spans on worker threads overlap, so their totals can
+        exceed the wall time of the run.
+        """
+        totals = {}
+        for event in self.events:
+            seconds, calls = totals.get(event["name"], (0.0, 0))
+            totals[event["name"]] = (seconds + event["dur"] / 1e6, calls + 1)
+
+        lines = [f"{'span':<28} {'calls':>7} {'total':>10} {'mean':>10}"]
+        for name, (seconds, calls) in sorted(totals.items(), key=lambda item: -item[1][0]):
+            lines.append(f"{name:<28} {calls:>7} {seconds:>9.3f}s {seconds / calls * 1000:>8.1f}ms")
+        if self.counters:
+            lines.append("counters: " + ", ".join(f"{k}={v:,}" for k, v in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+
+def span(name, **args):
+    """Time a block as a nested span of the active profiler (no-op when profiling is off)."""
+    if _active is None:
+        return nullcontext()
+    return _active.span(name, **args)
+
+
+def count(name, value=1):
+    """Add to a counter of the active profiler (no-op when profiling is off)."""
+    if _active is not None:
+        _active.count(name, value)
+
+
+def add_profile_arguments(parser):
+    """Add the shared --profile/--profile-cprofile options to an argparse parser."""
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_TRACE_PATH,
+                        help=f"Write a Chrome trace of every phase and diagram (default: {DEFAULT_TRACE_PATH})")
+    parser.add_argument("--profile-cprofile", metavar="FILE",
+                        help="Also run cProfile on the main thread and dump its stats to FILE")
+
+
+@contextmanager
+def profiling(args):
+    """Activate a Profiler for the block when --profile/--profile-cprofile was given."""
+    global _active
+    if not (args.profile or args.profile_cprofile):
+        yield None
+        return
+
+    profiler = Profiler()
+    cprofile = None
+    if args.profile_cprofile:
+        import cProfile
+
+        cprofile = cProfile.Profile()
+    _active = profiler
+    try:
+        with profiler.span("run", argv=" ".join(sys.argv[1:])):
+            if cprofile is not None:
+                cprofile.enable()
+            try:
+                yield profiler
+            finally:
+                if cprofile is not None:
+                    cprofile.disable()
+    finally:
+        _active = None
+        # stderr, so profiling `--method quickdbd > schema.txt` leaves the output clean
+        print(f"\n{profiler.summary()}", file=sys.stderr)
+        if args.profile:
+            profiler.write(args.profile)
+            print(f"Trace saved to {args.profile}", file=sys.stderr)
+        if cprofile is not None:
+            import pstats
+
+            cprofile.dump_stats(args.profile_cprofile)
+            print(f"cProfile stats saved to {args.profile_cprofile}; hottest functions:", file=sys.stderr)
+            pstats.Stats(cprofile, stream=sys.stderr).sort_stats("tottime").print_stats(HOTTEST_FUNCTIONS)
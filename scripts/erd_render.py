@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Shared rendering helpers for the ERD scripts.
+
+Diagrams are built as DOT text first and rendered afterwards, so the
+blocking `dot` calls can run on a worker pool (--jobs N). Rendered files
+can be kept in a content-addressed cache keyed by the DOT source, the
+Graphviz version and the output format, so unchanged diagrams are copied
+instead of re-rendered.
+
+Rendering goes through a pluggable backend: "subprocess" (default) runs the
+`dot` binary per diagram via the graphviz package; "pygraphviz" lays out and
+renders in-process through the Graphviz C library, with no temp .gv file and
+no fork/exec per diagram.
+
+Usage:
+    from erd_render import RenderCache, render_dot, render_many
+
+    cache = RenderCache()
+    jobs = [("out/dim_date", dot_text), ("out/full_erd", dot_text2)]
+    for output_file, error in render_many(jobs, workers=4, cache=cache):
+        ...
+    cache.evict()
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from erd_profile import count, span
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "ERD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "netflix_dw_erd")
+)
+DEFAULT_CACHE_MAX_MB = 500
+DEFAULT_CACHE_MAX_AGE_DAYS = 30
+DEFAULT_BACKEND = "subprocess"
+
+# libgvc keeps global state and is not thread-safe; in-process renders take turns
+_GRAPHVIZ_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def graphviz_version():
+    """Installed Graphviz version as a string (part of every cache key)."""
+    import graphviz
+
+    try:
+        return ".".join(str(part) for part in graphviz.version())
+    except Exception:
+        return "unknown"
+
+
+class RenderCache:
+    """
+    Persistent on-disk cache of rendered diagrams.
+
+    Entries live at <cache_dir>/<key[:2]>/<key>.<format>, where key is the
+    SHA-256 of the Graphviz version, output format and DOT source. Hits are
+    hard-linked into the output directory (copied when linking is not
+    possible). evict() drops entries older than max_age_days, then the least
+    recently used ones until the cache fits in max_mb.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MAX_MB,
+                 max_age_days=DEFAULT_CACHE_MAX_AGE_DAYS):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, dot_content, output_format, backend=DEFAULT_BACKEND):
+        digest = hashlib.sha256()
+        digest.update(f"graphviz={graphviz_version()}\nformat={output_format}\n".encode())
+        if backend != DEFAULT_BACKEND:
+            # Bindings may link a different libgvc than the dot binary
+            digest.update(f"backend={backend_version(backend)}\n".encode())
+        digest.update(dot_content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key, output_format):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{output_format}")
+
+    def fetch(self, key, output_format, output_file):
+        """Place a cached artifact at output_file. Returns False on a miss."""
+        cached = self.path(key, output_format)
+        if not os.path.exists(cached):
+            with self._lock:
+                self.misses += 1
+            return False
+
+        _remove(output_file)
+        try:
+            os.link(cached, output_file)
+        except OSError:
+            shutil.copy2(cached, output_file)
+        # Touch the entry so eviction sees it as recently used
+        os.utime(cached)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, output_format, output_file):
+        """Copy a freshly rendered file into the cache (atomic rename)."""
+        cached = self.path(key, output_format)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(output_file, tmp_path)
+        os.replace(tmp_path, cached)
+
+    def evict(self):
+        """Apply the age and size limits. Returns the number of entries removed."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        return f"render cache: {self.hits} hit(s), {self.misses} miss(es) in {self.cache_dir}"
+
+
+def add_cache_arguments(parser):
+    """Add the shared --cache-dir/--no-cache/... options to an argparse parser."""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Render cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-render diagrams")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB,
+                        help="Evict least recently used entries above this size")
+    parser.add_argument("--cache-max-age-days", type=float, default=DEFAULT_CACHE_MAX_AGE_DAYS,
+                        help="Evict entries not used for this many days")
+
+
+def cache_from_args(args):
+    """Build a RenderCache from parsed arguments (None when --no-cache)."""
+    if args.no_cache:
+        return None
+    return RenderCache(args.cache_dir, args.cache_max_mb, args.cache_max_age_days)
+
+
+def _render_subprocess(dot_content, output_base, output_format):
+    """Write a temp .gv file and run the dot binary on it (graphviz package)."""
+    import graphviz
+
+    graph = graphviz.Source(dot_content)
+    graph.render(output_base, format=output_format, cleanup=True)
+
+
+def _render_pygraphviz(dot_content, output_base, output_format):
+    """Lay out and render in-process through libgvc (pygraphviz >= 1.7)."""
+    import pygraphviz
+
+    with _GRAPHVIZ_LOCK:
+        graph = pygraphviz.AGraph(string=dot_content)
+        graph.draw(f"{output_base}.{output_format}", format=output_format, prog="dot")
+
+
+RENDER_BACKENDS = {
+    "subprocess": _render_subprocess,
+    "pygraphviz": _render_pygraphviz,
+}
+
+
+def backend_available(backend):
+    if backend == "pygraphviz":
+        try:
+            import pygraphviz
+        except ImportError:
+            return False
+    return backend in RENDER_BACKENDS
+
+
+@lru_cache(maxsize=None)
+def backend_version(backend):
+    if backend == "pygraphviz":
+        import pygraphviz
+
+        return f"pygraphviz-{pygraphviz.__version__}"
+    return backend
+
+
+def resolve_backend(name):
+    """Map a --render-backend choice to an available backend, falling back to subprocess."""
+    if name == "auto":
+        return "pygraphviz" if backend_available("pygraphviz") else DEFAULT_BACKEND
+    if not backend_available(name):
+        print(f"Render backend {name!r} not available (pip install pygraphviz); using {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return name
+
+
+def add_backend_argument(parser):
+    """Add the shared --render-backend option to an argparse parser."""
+    parser.add_argument("--render-backend", choices=["auto", *RENDER_BACKENDS], default=DEFAULT_BACKEND,
+                        help="subprocess runs dot per diagram; pygraphviz renders in-process; auto picks pygraphviz when installed")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def render_dot(dot_content, output_base, output_format="png", cache=None, backend=DEFAULT_BACKEND):
+    """
+    Render DOT text to <output_base>.<output_format> and return the file path.
+
+    `dot_content` may also be a write function taking a dot_writer.DotWriter;
+    it is then streamed straight into `dot` stdin and the cache is skipped,
+    since there is no DOT text to hash (whatever the backend).
+    """
+    output_file = f"{output_base}.{output_format}"
+    diagram = os.path.basename(output_base)
+
+    if callable(dot_content):
+        from dot_writer import pipe_to_dot
+
+        with span("render_stream", diagram=diagram):
+            with pipe_to_dot(output_file, output_format) as writer:
+                dot_content(writer)
+        count("output_bytes", os.path.getsize(output_file))
+        return output_file
+
+    key = None
+    if cache is not None:
+        with span("cache_fetch", diagram=diagram):
+            key = cache.key(dot_content, output_format, backend)
+            hit = cache.fetch(key, output_format, output_file)
+        if hit:
+            count("cache_hits")
+            return output_file
+        # The old output may be a hard link into the cache; never write through it
+        _remove(output_file)
+
+    with span("render", diagram=diagram, backend=backend):
+        RENDER_BACKENDS[backend](dot_content, output_base, output_format)
+    count("diagrams_rendered")
+    count("output_bytes", os.path.getsize(output_file))
+
+    if cache is not None:
+        cache.store(key, output_format, output_file)
+
+    return output_file
+
+
+def _render_job(job, cache=None, backend=DEFAULT_BACKEND):
+    """Render one (output_base, dot_content[, format]) job, capturing the error."""
+    output_base, dot_content = job[0], job[1]
+    output_format = job[2] if len(job) > 2 else "png"
+    try:
+        return render_dot(dot_content, output_base, output_format, cache, backend), None
+    except Exception as e:
+        return f"{output_base}.{output_format}", e
+
+
+def render_many(jobs, workers=1, cache=None, backend=DEFAULT_BACKEND):
+    """
+    Render a list of (output_base, dot_content[, format]) jobs.
+    dot_content is DOT text or a DotWriter write function (see render_dot).
+
+    Yields (output_file, error) in the same order as `jobs`, so progress
+    output stays deterministic no matter which render finishes first.
+    `error` is None on success; a failed diagram never stops the others.
+    With the subprocess backend each render is a `dot` process, so threads
+    are enough to run them in parallel; pygraphviz renders are serialized
+    (cache lookups still overlap).
+    """
+    jobs = list(jobs)
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _render_job(job, cache, backend)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_render_job, job, cache, backend) for job in jobs]
+        for future in futures:
+            yield future.result()
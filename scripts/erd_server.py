@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Long-running ERD render server with a warm in-memory cache.
+
+Keeps SCHEMA, DOT sources and rendered SVG/PNG bytes in one LRU cache, so
+the docs portal pays Python startup and schema construction once instead of
+per request. Requests are handled with asyncio; concurrent requests for the
+same diagram share a single render, done by the --render-backend (see
+erd_render.py) on a worker thread.
+
+Endpoints (GET):
+    /                        JSON index of every diagram URL
+    /erd.{svg,png,dot}       full ERD
+    /star/<fact>.{svg,png,dot}
+    /table/<table>.{svg,png,dot}
+    /quickdbd                QuickDBD text
+    /stats                   cache and render counters
+
+Usage:
+    python scripts/generate_erd.py --method serve --port 8765
+    python scripts/generate_erd.py --method serve --ddl --render-workers 4
+    python scripts/generate_erd.py --method serve --render-backend pygraphviz
+    curl -o star.svg http://127.0.0.1:8765/star/fact_subscription_event.svg
+
+Binds to 127.0.0.1 by default. The subprocess backend requires the `dot`
+binary (brew install graphviz); pygraphviz renders in-process.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+from erd_render import DEFAULT_BACKEND, RENDER_BACKENDS, resolve_backend
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_MB = 256
+DEFAULT_RENDER_WORKERS = 4
+
+CONTENT_TYPES = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "dot": "text/vnd.graphviz; charset=utf-8",
+    "txt": "text/plain; charset=utf-8",
+    "json": "application/json",
+}
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class LRUBytesCache:
+    """OrderedDict LRU bounded by total payload bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ERDServer:
+    """Build and render diagrams on demand; all state lives on the event loop thread."""
+
+    def __init__(self, schema, cache_mb=DEFAULT_CACHE_MB, render_workers=DEFAULT_RENDER_WORKERS, backend=DEFAULT_BACKEND):
+        from ddl_parser import schema_to_tables
+
+        self.schema = schema
+        self.tables = schema_to_tables(schema)
+        self.backend = backend
+        self.render_workers = render_workers
+        self.cache = LRUBytesCache(cache_mb * 1024 * 1024)
+        self.renders = 0
+        self.shared = 0
+        self.started = time.time()
+        self._inflight = {}
+        self._render_slots = None
+
+    def diagram_urls(self):
+        urls = ["/erd.svg", "/quickdbd"]
+        urls += [f"/star/{fact}.svg" for fact in self.schema["facts"]]
+        urls += [f"/table/{table}.svg" for table in self.tables]
+        return urls
+
+    def build_dot(self, kind, name):
+        """Build DOT text for a diagram, or raise KeyError when it does not exist."""
+        from dot_writer import dot_to_string
+        from generate_bq_erd import build_table_dot
+        from generate_erd import build_star_schema_dot, write_erd_dot
+
+        if kind == "erd":
+            return dot_to_string(write_erd_dot, self.schema)
+        if kind == "star":
+            dot_content, _ = build_star_schema_dot(name, self.schema["facts"][name], self.schema)
+            return dot_content
+        if kind == "table":
+            return build_table_dot(name, self.tables[name], is_fact=name.startswith("fact_"))
+        raise KeyError(kind)
+
+    def dot_source(self, kind, name):
+        key = (kind, name, "dot")
+        source = self.cache.get(key)
+        if source is None:
+            source = self.build_dot(kind, name).encode("utf-8")
+            self.cache.put(key, source)
+        return source
+
+    def _render_file(self, source, output_format):
+        """Render through the backend into a temp directory and return the bytes (worker thread)."""
+        with tempfile.TemporaryDirectory(prefix="erd_server_") as tmp_dir:
+            output_base = os.path.join(tmp_dir, "diagram")
+            RENDER_BACKENDS[self.backend](source.decode("utf-8"), output_base, output_format)
+            with open(f"{output_base}.{output_format}", "rb") as f:
+                return f.read()
+
+    async def _render(self, source, output_format):
+        async with self._render_slots:
+            rendered = await asyncio.get_running_loop().run_in_executor(
+                None, self._render_file, source, output_format
+            )
+        self.renders += 1
+        return rendered
+
+    async def render(self, kind, name, output_format):
+        """Return rendered bytes, joining an in-flight render of the same diagram if there is one."""
+        if output_format == "dot":
+            return self.dot_source(kind, name)
+
+        key = (kind, name, output_format)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            source = self.dot_source(kind, name)
+            task = asyncio.ensure_future(self._render(source, output_format))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        # shield: one client disconnecting must not cancel the render for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache.put(key, task.result())
+
+    def stats(self):
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "cache_entries": len(self.cache),
+            "cache_bytes": self.cache.size,
+            "cache_max_bytes": self.cache.max_bytes,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_evictions": self.cache.evictions,
+            "renders": self.renders,
+            "shared_renders": self.shared,
+            "inflight": len(self._inflight),
+        }
+
+    async def route(self, path):
+        """Map a request path to (status, content type, body)."""
+        path = unquote(urlsplit(path).path).rstrip("/") or "/"
+        if path == "/":
+            return 200, "json", json.dumps({"diagrams": self.diagram_urls()}, indent=2).encode()
+        if path == "/stats":
+            return 200, "json", json.dumps(self.stats(), indent=2).encode()
+        if path == "/quickdbd":
+            from generate_erd import generate_quickdbd_format
+
+            key = ("quickdbd", None, "txt")
+            body = self.cache.get(key)
+            if body is None:
+                body = generate_quickdbd_format(self.schema).encode("utf-8")
+                self.cache.put(key, body)
+            return 200, "txt", body
+
+        parts = path.strip("/").split("/")
+        stem, _, output_format = parts[-1].rpartition(".")
+        if not stem or output_format not in ("svg", "png", "dot"):
+            return 400, "txt", b"expected a .svg, .png or .dot diagram\n"
+        if len(parts) == 1 and stem == "erd":
+            kind, name = "erd", None
+        elif len(parts) == 2 and parts[0] in ("star", "table"):
+            kind, name = parts[0], stem
+        else:
+            return 404, "txt", b"not found\n"
+
+        if (kind == "star" and name not in self.schema["facts"]) or (kind == "table" and name not in self.tables):
+            return 404, "txt", f"unknown {kind}: {name}\n".encode()
+        try:
+            return 200, output_format, await self.render(kind, name, output_format)
+        except Exception as e:
+            return 500, "txt", f"{e}\n".encode()
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 request per connection."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                status, content_type, body = 400, "txt", b"bad request\n"
+            elif request_line[0] not in ("GET", "HEAD"):
+                status, content_type, body = 405, "txt", b"only GET and HEAD are supported\n"
+            else:
+                status, content_type, body = await self.route(request_line[1])
+
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            if status == 200 and headers.get("if-none-match") == etag:
+                status, body = 304, b""
+            head = [
+                f"HTTP/1.1 {status} {REASONS[status]}",
+                f"Content-Type: {CONTENT_TYPES[content_type]}",
+                f"Content-Length: {len(body)}",
+                f"ETag: {etag}",
+                "Connection: close",
+                "", "",
+            ]
+            writer.write("\r\n".join(head).encode("latin-1"))
+            if request_line and request_line[0] != "HEAD":
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._render_slots = asyncio.Semaphore(self.render_workers)
+        server = await asyncio.start_server(self.handle, host, port)
+        bound = server.sockets[0].getsockname()
+        print(f"Serving {len(self.diagram_urls())} diagrams on http://{bound[0]}:{bound[1]}/")
+        async with server:
+            await server.serve_forever()
+
+
+def add_server_arguments(parser):
+    """Add the serve-mode options to an argparse parser."""
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to bind in serve mode (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port for serve mode")
+    parser.add_argument("--server-cache-mb", type=int, default=DEFAULT_CACHE_MB, help="In-memory diagram cache size for serve mode")
+    parser.add_argument("--render-workers", type=int, default=DEFAULT_RENDER_WORKERS, help="Concurrent renders in serve mode")
+
+
+def serve_from_args(schema, args):
+    """Run the server until interrupted."""
+    server = ERDServer(schema, cache_mb=args.server_cache_mb, render_workers=args.render_workers,
+                       backend=resolve_backend(args.render_backend))
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\nStopped. {json.dumps(server.stats())}")
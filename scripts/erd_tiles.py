@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Tiled, subject-area layout for the full ERD on very large schemas.
+
+One `splines=ortho` graph with every table stops scaling past a few hundred
+tables: orthogonal routing in `dot` is super-linear. With --tiled the full
+ERD is split into subject-area tiles instead:
+
+- each fact table, plus every dimension it reaches through FKs (outriggers
+  included), is a subject area; facts sharing most of their dimensions are
+  packed into one tile up to --tile-max-tables tables
+- dimensions no fact reaches are chunked into "unattached" tiles
+- each tile is laid out on its own, in parallel (--jobs), under a time budget
+  (--tile-budget seconds); an attempt that runs over is killed and retried
+  down LAYOUT_FALLBACKS: dot with ortho, dot with polyline, then sfdp
+- an overview stitches the tile images together, linked through the
+  conformed dimensions they share
+
+Usage:
+    from erd_tiles import render_tiled
+
+    for tile, output_file, layout, seconds, error in render_tiled(
+            tables, relations, "out/full_erd", workers=8, budget=60):
+        ...
+
+    python scripts/erd_tiles.py --synthetic 1000 --output /tmp/tiles --jobs 8
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dot_writer import column_rows, dot_to_string
+from erd_profile import count, span
+from erd_render import DEFAULT_BACKEND
+
+DEFAULT_TILE_BUDGET = 60.0
+DEFAULT_TILE_MAX_TABLES = 40
+
+# (engine, splines) tried in order; each attempt gets the full budget
+LAYOUT_FALLBACKS = [("dot", "ortho"), ("dot", "polyline"), ("sfdp", "polyline")]
+
+
+class Tile:
+    """One subject area: its facts and every table drawn in it."""
+
+    def __init__(self, name, facts, tables):
+        self.name = name
+        self.facts = facts
+        self.tables = tables
+
+    def label(self):
+        if not self.facts:
+            return f"{self.name} (unattached dims)"
+        more = f" +{len(self.facts) - 1}" if len(self.facts) > 1 else ""
+        return f"{self.name} ({self.facts[0]}{more}, {len(self.tables)} tables)"
+
+
+def subject_areas(tables, relations):
+    """Return {fact: set of tables it reaches through FK relations, itself included}."""
+    targets = {}
+    for src, _, dst, _ in relations:
+        if dst in tables and dst != src:
+            targets.setdefault(src, set()).add(dst)
+
+    areas = {}
+    for fact in tables:
+        if not fact.startswith("fact_"):
+            continue
+        area = {fact}
+        pending = [fact]
+        while pending:
+            for dst in targets.get(pending.pop(), ()):
+                # Follow dims (outriggers) but never walk into another fact
+                if dst not in area and not dst.startswith("fact_"):
+                    area.add(dst)
+                    pending.append(dst)
+        areas[fact] = area
+    return areas
+
+
+def plan_tiles(tables, relations, max_tables=DEFAULT_TILE_MAX_TABLES):
+    """
+    Pack subject areas into tiles of at most max_tables tables (a single
+    larger area still gets its own tile). Largest areas are placed first;
+    each joins the tile it shares the most tables with when it fits.
+    """
+    areas = subject_areas(tables, relations)
+    packed = []  # [facts, tables]
+    for fact in sorted(areas, key=lambda f: (-len(areas[f]), f)):
+        area = areas[fact]
+        best, best_shared = None, 0
+        for entry in packed:
+            shared = len(area & entry[1])
+            if shared > best_shared and len(area | entry[1]) <= max_tables:
+                best, best_shared = entry, shared
+        if best is None:
+            packed.append([[fact], set(area)])
+        else:
+            best[0].append(fact)
+            best[1] |= area
+
+    attached = set().union(*(entry[1] for entry in packed)) if packed else set()
+    unattached = [name for name in tables if name not in attached]
+    for start in range(0, len(unattached), max_tables):
+        packed.append([[], set(unattached[start:start + max_tables])])
+
+    return [
+        Tile(f"tile_{i + 1:03d}", facts, sorted(members))
+        for i, (facts, members) in enumerate(packed)
+    ]
+
+
+def conformed_dimensions(tiles):
+    """Return {dim: [tile names]} for dimensions drawn in more than one tile."""
+    owners = {}
+    for tile in tiles:
+        for name in tile.tables:
+            if not name.startswith("fact_"):
+                owners.setdefault(name, []).append(tile.name)
+    return {dim: names for dim, names in sorted(owners.items()) if len(names) > 1}
+
+
+def write_tile_dot(writer, tile, tables, relations, splines="ortho", column_limit=None):
+    """Stream DOT source for one tile into a DotWriter."""
+    members = set(tile.tables)
+    writer.begin(
+        tile.name,
+        f'graph [rankdir=LR, splines={splines}, nodesep=0.5, label="{tile.label()}", labelloc=t];',
+        'node [shape=none, fontname="Helvetica", fontsize=9];',
+        'edge [arrowhead=crow, arrowtail=none, color="#666666"];',
+    )
+
+    for name in tile.tables:
+        if name.startswith("fact_"):
+            writer.table_node(name, column_rows(tables[name], limit=column_limit), "#FFD700", "#FFFACD")
+        else:
+            writer.table_node(name, column_rows(tables[name], limit=column_limit), "#87CEEB", "#E6F3FF")
+
+    for src, src_col, dst, dst_col in relations:
+        if src in members and dst in members:
+            writer.edge(src, src_col, dst, dst_col)
+
+    writer.end()
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_overview_dot(writer, tiles, tile_files, splines="polyline"):
+    """
+    Stream DOT source for the overview: one image node per rendered tile and
+    one node per conformed dimension, linked to every tile that draws it.
+    Each image node carries the SHA-256 of its tile file, so the render cache
+    never serves an overview stitched from older tiles at the same paths.
+    """
+    writer.begin(
+        "erd_overview",
+        f'graph [rankdir=LR, splines={splines}, nodesep=0.6, ranksep=2.0];',
+        'node [fontname="Helvetica", fontsize=12];',
+        'edge [arrowhead=none, color="#999999"];',
+    )
+
+    for tile in tiles:
+        output_file = tile_files.get(tile.name)
+        if output_file is None:
+            # Failed tiles stay in the overview as a plain box
+            writer.line(f'  {tile.name} [shape=box, style=dashed, label="{tile.label()}"];')
+        else:
+            # Thumbnails: full-size tiles would blow the overview past bitmap limits
+            writer.line(f'  {tile.name} [shape=none, label="", xlabel="{tile.label()}", fixedsize=true, '
+                        f'width=4, height=4, imagescale=true, image="{os.path.abspath(output_file)}", '
+                        f'comment="sha256:{_file_digest(output_file)}"];')
+
+    for dim, names in conformed_dimensions(tiles).items():
+        writer.line(f'  {dim} [shape=box, style=filled, fillcolor="#E6F3FF", label="{dim}"];')
+        for name in names:
+            writer.line(f"  {name} -> {dim};")
+
+    writer.end()
+
+
+def _layout_subprocess(dot_content, output_file, output_format, engine, budget):
+    """Run the engine binary on DOT text; subprocess.run kills it on timeout."""
+    result = subprocess.run(
+        [engine, f"-T{output_format}", "-o", output_file],
+        input=dot_content, capture_output=True, text=True, encoding="utf-8", timeout=budget,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{engine} exited with status {result.returncode}: {result.stderr.strip()}")
+
+
+def _draw_pygraphviz(dot_content, output_file, output_format, engine, errors):
+    try:
+        import pygraphviz
+
+        pygraphviz.AGraph(string=dot_content).draw(output_file, format=output_format, prog=engine)
+    except Exception as e:
+        errors.put(str(e))
+
+
+def _layout_pygraphviz(dot_content, output_file, output_format, engine, budget):
+    """
+    Lay out in a child process: libgvc cannot be interrupted in-process, and
+    a child per tile also lets pygraphviz tiles run in parallel.
+    """
+    context = multiprocessing.get_context("spawn")
+    errors = context.Queue()
+    proc = context.Process(target=_draw_pygraphviz, args=(dot_content, output_file, output_format, engine, errors))
+    proc.start()
+    proc.join(budget)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+        raise subprocess.TimeoutExpired(engine, budget)
+    if not errors.empty():
+        raise RuntimeError(errors.get())
+    if proc.exitcode != 0:
+        raise RuntimeError(f"{engine} layout exited with status {proc.exitcode}")
+
+
+LAYOUT_RUNNERS = {
+    "subprocess": _layout_subprocess,
+    "pygraphviz": _layout_pygraphviz,
+}
+
+
+def render_with_budget(build_dot, output_base, output_format="png", budget=DEFAULT_TILE_BUDGET,
+                       backend=DEFAULT_BACKEND, cache=None, fallbacks=LAYOUT_FALLBACKS):
+    """
+    Render build_dot(splines) down `fallbacks` until one attempt finishes
+    within `budget` seconds. Returns (output_file, "engine/splines", seconds);
+    raises TimeoutError when every attempt runs over.
+
+    The cache is keyed by the first attempt's DOT text, so a tile that needed
+    a fallback is not laid out (and timed out) again on the next run.
+    """
+    output_file = f"{output_base}.{output_format}"
+    started = time.perf_counter()
+
+    key = None
+    if cache is not None:
+        key = cache.key(build_dot(fallbacks[0][1]), output_format, backend)
+        if cache.fetch(key, output_format, output_file):
+            return output_file, "cached", time.perf_counter() - started
+    # The old output may be a hard link into the cache; never write through it
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    for engine, splines in fallbacks:
+        try:
+            with span("tile_layout", diagram=os.path.basename(output_base), engine=engine, splines=splines):
+                LAYOUT_RUNNERS[backend](build_dot(splines), output_file, output_format, engine, budget)
+        except subprocess.TimeoutExpired:
+            count("tile_timeouts")
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            continue
+        count("diagrams_rendered")
+        count("output_bytes", os.path.getsize(output_file))
+        if cache is not None:
+            cache.store(key, output_format, output_file)
+        return output_file, f"{engine}/{splines}", time.perf_counter() - started
+
+    raise TimeoutError(f"every layout ran over the {budget:g}s budget")
+
+
+def render_tiled(tables, relations, output_base, output_format="png", workers=1, budget=DEFAULT_TILE_BUDGET,
+                 max_tables=DEFAULT_TILE_MAX_TABLES, backend=DEFAULT_BACKEND, cache=None, column_limit=None):
+    """
+    Render the ERD of `tables` ({name: columns}) and `relations`
+    ([(src, src_col, dst, dst_col)]) as tiles under <output_base>_tiles/ and
+    an overview at <output_base>.<format>.
+
+    Yields (tile, output_file, layout, seconds, error) per tile in plan
+    order, then once for the overview with tile None. `error` is None on
+    success; a failed tile never stops the others.
+    """
+    tiles = plan_tiles(tables, relations, max_tables)
+    tile_dir = f"{output_base}_tiles"
+    os.makedirs(tile_dir, exist_ok=True)
+
+    def render_tile(tile):
+        build_dot = lambda splines: dot_to_string(write_tile_dot, tile, tables, relations, splines, column_limit)
+        try:
+            return render_with_budget(build_dot, os.path.join(tile_dir, tile.name), output_format,
+                                      budget, backend, cache) + (None,)
+        except Exception as e:
+            return os.path.join(tile_dir, f"{tile.name}.{output_format}"), None, 0.0, e
+
+    tile_files = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # Each render is its own process, so threads are enough to run them in parallel
+        for tile, result in zip(tiles, pool.map(render_tile, tiles)):
+            if result[3] is None:
+                tile_files[tile.name] = result[0]
+            yield (tile,) + result
+
+    # Orthogonal routing buys nothing between a few dozen thumbnails
+    build_overview = lambda splines: dot_to_string(write_overview_dot, tiles, tile_files, splines)
+    try:
+        yield (None,) + render_with_budget(build_overview, output_base, output_format, budget, backend, cache,
+                                           LAYOUT_FALLBACKS[1:]) + (None,)
+    except Exception as e:
+        yield None, f"{output_base}.{output_format}", None, 0.0, e
+
+
+def print_tiled(results):
+    """Print the ✓/✗ report for render_tiled(). Returns the failure count."""
+    failures = 0
+    for tile, output_file, layout, seconds, error in results:
+        name = tile.label() if tile is not None else f"overview → {output_file}"
+        if error is None:
+            print(f"  ✓ {name}: {layout} {seconds:.1f}s")
+        else:
+            failures += 1
+            print(f"  ✗ {name}: {error}")
+    return failures
+
+
+def add_tile_arguments(parser):
+    """Add the shared --tiled/--tile-budget/--tile-max-tables options to an argparse parser."""
+    parser.add_argument("--tiled", action="store_true",
+                        help="Lay the full ERD out as subject-area tiles plus an overview (large schemas)")
+    parser.add_argument("--tile-budget", type=float, default=DEFAULT_TILE_BUDGET,
+                        help="Seconds per tile layout attempt before falling back to polyline, then sfdp")
+    parser.add_argument("--tile-max-tables", type=int, default=DEFAULT_TILE_MAX_TABLES,
+                        help="Pack subject areas into tiles of up to this many tables")
+
+
+def main():
+    from bench_fk_index import synthetic_tables
+    from erd_render import add_backend_argument, resolve_backend
+    from generate_bq_erd import build_fk_index, full_relations
+
+    parser = argparse.ArgumentParser(description="Render a synthetic schema as a tiled ERD")
+    parser.add_argument("--synthetic", type=int, default=500, help="Synthetic table count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="erd_tiles", help="Output directory")
+    parser.add_argument("--format", default="png", help="Output format")
+    parser.add_argument("--jobs", type=int, default=1, help="Tiles laid out in parallel")
+    add_tile_arguments(parser)
+    add_backend_argument(parser)
+    args = parser.parse_args()
+
+    tables = synthetic_tables(args.synthetic, args.seed)
+    relations = full_relations(tables, build_fk_index(tables))
+    os.makedirs(args.output, exist_ok=True)
+
+    started = time.perf_counter()
+    failures = print_tiled(render_tiled(
+        tables, relations, os.path.join(args.output, "full_erd"), args.format, workers=args.jobs,
+        budget=args.tile_budget, max_tables=args.tile_max_tables,
+        backend=resolve_backend(args.render_backend), column_limit=20,
+    ))
+    print(f"\n{len(tables)} tables, {len(relations)} relations in {time.perf_counter() - started:.1f}s"
+          + (f"; {failures} failed" if failures else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Streaming fact loader: business IDs in, surrogate keys out.
+
+Source files (CSV, JSONL or Parquet) carry business IDs instead of *_key
+foreign keys: user_id for user_key, from_plan_code for from_plan_key,
+country_code/region/city for geo_key, status_group/status_code for
+status_key, and so on. The role prefix of a foreign key carries over to its
+source columns (referrer_user_key <- referrer_user_id). Date and time keys
+come from the role's timestamp or date column (start_date_key,
+start_time_key <- start_ts; event_date_key <- event_ts or event_date).
+
+Files are read in record batches. Business keys are hashed by DuckDB while
+reading, and each dimension is loaded once into sorted NumPy arrays of
+(business key hash, surrogate key), so resolving a batch is one searchsorted
+per foreign key. SCD2 dimensions keep every version sorted by effective
+start and resolve the version in effect at the fact's event time (its first
+timestamp column, else its first date column); events before a key's first
+version get that first version.
+
+Business keys not found in a dimension either get the default key (-1, an
+"Unknown" row added to each referenced dimension) or, with --unknown infer,
+a new inferred dimension row holding only the business key, which later
+loads reuse. NULL business keys, foreign keys without source columns and
+dates outside dim_date always get the default key.
+
+Usage:
+    python scripts/fact_loader.py --database netflix_dw.duckdb --load fact_viewing_session=sessions.csv
+    python scripts/fact_loader.py --database netflix_dw.duckdb --unknown infer \\
+        --load fact_subscription_event=events.jsonl fact_plan_change=changes.parquet
+
+Requires: pip install duckdb numpy pyarrow
+"""
+
+import argparse
+import time
+
+from generate_erd import SCHEMA
+from local_dw import TYPE_MAP
+from scd2_merge import SCD2_DIMENSIONS
+
+# Business key columns of every non-calendar dimension
+BUSINESS_KEYS = {
+    "dim_user": ["user_id"],
+    "dim_profile": ["profile_id"],
+    "dim_geography": ["country_code", "region", "city"],
+    "dim_plan": ["plan_code"],
+    "dim_term": ["term_months"],
+    "dim_device": ["device_id"],
+    "dim_content": ["content_id"],
+    "dim_rights_holder": ["rights_holder_id"],
+    "dim_partner_store": ["store_id"],
+    "dim_promotion": ["promotion_code"],
+    "dim_payment_method": ["payment_method_code"],
+    "dim_currency": ["iso_currency_code"],
+    "dim_voucher": ["voucher_code"],
+    "dim_referral_depth": ["depth"],
+    "dim_status": ["status_group", "status_code"],
+    "dim_prospect": ["lead_id"],
+}
+CALENDAR_DIMENSIONS = ("dim_date", "dim_time")
+
+# status_group used when a source file has status_code but no status_group
+FACT_STATUS_GROUP = {
+    "fact_subscription_event": "subscription",
+    "fact_subscription_monthly_snapshot": "subscription",
+    "fact_plan_change": "subscription",
+    "fact_voucher_sale": "voucher",
+    "fact_voucher_lifecycle": "voucher",
+    "fact_viewing_session": "playback",
+    "fact_content_tx": "playback",
+    "fact_device_link": "device",
+    "fact_profile_event": "profile",
+}
+
+DEFAULT_KEY = -1
+DEFAULT_BATCH_SIZE = 250_000
+INFERRED_START_TS = "1900-01-01 00:00:00"
+
+_NO_HASH = 0  # NULL business key
+_MIN_US = -(2 ** 63)  # NULL timestamp (NaT)
+_MAX_US = 2 ** 63 - 1  # no event time: resolve the current version
+
+
+class KeyIndex:
+    """Sorted (business key hash, effective start, surrogate key) arrays for one dimension."""
+
+    def __init__(self, con, dimension, schema=SCHEMA):
+        self.con = con
+        self.dimension = dimension
+        self.columns = [c[0] for c in schema["dimensions"][dimension]["columns"]]
+        self.surrogate_key = self.columns[0]
+        self.business_key = BUSINESS_KEYS[dimension]
+        self.scd2 = dimension in SCD2_DIMENSIONS
+        self.load()
+
+    def load(self):
+        import numpy as np
+
+        start = "coalesce(epoch_us(effective_start_ts), -9223372036854775808)" if self.scd2 else "0"
+        rows = self.con.execute(f"""
+            SELECT {hash_sql(self.business_key)} AS key_hash, {start} AS start_us,
+                   {self.surrogate_key} AS surrogate_key
+            FROM {self.dimension}
+            WHERE {self.surrogate_key} IS NOT NULL AND {self.surrogate_key} <> {DEFAULT_KEY}
+            ORDER BY key_hash, start_us, surrogate_key
+        """).fetchnumpy()
+        key_hash = np.asarray(rows["key_hash"], dtype=np.uint64)
+        start_us = np.asarray(rows["start_us"], dtype=np.int64)
+        surrogate = np.asarray(rows["surrogate_key"], dtype=np.int64)
+        keep = key_hash != _NO_HASH
+        if not self.scd2:
+            # A type 1 business key maps to one row; the highest surrogate key wins
+            keep &= np.r_[key_hash[1:] != key_hash[:-1], True]
+        self.key_hash, self.start_us, self.surrogate = key_hash[keep], start_us[keep], surrogate[keep]
+        self._group_ends()
+
+    def _group_ends(self):
+        """self.last[i]: position of the latest version of entry i's business key."""
+        import numpy as np
+
+        ends = np.flatnonzero(np.r_[self.key_hash[1:] != self.key_hash[:-1], True])
+        self.last = np.repeat(ends, np.diff(np.r_[-1, ends]))
+
+    def resolve(self, key_hash, event_us=None):
+        """Surrogate keys for a batch of hashes (-1 where not found) and the not-found mask."""
+        import numpy as np
+
+        if not len(self.key_hash):
+            return np.full(len(key_hash), DEFAULT_KEY, dtype=np.int64), key_hash != _NO_HASH
+        first = np.minimum(np.searchsorted(self.key_hash, key_hash), len(self.key_hash) - 1)
+        found = self.key_hash[first] == key_hash
+        version = first
+        if self.scd2:
+            # Step back from the latest version until one starts at or before the event
+            version = self.last[first]
+            if event_us is not None:
+                later = found & (version > first) & (self.start_us[version] > event_us)
+                while later.any():
+                    version = version - later
+                    later &= (version > first) & (self.start_us[version] > event_us)
+        return np.where(found, self.surrogate[version], DEFAULT_KEY), ~found & (key_hash != _NO_HASH)
+
+    def infer(self, values, key_hash):
+        """
+        Add one inferred row per distinct unknown business key. `values` is an Arrow
+        table of the business key columns. Returns (key_hash, surrogate key) of the new rows.
+        """
+        import numpy as np
+        from local_dw import register_arrays
+
+        key_hash, first = np.unique(key_hash, return_index=True)
+        next_key = self.con.execute(f"SELECT coalesce(max({self.surrogate_key}), 0) FROM {self.dimension}").fetchone()[0]
+        surrogate = np.arange(next_key + 1, next_key + 1 + len(key_hash), dtype=np.int64)
+        rows = {self.surrogate_key: surrogate}
+        rows.update({c: values.column(c).take(first) for c in self.business_key})
+        register_arrays(self.con, "_inferred_members", rows)
+        columns = [self.surrogate_key] + self.business_key
+        select = list(columns)
+        if self.scd2:
+            columns += ["effective_start_ts", "effective_end_ts", "is_current"]
+            select += [f"TIMESTAMP '{INFERRED_START_TS}'", "NULL", "true"]
+        try:
+            self.con.execute(f"INSERT INTO {self.dimension} ({', '.join(columns)}) "
+                             f"SELECT {', '.join(select)} FROM _inferred_members")
+        finally:
+            self.con.unregister("_inferred_members")
+
+        order = np.argsort(np.concatenate([self.key_hash, key_hash]), kind="stable")
+        self.key_hash = np.concatenate([self.key_hash, key_hash])[order]
+        start = np.full(len(key_hash), _MIN_US if self.scd2 else 0, dtype=np.int64)
+        self.start_us = np.concatenate([self.start_us, start])[order]
+        self.surrogate = np.concatenate([self.surrogate, surrogate])[order]
+        self._group_ends()
+        return key_hash, surrogate
+
+
+def hash_sql(columns):
+    """DuckDB expression hashing business key columns (0 when any of them is NULL)."""
+    nulls = " OR ".join(f"{c} IS NULL" for c in columns)
+    return f"CASE WHEN {nulls} THEN 0 ELSE hash({', '.join(columns)}) END"
+
+
+def ensure_default_members(con, dimensions, schema=SCHEMA):
+    """Add the default (-1) row to each dimension that lacks it."""
+    for dimension in dimensions:
+        columns = [c[0] for c in schema["dimensions"][dimension]["columns"]]
+        if con.execute(f"SELECT count(*) FROM {dimension} WHERE {columns[0]} = {DEFAULT_KEY}").fetchone()[0]:
+            continue
+        if dimension in SCD2_DIMENSIONS:
+            con.execute(f"INSERT INTO {dimension} ({columns[0]}, effective_start_ts, is_current) "
+                        f"VALUES ({DEFAULT_KEY}, TIMESTAMP '{INFERRED_START_TS}', true)")
+        else:
+            con.execute(f"INSERT INTO {dimension} ({columns[0]}) VALUES ({DEFAULT_KEY})")
+
+
+def plan_fact(fact, source_columns, schema=SCHEMA):
+    """
+    How each column of `fact` is filled from a source with `source_columns`:
+    {column: ("copy", None) | ("business_key", (dimension, [source expressions]))
+             | ("date"|"time", source column) | ("default", dimension) | ("null", None)}
+    """
+    source = set(source_columns)
+    plan = {}
+    for column in schema["facts"][fact]["columns"]:
+        name = column[0]
+        ref = column[3] if len(column) > 3 else None
+        dimension = ref.split(".")[0] if ref else None
+        if name in source:
+            plan[name] = ("copy", None)
+        elif dimension in CALENDAR_DIMENSIONS:
+            role = name[:-len("date_key" if dimension == "dim_date" else "time_key")]
+            candidates = [role + "ts"] + ([role + "date"] if dimension == "dim_date" else [])
+            found = [c for c in candidates if c in source]
+            plan[name] = ("date" if dimension == "dim_date" else "time", found[0]) if found else ("default", dimension)
+        elif dimension in BUSINESS_KEYS:
+            role = name[:-len(schema["dimensions"][dimension]["columns"][0][0])]
+            types = {c[0]: TYPE_MAP.get(c[1], c[1]) for c in schema["dimensions"][dimension]["columns"]}
+            expressions = []
+            for bk in BUSINESS_KEYS[dimension]:
+                if role + bk in source:
+                    expressions.append(role + bk)
+                elif bk == "status_group" and fact in FACT_STATUS_GROUP:
+                    expressions.append(f"'{FACT_STATUS_GROUP[fact]}'")
+            if len(expressions) == len(BUSINESS_KEYS[dimension]) and any(e in source for e in expressions):
+                # Cast to the dimension's types so both sides hash the same values
+                expressions = [f"CAST({e} AS {types[bk]})" for e, bk in zip(expressions, BUSINESS_KEYS[dimension])]
+                plan[name] = ("business_key", (dimension, expressions))
+            else:
+                plan[name] = ("default", dimension)
+        else:
+            plan[name] = ("null", None)
+    return plan
+
+
+def event_column(fact, source_columns, schema=SCHEMA):
+    """The fact's first TIMESTAMP column in the source, else its first DATE column."""
+    columns = schema["facts"][fact]["columns"]
+    for wanted in ("TIMESTAMP", "DATE"):
+        for column in columns:
+            if column[1] == wanted and column[0] in source_columns:
+                return column[0]
+    return None
+
+
+class FactLoader:
+    """Loads fact files into the local warehouse, sharing dimension indexes across facts."""
+
+    def __init__(self, con, unknown="default", batch_size=DEFAULT_BATCH_SIZE, schema=SCHEMA):
+        self.con = con
+        self.unknown = unknown
+        self.batch_size = batch_size
+        self.schema = schema
+        self.indexes = {}
+        self.calendar = None
+
+    def index(self, dimension):
+        if dimension not in self.indexes:
+            self.indexes[dimension] = KeyIndex(self.con, dimension, self.schema)
+        return self.indexes[dimension]
+
+    def calendar_lookup(self):
+        from calendar_dims import CalendarLookup
+
+        if self.calendar is None:
+            first, last = self.con.execute("SELECT min(calendar_date), max(calendar_date) FROM dim_date").fetchone()
+            # An empty dim_date resolves no dates: every date key is the default, never a key without a row
+            self.calendar = CalendarLookup(first, last, DEFAULT_KEY) if first else CalendarLookup.empty(DEFAULT_KEY)
+        return self.calendar
+
+    def load(self, fact, path):
+        """Append one source file to `fact`. Returns {"rows", "seconds", "default": {fk: n}, "inferred": {fk: n}}."""
+        import numpy as np
+        import pyarrow as pa
+        from local_dw import file_reader_sql
+
+        started = time.perf_counter()
+        reader = file_reader_sql(path)
+        source_columns = [r[0] for r in self.con.execute(f"DESCRIBE SELECT * FROM {reader}").fetchall()]
+        plan = plan_fact(fact, source_columns, self.schema)
+        event = event_column(fact, source_columns, self.schema)
+        referenced = {spec[0] if how == "business_key" else spec for how, spec in plan.values()
+                      if how in ("business_key", "default")}
+        ensure_default_members(self.con, sorted(referenced - set(CALENDAR_DIMENSIONS)))
+
+        select = []
+        for name, (how, spec) in plan.items():
+            if how == "copy":
+                select.append(name)
+            elif how == "business_key":
+                dimension, expressions = spec
+                select.append(f"{hash_sql(expressions)} AS \"__hash_{name}\"")
+                if self.unknown == "infer":
+                    select += [f"{e} AS \"__bk_{name}_{bk}\"" for e, bk in zip(expressions, BUSINESS_KEYS[dimension])]
+            elif how in ("date", "time"):
+                select.append(f"coalesce(epoch_us(CAST({spec} AS TIMESTAMP)), {_MIN_US}) AS \"__ts_{name}\"")
+        event_sql = f"coalesce(epoch_us(CAST({event} AS TIMESTAMP)), {_MAX_US})" if event else str(_MAX_US)
+        select.append(f"{event_sql} AS __event_us")
+
+        # Read on a cursor so inserts on the main connection don't cancel the stream
+        result = self.con.cursor().execute(f"SELECT {', '.join(select)} FROM {reader}")
+        # to_arrow_reader() replaced fetch_record_batch() in newer DuckDB releases
+        fetch = getattr(result, "to_arrow_reader", None) or result.fetch_record_batch
+        stats = {"rows": 0, "default": {}, "inferred": {}}
+        for batch in fetch(self.batch_size):
+            n = batch.num_rows
+            event_us = batch.column("__event_us").to_numpy()
+            out = {}
+            for name, (how, spec) in plan.items():
+                if how == "copy":
+                    out[name] = batch.column(name)
+                elif how == "business_key":
+                    out[name] = self._resolve(name, spec[0], batch, event_us, stats)
+                elif how in ("date", "time"):
+                    timestamps = batch.column(f"__ts_{name}").to_numpy().view("datetime64[us]")
+                    calendar = self.calendar_lookup()
+                    out[name] = calendar.date_keys(timestamps) if how == "date" else calendar.time_keys(timestamps)
+                elif how == "default":
+                    out[name] = np.full(n, DEFAULT_KEY, dtype=np.int64)
+                else:
+                    out[name] = pa.nulls(n)
+                if how in ("date", "time"):
+                    stats["default"][name] = stats["default"].get(name, 0) + int(np.count_nonzero(out[name] == DEFAULT_KEY))
+            self.con.register("_fact_batch", pa.table(out))
+            try:
+                self.con.execute(f"INSERT INTO {fact} ({', '.join(plan)}) SELECT * FROM _fact_batch")
+            finally:
+                self.con.unregister("_fact_batch")
+            stats["rows"] += n
+
+        stats["seconds"] = time.perf_counter() - started
+        stats["plan"] = plan
+        stats["event_column"] = event
+        return stats
+
+    def _resolve(self, name, dimension, batch, event_us, stats):
+        import numpy as np
+        import pyarrow as pa
+
+        index = self.index(dimension)
+        key_hash = batch.column(f"__hash_{name}").to_numpy()
+        keys, unknown = index.resolve(key_hash, event_us)
+        if unknown.any() and self.unknown == "infer":
+            rows = np.flatnonzero(unknown)
+            values = pa.table({bk: batch.column(f"__bk_{name}_{bk}").take(pa.array(rows))
+                               for bk in index.business_key})
+            new_hash, new_keys = index.infer(values, key_hash[rows])
+            keys[rows] = new_keys[np.searchsorted(new_hash, key_hash[rows])]
+            stats["inferred"][name] = stats["inferred"].get(name, 0) + len(new_hash)
+        elif unknown.any():
+            stats["default"][name] = stats["default"].get(name, 0) + int(unknown.sum())
+        return keys
+
+
+def print_stats(fact, path, stats):
+    rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"  ✓ {fact} <- {path}: {stats['rows']:,} rows in {stats['seconds']:.2f}s ({rate:,.0f} rows/s)")
+    resolved = [n for n, (how, _) in stats["plan"].items() if how in ("business_key", "date", "time")]
+    unresolved = [n for n, (how, _) in stats["plan"].items() if how == "default"]
+    print(f"    resolved {len(resolved)} key(s)" + (f" as of {stats['event_column']}" if stats["event_column"] else ""))
+    if unresolved:
+        print(f"    no source columns, default key: {', '.join(unresolved)}")
+    for name, count in stats["default"].items():
+        if count:
+            print(f"    {name}: {count:,} unknown -> {DEFAULT_KEY}")
+    for name, count in stats["inferred"].items():
+        print(f"    {name}: {count:,} inferred member(s) added")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream fact files into the local warehouse, resolving business IDs to keys")
+    parser.add_argument("--database", default="netflix_dw.duckdb", help="DuckDB database file (see local_dw.py)")
+    parser.add_argument("--load", nargs="+", required=True, metavar="FACT=PATH",
+                        help="Fact table and CSV/JSONL/Parquet source file")
+    parser.add_argument("--unknown", choices=["default", "infer"], default="default",
+                        help=f"Unknown business keys: default key {DEFAULT_KEY} or inferred dimension rows")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Source rows per batch")
+
+    args = parser.parse_args()
+
+    loads = []
+    for item in args.load:
+        fact, _, path = item.partition("=")
+        if fact not in SCHEMA["facts"] or not path:
+            parser.error(f"--load expects FACT=PATH with a fact from SCHEMA, got {item!r}")
+        loads.append((fact, path))
+
+    try:
+        import duckdb
+        import numpy
+        import pyarrow
+    except ImportError:
+        print("Error: pip install duckdb numpy pyarrow")
+        return
+
+    from local_dw import connect, create_schema
+
+    con = connect(args.database)
+    create_schema(con)
+    loader = FactLoader(con, args.unknown, args.batch_size)
+    for fact, path in loads:
+        print_stats(fact, path, loader.load(fact, path))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,20 +5,62 @@ Queries BigQuery INFORMATION_SCHEMA to get real table structures.
 
 Usage:
     python scripts/generate_bq_erd.py --output BQ_erd_generated
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --jobs 8
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --render-backend pygraphviz
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --offline
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --ddl
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --tiled --jobs 8
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --dataset netflix_dw netflix_dw_stage
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --all-datasets --region eu
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --stats
+    python scripts/generate_bq_erd.py --output BQ_erd_generated --fixture
+
+Schemas are kept in a local snapshot (scripts/<dataset>_schema_snapshot.json
+by default). Each run only re-reads tables whose last-modified time changed;
+--offline renders from the snapshot without contacting BigQuery, and --ddl
+renders from Netflix_BigQuery_DDL.sql (or the given file) instead.
+
+--stats annotates the table and star diagrams with row counts, bytes and
+partition/cluster keys (see bq_metadata.py); --fixture renders from a
+recorded Arrow fixture of the metadata views instead of BigQuery.
 """
 
 import argparse
+import json
 import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import groupby
+from types import SimpleNamespace
+
+from bq_metadata import (
+    DEFAULT_FIXTURE_DIR, FixtureClient, FixtureJob, ddl_stats, decode_columns, decode_metadata, harvest_metadata,
+    stats_rows, table_names_job_config
+)
+from ddl_parser import DEFAULT_DDL_PATH, load_ddl_schema, schema_to_tables
+from dot_writer import column_rows, dot_to_string
+from erd_profile import add_profile_arguments, count, profiling, span
+from erd_render import (
+    add_backend_argument, add_cache_arguments, cache_from_args, render_dot, render_many, resolve_backend
+)
+from erd_tiles import add_tile_arguments, print_tiled, render_tiled
 
 PROJECT_ID = "project-534688f2-c3a9-4bff-95a"
 DATASET_ID = "netflix_dw"
 
 
-def fetch_bq_schemas(project_id, dataset_id):
-    """Fetch all table schemas from BigQuery."""
-    from google.cloud import bigquery
+def fetch_bq_schemas(project_id, dataset_id, client=None, table_names=None):
+    """
+    Fetch table schemas from BigQuery.
     
-    client = bigquery.Client(project=project_id)
+    `table_names` limits the query to those tables (used by incremental
+    snapshot refresh); `client` lets callers pass an existing or fake client.
+    """
+    if client is None:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=project_id)
     
     # Get all tables
     query = f"""
@@ -29,30 +71,151 @@ def fetch_bq_schemas(project_id, dataset_id):
         is_nullable,
         ordinal_position
     FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS`
+    {"WHERE table_name IN UNNEST(@table_names)" if table_names is not None else ""}
     ORDER BY table_name, ordinal_position
     """
     
-    results = client.query(query).result()
+    job_config = table_names_job_config(table_names) if table_names is not None else None
     
-    # Group by table
-    tables = {}
-    for row in results:
-        table_name = row.table_name
-        if table_name not in tables:
-            tables[table_name] = []
-        tables[table_name].append({
-            "name": row.column_name,
-            "type": row.data_type,
-            "nullable": row.is_nullable == "YES"
-        })
+    # Decode the result in bulk through Arrow rather than one Row object per column
+    with span("bq_query", view="INFORMATION_SCHEMA.COLUMNS", dataset=dataset_id):
+        results = client.query(query, job_config=job_config).to_arrow()
+    count("bq_rows", results.num_rows)
     
-    return tables
+    return decode_columns(results)
 
 
-def generate_table_erd(table_name, columns, output_dir, is_fact=False):
-    """Generate ERD for a single table."""
-    import graphviz
+def fetch_table_modified_times(client, project_id, dataset_id):
+    """Return {table_name: last_modified_time (epoch ms)} from the cheap __TABLES__ metadata view."""
+    query = f"""
+    SELECT table_id, last_modified_time
+    FROM `{project_id}.{dataset_id}.__TABLES__`
+    """
+    with span("bq_query", view="__TABLES__", dataset=dataset_id):
+        return {row.table_id: row.last_modified_time for row in client.query(query).result()}
+
+
+def default_snapshot_path(dataset_id):
+    """Schema snapshots live next to this script, one per dataset."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{dataset_id}_schema_snapshot.json")
+
+
+def load_schema_snapshot(path):
+    """Load a schema snapshot file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_schema_snapshot(path, snapshot):
+    """Write a schema snapshot atomically (temp file + rename)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def snapshot_tables(snapshot):
+    """Convert a snapshot to the {table_name: columns} shape fetch_bq_schemas returns."""
+    return {name: entry["columns"] for name, entry in sorted(snapshot["tables"].items())}
+
+
+def changed_tables(cached, modified):
+    """
+    Sorted names of tables that are new or whose last-modified time differs
+    from the snapshot's; tables gone from `modified` are dropped from `cached`.
+    """
+    changed = sorted(
+        name for name, modified_time in modified.items()
+        if name not in cached or cached[name].get("last_modified") != modified_time
+    )
+    for name in set(cached) - set(modified):
+        del cached[name]
+    return changed
+
+
+def refresh_schema_snapshot(project_id, dataset_id, snapshot_path, client=None, full_refresh=False):
+    """
+    Bring the local schema snapshot up to date and return (tables, refreshed_table_names).
+    
+    Only tables whose last-modified time differs from the snapshot (or that
+    are new) are re-queried from INFORMATION_SCHEMA.COLUMNS; dropped tables
+    are removed. Nothing is queried beyond __TABLES__ when nothing changed.
+    """
+    if client is None:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=project_id)
+    
+    snapshot = None if full_refresh else load_schema_snapshot(snapshot_path)
+    if snapshot is None or snapshot.get("project") != project_id or snapshot.get("dataset") != dataset_id:
+        snapshot = {"project": project_id, "dataset": dataset_id, "tables": {}}
+    
+    modified = fetch_table_modified_times(client, project_id, dataset_id)
+    cached = snapshot["tables"]
+    changed = changed_tables(cached, modified)
     
+    if changed:
+        fresh = fetch_bq_schemas(project_id, dataset_id, client=client, table_names=changed)
+        for name in changed:
+            cached[name] = {"last_modified": modified[name], "columns": fresh.get(name, [])}
+            # Their partition/cluster keys may have changed too; the next --stats run re-reads them
+            snapshot.get("stats", {}).pop(name, None)
+    
+    snapshot["fetched_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    save_schema_snapshot(snapshot_path, snapshot)
+    
+    return snapshot_tables(snapshot), changed
+
+
+def build_fk_index(tables):
+    """
+    Infer fact -> dimension relationships once for the whole dataset.
+
+    Returns {column_name: dim_name} for every `_key` column. A column maps to
+    the first dimension (in table order) whose `<x>_key` suffix it matches
+    (dim_user -> user_key, referrer_user_key) or that contains a column of
+    the same name. Lookups are done per column name instead of rescanning
+    every dimension's column list for every fact column.
+    """
+    dim_names = [name for name in tables if name.startswith("dim_")]
+    
+    # dim_<x>_key suffix -> first dimension using it, and column -> first dimension containing it
+    suffix_owner = {}
+    column_owner = {}
+    for order, dim_name in enumerate(dim_names):
+        suffix_owner.setdefault(dim_name.replace("dim_", "") + "_key", order)
+        for c in tables[dim_name]:
+            column_owner.setdefault(c["name"], order)
+    
+    fk_index = {}
+    for columns in tables.values():
+        for col in columns:
+            col_name = col["name"]
+            if not col_name.endswith("_key") or col_name in fk_index:
+                continue
+            candidates = []
+            if col_name in suffix_owner:
+                candidates.append(suffix_owner[col_name])
+            if col_name in column_owner:
+                candidates.append(column_owner[col_name])
+            # Every "_" splits off a possible dim suffix: referrer_user_key -> user_key, key
+            pos = col_name.find("_")
+            while pos != -1:
+                suffix = col_name[pos + 1:]
+                if suffix in suffix_owner:
+                    candidates.append(suffix_owner[suffix])
+                pos = col_name.find("_", pos + 1)
+            if candidates:
+                fk_index[col_name] = dim_names[min(candidates)]
+    
+    return fk_index
+
+
+def write_table_dot(writer, table_name, columns, is_fact=False, stats=None):
+    """Stream DOT source for a single table into a DotWriter; `stats` is its bq_metadata entry."""
     # Determine colors
     if is_fact:
         header_color = "#FFD700"  # Gold
@@ -61,193 +224,340 @@ def generate_table_erd(table_name, columns, output_dir, is_fact=False):
         header_color = "#87CEEB"  # Sky blue
         bg_color = "#E6F3FF"      # Light blue
     
-    dot_lines = [
-        'digraph table_schema {',
-        '  graph [rankdir=TB];',
-        '  node [shape=none, fontname="Helvetica", fontsize=11];',
-        ''
-    ]
-    
-    # Build table HTML
-    cols_html = ""
-    for col in columns:
-        nullable = "NULL" if col["nullable"] else "NOT NULL"
-        cols_html += f'<TR><TD ALIGN="LEFT">{col["name"]}</TD><TD ALIGN="LEFT">{col["type"]}</TD><TD ALIGN="LEFT">{nullable}</TD></TR>'
-    
-    dot_lines.append(f'  {table_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0" BGCOLOR="{bg_color}">')
-    dot_lines.append(f'    <TR><TD COLSPAN="3" BGCOLOR="{header_color}"><B>{table_name}</B></TD></TR>')
-    dot_lines.append(f'    <TR><TD BGCOLOR="#DDDDDD"><B>Column</B></TD><TD BGCOLOR="#DDDDDD"><B>Type</B></TD><TD BGCOLOR="#DDDDDD"><B>Nullable</B></TD></TR>')
-    dot_lines.append(f'    {cols_html}')
-    dot_lines.append(f'  </TABLE>>];')
-    dot_lines.append('}')
-    
-    dot_content = "\n".join(dot_lines)
-    
-    # Render
-    output_base = os.path.join(output_dir, table_name)
-    graph = graphviz.Source(dot_content)
-    graph.render(output_base, format='png', cleanup=True)
-    
-    return f"{output_base}.png"
+    writer.begin(
+        "table_schema",
+        'graph [rankdir=TB];',
+        'node [shape=none, fontname="Helvetica", fontsize=11];',
+    )
+    
+    # Table HTML, one row at a time
+    rows = (
+        f'<TR><TD ALIGN="LEFT">{col["name"]}</TD><TD ALIGN="LEFT">{col["type"]}</TD>'
+        f'<TD ALIGN="LEFT">{"NULL" if col["nullable"] else "NOT NULL"}</TD></TR>'
+        for col in columns
+    )
+    writer.table_node(
+        table_name, rows, header_color, bg_color, colspan=3,
+        header_rows=stats_rows(stats, colspan=3) + ['<TR><TD BGCOLOR="#DDDDDD"><B>Column</B></TD><TD BGCOLOR="#DDDDDD"><B>Type</B></TD><TD BGCOLOR="#DDDDDD"><B>Nullable</B></TD></TR>'],
+    )
+    writer.end()
 
 
-def generate_full_erd(tables, output_dir):
-    """Generate full ERD with all tables."""
-    import graphviz
-    
-    dot_lines = [
-        'digraph full_erd {',
-        '  graph [rankdir=LR, splines=ortho, nodesep=0.5];',
-        '  node [shape=none, fontname="Helvetica", fontsize=9];',
-        '  edge [arrowhead=crow, arrowtail=none, color="#666666"];',
-        ''
-    ]
+def build_table_dot(table_name, columns, is_fact=False, stats=None):
+    """Build DOT source for a single table."""
+    return dot_to_string(write_table_dot, table_name, columns, is_fact, stats)
+
+
+def generate_table_erd(table_name, columns, output_dir, is_fact=False, cache=None, stats=None):
+    """Generate ERD for a single table."""
+    dot_content = build_table_dot(table_name, columns, is_fact, stats)
+    return render_dot(dot_content, os.path.join(output_dir, table_name), cache=cache)
+
+
+def write_full_dot(writer, tables, fk_index=None):
+    """Stream DOT source for the full ERD with all tables into a DotWriter."""
+    if fk_index is None:
+        fk_index = build_fk_index(tables)
+    
+    writer.begin(
+        "full_erd",
+        'graph [rankdir=LR, splines=ortho, nodesep=0.5];',
+        'node [shape=none, fontname="Helvetica", fontsize=9];',
+        'edge [arrowhead=crow, arrowtail=none, color="#666666"];',
+    )
     
     # Separate dims and facts
     dims = {k: v for k, v in tables.items() if k.startswith("dim_")}
     facts = {k: v for k, v in tables.items() if k.startswith("fact_")}
     
-    # Add dimension tables
+    # Add dimension tables (limit columns for readability)
     for table_name, columns in sorted(dims.items()):
-        cols_html = "".join([
-            f'<TR><TD ALIGN="LEFT" PORT="{c["name"]}">{c["name"]}</TD><TD ALIGN="LEFT">{c["type"]}</TD></TR>'
-            for c in columns[:15]  # Limit columns for readability
-        ])
-        if len(columns) > 15:
-            cols_html += f'<TR><TD COLSPAN="2">... +{len(columns)-15} more</TD></TR>'
-        
-        dot_lines.append(f'  {table_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0" BGCOLOR="#E6F3FF">')
-        dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="#87CEEB"><B>{table_name}</B></TD></TR>')
-        dot_lines.append(f'    {cols_html}')
-        dot_lines.append(f'  </TABLE>>];')
+        writer.table_node(table_name, column_rows(columns, limit=15), "#87CEEB", "#E6F3FF")
     
     # Add fact tables
     for table_name, columns in sorted(facts.items()):
-        cols_html = "".join([
-            f'<TR><TD ALIGN="LEFT" PORT="{c["name"]}">{c["name"]}</TD><TD ALIGN="LEFT">{c["type"]}</TD></TR>'
-            for c in columns[:20]
-        ])
-        if len(columns) > 20:
-            cols_html += f'<TR><TD COLSPAN="2">... +{len(columns)-20} more</TD></TR>'
-        
-        dot_lines.append(f'  {table_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0" BGCOLOR="#FFFACD">')
-        dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="#FFD700"><B>{table_name}</B></TD></TR>')
-        dot_lines.append(f'    {cols_html}')
-        dot_lines.append(f'  </TABLE>>];')
+        writer.table_node(table_name, column_rows(columns, limit=20), "#FFD700", "#FFFACD")
     
     # Add FK relationships (infer from _key columns)
-    for fact_name, columns in facts.items():
+    for fact_name, col_name, dim_name, dim_col in full_relations(tables, fk_index):
+        writer.edge(fact_name, col_name, dim_name, dim_col)
+    
+    writer.end()
+
+
+def full_relations(tables, fk_index=None):
+    """Return the (fact, column, dim, column) edges drawn in the full ERD."""
+    if fk_index is None:
+        fk_index = build_fk_index(tables)
+    
+    relations = []
+    for fact_name, columns in tables.items():
+        if not fact_name.startswith("fact_"):
+            continue
         for col in columns:
             col_name = col["name"]
-            if col_name.endswith("_key") and col_name not in ["date_key"]:
-                # Try to find matching dimension
-                for dim_name in dims.keys():
-                    # Match dim_user -> user_key, dim_date -> date_key, etc.
-                    dim_suffix = dim_name.replace("dim_", "") + "_key"
-                    if col_name == dim_suffix or col_name.endswith(f"_{dim_suffix}"):
-                        dot_lines.append(f'  {fact_name}:{col_name} -> {dim_name}:{col_name};')
-                        break
-                    # Also check direct key match
-                    if col_name in [c["name"] for c in dims[dim_name]]:
-                        dot_lines.append(f'  {fact_name}:{col_name} -> {dim_name}:{col_name};')
-                        break
-    
-    dot_lines.append('}')
-    dot_content = "\n".join(dot_lines)
-    
-    # Render
-    output_base = os.path.join(output_dir, "full_erd")
-    graph = graphviz.Source(dot_content)
-    graph.render(output_base, format='png', cleanup=True)
-    
-    return f"{output_base}.png"
-
-
-def generate_star_erd(fact_name, fact_columns, all_tables, output_dir):
-    """Generate star schema ERD for a single fact table."""
-    import graphviz
+            dim_name = fk_index.get(col_name)
+            if dim_name and col_name not in ["date_key"]:
+                relations.append((fact_name, col_name, dim_name, col_name))
+    return relations
+
+
+def build_full_dot(tables, fk_index=None):
+    """Build DOT source for the full ERD with all tables."""
+    return dot_to_string(write_full_dot, tables, fk_index)
+
+
+def generate_full_erd(tables, output_dir, cache=None, fk_index=None):
+    """Generate full ERD with all tables."""
+    dot_content = build_full_dot(tables, fk_index)
+    return render_dot(dot_content, os.path.join(output_dir, "full_erd"), cache=cache)
+
+
+def write_star_dot(writer, fact_name, fact_columns, all_tables, fk_index=None, stats=None):
+    """
+    Stream DOT source for a star schema into a DotWriter; returns dim_count.
+    `stats` ({table_name: bq_metadata entry}) annotates the fact and dimensions.
+    """
+    if fk_index is None:
+        fk_index = build_fk_index(all_tables)
+    stats = stats or {}
     
-    dot_lines = [
-        'digraph star_schema {',
-        '  graph [rankdir=LR, splines=ortho, nodesep=0.5, ranksep=1.2];',
-        '  node [shape=none, fontname="Helvetica", fontsize=10];',
-        '  edge [arrowhead=crow, arrowtail=none, color="#666666"];',
-        ''
-    ]
+    writer.begin(
+        "star_schema",
+        'graph [rankdir=LR, splines=ortho, nodesep=0.5, ranksep=1.2];',
+        'node [shape=none, fontname="Helvetica", fontsize=10];',
+        'edge [arrowhead=crow, arrowtail=none, color="#666666"];',
+    )
     
     # Find connected dimensions
-    connected_dims = set()
-    for col in fact_columns:
-        col_name = col["name"]
-        if col_name.endswith("_key"):
-            for dim_name in all_tables.keys():
-                if dim_name.startswith("dim_"):
-                    dim_suffix = dim_name.replace("dim_", "") + "_key"
-                    if col_name == dim_suffix or col_name.endswith(f"_{dim_suffix}"):
-                        connected_dims.add(dim_name)
-                        break
-                    if col_name in [c["name"] for c in all_tables[dim_name]]:
-                        connected_dims.add(dim_name)
-                        break
+    fk_relations = [(c["name"], fk_index[c["name"]]) for c in fact_columns if c["name"] in fk_index]
+    connected_dims = {dim_name for _, dim_name in fk_relations}
     
     # Add fact table (center)
-    cols_html = "".join([
-        f'<TR><TD ALIGN="LEFT" PORT="{c["name"]}">{c["name"]}</TD><TD ALIGN="LEFT">{c["type"]}</TD></TR>'
-        for c in fact_columns
-    ])
-    dot_lines.append(f'  {fact_name} [label=<<TABLE BORDER="2" CELLBORDER="0" CELLSPACING="0" BGCOLOR="#FFFACD">')
-    dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="#FFD700"><B>{fact_name}</B></TD></TR>')
-    dot_lines.append(f'    {cols_html}')
-    dot_lines.append(f'  </TABLE>>];')
+    writer.table_node(fact_name, column_rows(fact_columns), "#FFD700", "#FFFACD", border=2,
+                      header_rows=stats_rows(stats.get(fact_name)))
     
     # Add connected dimensions
     for dim_name in sorted(connected_dims):
         if dim_name in all_tables:
-            dim_columns = all_tables[dim_name]
-            cols_html = "".join([
-                f'<TR><TD ALIGN="LEFT" PORT="{c["name"]}">{c["name"]}</TD><TD ALIGN="LEFT">{c["type"]}</TD></TR>'
-                for c in dim_columns
-            ])
-            dot_lines.append(f'  {dim_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0" BGCOLOR="#E6F3FF">')
-            dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="#87CEEB"><B>{dim_name}</B></TD></TR>')
-            dot_lines.append(f'    {cols_html}')
-            dot_lines.append(f'  </TABLE>>];')
+            writer.table_node(dim_name, column_rows(all_tables[dim_name]), "#87CEEB", "#E6F3FF",
+                              header_rows=stats_rows(stats.get(dim_name)))
     
     # Add FK relationships
-    for col in fact_columns:
-        col_name = col["name"]
-        if col_name.endswith("_key"):
-            for dim_name in connected_dims:
-                dim_suffix = dim_name.replace("dim_", "") + "_key"
-                if col_name == dim_suffix or col_name.endswith(f"_{dim_suffix}"):
-                    dot_lines.append(f'  {fact_name}:{col_name} -> {dim_name}:{col_name};')
-                    break
-                if col_name in [c["name"] for c in all_tables[dim_name]]:
-                    dot_lines.append(f'  {fact_name}:{col_name} -> {dim_name}:{col_name};')
-                    break
+    for col_name, dim_name in fk_relations:
+        writer.edge(fact_name, col_name, dim_name, col_name)
+    
+    writer.end()
+    return len(connected_dims)
+
+
+def build_star_dot(fact_name, fact_columns, all_tables, fk_index=None, stats=None):
+    """Build DOT source for a star schema; returns (dot_content, dim_count)."""
+    return dot_to_string(write_star_dot, fact_name, fact_columns, all_tables, fk_index, stats)
+
+
+def generate_star_erd(fact_name, fact_columns, all_tables, output_dir, cache=None, fk_index=None, stats=None):
+    """Generate star schema ERD for a single fact table."""
+    dot_content, dim_count = build_star_dot(fact_name, fact_columns, all_tables, fk_index, stats)
+    output_file = render_dot(dot_content, os.path.join(output_dir, f"star_{fact_name}"), cache=cache)
+    return output_file, dim_count
+
+
+def list_datasets(client, project_id):
+    """Return the sorted dataset IDs of a project."""
+    return sorted(ds.dataset_id for ds in client.list_datasets(project_id))
+
+
+def fetch_region_schemas(project_id, region, client=None, datasets=None):
+    """
+    Fetch every dataset's table schemas in a region with one query.
     
-    dot_lines.append('}')
-    dot_content = "\n".join(dot_lines)
+    Uses the region-level INFORMATION_SCHEMA.COLUMNS view and splits the rows
+    by table_schema. Returns {dataset_id: {table_name: columns}}; `datasets`
+    keeps only those datasets.
+    """
+    if client is None:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=project_id)
     
-    # Render
-    output_base = os.path.join(output_dir, f"star_{fact_name}")
-    graph = graphviz.Source(dot_content)
-    graph.render(output_base, format='png', cleanup=True)
+    query = f"""
+    SELECT 
+        table_schema,
+        table_name,
+        column_name,
+        data_type,
+        is_nullable,
+        ordinal_position
+    FROM `{project_id}.region-{region}.INFORMATION_SCHEMA.COLUMNS`
+    ORDER BY table_schema, table_name, ordinal_position
+    """
     
-    return f"{output_base}.png", len(connected_dims)
+    wanted = set(datasets) if datasets else None
+    with span("bq_query", view=f"region-{region}.INFORMATION_SCHEMA.COLUMNS"):
+        results = client.query(query).to_arrow()
+    count("bq_rows", results.num_rows)
+    
+    # One table_schema column scan, then bulk decode of each dataset's slice
+    schemas = {}
+    start = 0
+    for dataset_id, group in groupby(results.column("table_schema").to_pylist()):
+        length = sum(1 for _ in group)
+        if wanted is None or dataset_id in wanted:
+            schemas[dataset_id] = decode_columns(results.slice(start, length))
+        start += length
+    
+    return schemas
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Generate ERD from BigQuery dataset")
-    parser.add_argument("--output", default="BQ_erd_generated", help="Output directory")
-    parser.add_argument("--project", default="project-534688f2-c3a9-4bff-95a", help="GCP Project ID")
-    parser.add_argument("--dataset", default="netflix_dw", help="BigQuery Dataset ID")
+def harvest_schemas(project_id, datasets, snapshot_paths, client=None, workers=4, full_refresh=False):
+    """
+    Refresh several dataset snapshots concurrently on a bounded thread pool.
     
-    args = parser.parse_args()
+    Returns {dataset_id: (tables, refreshed_table_names, error)}; a dataset
+    that fails to fetch gets tables=None and its exception, and the others
+    still complete.
+    """
+    if client is None:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=project_id)
+    
+    def refresh(dataset_id):
+        try:
+            with span("refresh_snapshot", dataset=dataset_id):
+                tables, refreshed = refresh_schema_snapshot(
+                    project_id, dataset_id, snapshot_paths[dataset_id], client=client, full_refresh=full_refresh
+                )
+            return tables, refreshed, None
+        except Exception as e:
+            return None, [], e
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(refresh, datasets)
+        return dict(zip(datasets, results))
+
+
+def harvest_stats(project_id, datasets, snapshot_paths, client, workers=4, full_refresh=False):
+    """
+    Refresh several dataset snapshots concurrently together with their table
+    statistics (bq_metadata), so --offline --stats can reuse them.
+    
+    Like refresh_schema_snapshot(), only tables whose last-modified time
+    changed (or that have no stats yet) are re-read from COLUMNS; unchanged
+    tables keep their columns and partition/cluster keys. Sizes change with
+    every load, so TABLE_STORAGE, PARTITIONS and TABLE_OPTIONS (one small
+    row per table) are re-read on every run.
+    
+    Returns {dataset_id: (tables, stats, refreshed_table_names, view_errors,
+    error)}; view_errors lists metadata views that failed without failing
+    the dataset.
+    """
+    def harvest(dataset_id):
+        try:
+            with span("harvest_metadata", dataset=dataset_id):
+                snapshot = None if full_refresh else load_schema_snapshot(snapshot_paths[dataset_id])
+                if snapshot is None or snapshot.get("project") != project_id or snapshot.get("dataset") != dataset_id:
+                    snapshot = {"project": project_id, "dataset": dataset_id, "tables": {}}
+                modified = fetch_table_modified_times(client, project_id, dataset_id)
+                cached = snapshot["tables"]
+                previous = snapshot.get("stats", {})
+                changed = sorted(set(changed_tables(cached, modified)) | (set(cached) - set(previous)))
+                previous = {name: entry for name, entry in previous.items() if name in cached and name not in changed}
+                fresh, stats, view_errors = harvest_metadata(
+                    project_id, dataset_id, client, table_names=changed, previous=previous
+                )
+            for name in changed:
+                cached[name] = {"last_modified": modified[name], "columns": fresh.get(name, [])}
+            snapshot["stats"] = stats
+            snapshot["fetched_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            save_schema_snapshot(snapshot_paths[dataset_id], snapshot)
+            return snapshot_tables(snapshot), stats, changed, view_errors, None
+        except Exception as e:
+            return None, {}, [], {}, e
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(harvest, datasets)
+        return dict(zip(datasets, results))
+
+
+def dataset_output_dir(output, dataset_id, multi):
+    """Each dataset renders into its own subdirectory when several are harvested."""
+    return os.path.join(output, dataset_id) if multi else output
+
+
+def render_dataset(tables, output_dir, args, cache, stats=None):
+    """
+    Build and render the table, star and full diagrams for one dataset.
+    `stats` ({table_name: bq_metadata entry}) annotates the table and star
+    diagrams. Returns failure count.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stats = stats or {}
+    count("tables", len(tables))
+    count("columns", sum(len(columns) for columns in tables.values()))
     
-    os.makedirs(args.output, exist_ok=True)
+    # Build every DOT source up front, then render them all (optionally in parallel)
+    sections = []
     
-    print(f"Fetching schemas from BigQuery: {args.project}.{args.dataset}")
+    jobs = []
+    for table_name, columns in sorted(tables.items()):
+        is_fact = table_name.startswith("fact_")
+        with span("build_dot", diagram=table_name):
+            dot_content = build_table_dot(table_name, columns, is_fact, stats.get(table_name))
+        jobs.append((os.path.join(output_dir, table_name), dot_content, f"{table_name} ({len(columns)} cols)"))
+    sections.append(("1. Generating individual table schemas...", jobs))
+    
+    jobs = []
+    with span("build_fk_index"):
+        fk_index = build_fk_index(tables)
+    count("fk_columns", len(fk_index))
+    facts = {k: v for k, v in tables.items() if k.startswith("fact_")}
+    for fact_name, fact_columns in sorted(facts.items()):
+        with span("build_dot", diagram=f"star_{fact_name}"):
+            dot_content, dim_count = build_star_dot(fact_name, fact_columns, tables, fk_index, stats)
+        jobs.append((os.path.join(output_dir, f"star_{fact_name}"), dot_content, f"{fact_name} → {dim_count} dims"))
+    sections.append(("2. Generating star schema diagrams...", jobs))
+    
+    # With --tiled the full ERD is laid out tile by tile after these sections
+    if not args.tiled:
+        if args.stream:
+            # Write the full ERD straight into dot stdin while it is rendered
+            full_dot = lambda writer: write_full_dot(writer, tables, fk_index)
+        else:
+            with span("build_dot", diagram="full_erd"):
+                full_dot = build_full_dot(tables, fk_index)
+        jobs = [(os.path.join(output_dir, "full_erd"), full_dot, "full_erd.png")]
+        sections.append(("3. Generating full ERD...", jobs))
+    
+    all_jobs = [job for _, jobs in sections for job in jobs]
+    results = render_many([job[:2] for job in all_jobs], workers=args.jobs, cache=cache, backend=args.render_backend)
+    
+    failures = 0
+    for title, jobs in sections:
+        print(f"\n{title}")
+        for job in jobs:
+            output_file, error = next(results)
+            if error is None:
+                print(f"  ✓ {job[2]}")
+            else:
+                failures += 1
+                print(f"  ✗ {job[2]}: {error}")
+    
+    if args.tiled:
+        print("\n3. Generating tiled full ERD...")
+        failures += print_tiled(render_tiled(
+            tables, full_relations(tables, fk_index), os.path.join(output_dir, "full_erd"),
+            workers=args.jobs, budget=args.tile_budget, max_tables=args.tile_max_tables,
+            backend=args.render_backend, cache=cache, column_limit=20,
+        ))
+    
+    if failures:
+        print(f"\n{failures} diagram(s) failed to render")
+    return failures
+
+
+def run(args):
+    """Load or fetch the schemas and render every dataset."""
+    args.render_backend = resolve_backend(args.render_backend)
     
     try:
         import graphviz
@@ -255,37 +565,309 @@ def main():
         print("Error: pip install graphviz")
         return
     
-    try:
-        tables = fetch_bq_schemas(args.project, args.dataset)
-    except Exception as e:
-        print(f"Error fetching from BigQuery: {e}")
-        print("Make sure you're authenticated: gcloud auth application-default login")
+    client = None
+    datasets = sorted(set(args.dataset))
+    if args.ddl and len(datasets) > 1:
+        print("Error: --ddl only applies to a single dataset")
         return
-    
-    print(f"Found {len(tables)} tables")
-    
-    # Generate individual table schemas
-    print("\n1. Generating individual table schemas...")
-    for table_name, columns in sorted(tables.items()):
-        is_fact = table_name.startswith("fact_")
-        output_file = generate_table_erd(table_name, columns, args.output, is_fact)
-        print(f"  ✓ {table_name} ({len(columns)} cols)")
-    
-    # Generate star schemas for each fact
-    print("\n2. Generating star schema diagrams...")
-    facts = {k: v for k, v in tables.items() if k.startswith("fact_")}
-    for fact_name, fact_columns in sorted(facts.items()):
-        output_file, dim_count = generate_star_erd(fact_name, fact_columns, tables, args.output)
-        print(f"  ✓ {fact_name} → {dim_count} dims")
-    
-    # Generate full ERD
-    print("\n3. Generating full ERD...")
-    output_file = generate_full_erd(tables, args.output)
-    print(f"  ✓ full_erd.png")
-    
+    if args.fixture and (args.ddl or args.offline or args.region or args.all_datasets):
+        print("Error: --fixture replaces BigQuery; drop --ddl/--offline/--region/--all-datasets")
+        return
+    if args.stats and args.region and not (args.offline or args.ddl):
+        print("Error: --stats harvests each dataset's metadata views; drop --region")
+        return
+    if args.fixture:
+        client = FixtureClient(args.fixture)
+        datasets = [client.meta["dataset"]]
+    elif (args.all_datasets or args.region) and not (args.offline or args.ddl):
+        try:
+            from google.cloud import bigquery
+            client = bigquery.Client(project=args.project)
+            if args.all_datasets:
+                datasets = list_datasets(client, args.project)
+        except Exception as e:
+            print(f"Error listing datasets: {e}")
+            print("Make sure you're authenticated: gcloud auth application-default login")
+            return
+    
+    if args.snapshot and (len(datasets) > 1 or args.all_datasets):
+        print("Error: --snapshot only applies to a single dataset")
+        return
+    snapshot_paths = {d: args.snapshot or default_snapshot_path(d) for d in datasets}
+    
+    # dataset -> tables (None when fetching failed); dataset -> {table: stats entry}
+    schemas = {}
+    dataset_stats = {}
+    if args.fixture:
+        print(f"Loading metadata from fixture: {args.fixture} (recorded {client.meta.get('recorded_at', '?')})")
+        tables, stats, view_errors = harvest_metadata(client.project, datasets[0], client)
+        for view, error in view_errors.items():
+            print(f"  ✗ {view}: {error}")
+        schemas[datasets[0]] = dict(sorted(tables.items()))
+        dataset_stats[datasets[0]] = stats
+    elif args.ddl:
+        print(f"Loading schemas from DDL: {args.ddl}")
+        with span("load_ddl", path=args.ddl):
+            schema = load_ddl_schema(args.ddl)
+        schemas[datasets[0]] = schema_to_tables(schema)
+        if args.stats:
+            # The DDL carries partition and cluster keys but no sizes
+            dataset_stats[datasets[0]] = ddl_stats(schema)
+    elif args.offline:
+        for dataset_id in datasets:
+            print(f"Loading schemas from snapshot: {snapshot_paths[dataset_id]}")
+            with span("load_snapshot", dataset=dataset_id):
+                snapshot = load_schema_snapshot(snapshot_paths[dataset_id])
+            if snapshot is None:
+                print(f"  ✗ {dataset_id}: no schema snapshot found; run once without --offline to create it")
+            schemas[dataset_id] = snapshot_tables(snapshot) if snapshot else None
+            if args.stats and snapshot:
+                if "stats" not in snapshot:
+                    print(f"  {dataset_id}: snapshot has no table statistics; run once with --stats to add them")
+                dataset_stats[dataset_id] = snapshot.get("stats", {})
+    elif args.region:
+        print(f"Fetching schemas from BigQuery: {args.project} region-{args.region}")
+        try:
+            region_schemas = fetch_region_schemas(
+                args.project, args.region, client, None if args.all_datasets else datasets
+            )
+        except Exception as e:
+            print(f"Error fetching from BigQuery: {e}")
+            print("Make sure you're authenticated: gcloud auth application-default login")
+            return
+        if args.all_datasets:
+            datasets = sorted(region_schemas)
+        for dataset_id in datasets:
+            tables = region_schemas.get(dataset_id, {})
+            # Region queries carry no last-modified times; the next incremental refresh re-reads them
+            save_schema_snapshot(args.snapshot or default_snapshot_path(dataset_id), {
+                "project": args.project,
+                "dataset": dataset_id,
+                "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "tables": {name: {"last_modified": None, "columns": cols} for name, cols in tables.items()},
+            })
+            schemas[dataset_id] = dict(sorted(tables.items()))
+    elif args.stats:
+        print(f"Fetching schemas and table statistics from BigQuery: {', '.join(f'{args.project}.{d}' for d in datasets)}")
+        try:
+            if client is None:
+                from google.cloud import bigquery
+                client = bigquery.Client(project=args.project)
+            with span("harvest_stats"):
+                harvested = harvest_stats(args.project, datasets, snapshot_paths, client,
+                                          workers=args.fetch_workers, full_refresh=args.full_refresh)
+        except Exception as e:
+            print(f"Error fetching from BigQuery: {e}")
+            print("Make sure you're authenticated: gcloud auth application-default login")
+            print("Or render from the last snapshot with --offline")
+            return
+        for dataset_id in datasets:
+            tables, stats, refreshed, view_errors, error = harvested[dataset_id]
+            if error is not None:
+                print(f"  ✗ {dataset_id}: {error}")
+            else:
+                print(f"  {dataset_id}: refreshed {len(refreshed)} changed table(s) and statistics for {len(stats)}; "
+                      f"snapshot saved to {snapshot_paths[dataset_id]}")
+            for view, view_error in view_errors.items():
+                print(f"  ✗ {dataset_id} {view}: {view_error}")
+            schemas[dataset_id] = tables
+            dataset_stats[dataset_id] = stats
+    else:
+        print(f"Fetching schemas from BigQuery: {', '.join(f'{args.project}.{d}' for d in datasets)}")
+        try:
+            with span("harvest_schemas"):
+                harvested = harvest_schemas(
+                    args.project, datasets, snapshot_paths, client=client,
+                    workers=args.fetch_workers, full_refresh=args.full_refresh
+                )
+        except Exception as e:
+            print(f"Error fetching from BigQuery: {e}")
+            print("Make sure you're authenticated: gcloud auth application-default login")
+            print("Or render from the last snapshot with --offline")
+            return
+        for dataset_id in datasets:
+            tables, refreshed, error = harvested[dataset_id]
+            if error is not None:
+                print(f"  ✗ {dataset_id}: {error}")
+            else:
+                print(f"  {dataset_id}: refreshed {len(refreshed)} changed table(s); snapshot saved to {snapshot_paths[dataset_id]}")
+            schemas[dataset_id] = tables
+    
+    cache = cache_from_args(args)
+    multi = len(datasets) > 1
+    failures = 0
+    for dataset_id in datasets:
+        tables = schemas.get(dataset_id)
+        if tables is None:
+            failures += 1
+            continue
+        output_dir = dataset_output_dir(args.output, dataset_id, multi)
+        if multi:
+            print(f"\n=== {dataset_id} ===")
+        print(f"Found {len(tables)} tables")
+        with span("render_dataset", dataset=dataset_id):
+            failures += render_dataset(tables, output_dir, args, cache, dataset_stats.get(dataset_id))
+    
+    if cache is not None:
+        cache.evict()
+        print(f"\n{cache.summary()}")
+    if multi and failures:
+        print(f"\n{failures} diagram(s) or dataset(s) failed")
     print(f"\nAll ERDs saved to {args.output}/")
 
 
+class FakeClient:
+    """
+    bigquery.Client stand-in for --self-check: answers list_datasets, __TABLES__
+    and INFORMATION_SCHEMA.COLUMNS from {dataset: {table: [(column, type)]}}.
+    Records the (dataset, table_names) of every COLUMNS query.
+    """
+
+    def __init__(self, datasets, modified=None):
+        self.datasets = datasets
+        self.modified = modified or {d: {name: 1 for name in tables} for d, tables in datasets.items()}
+        self.column_queries = []
+
+    def list_datasets(self, project_id):
+        return [SimpleNamespace(dataset_id=d) for d in self.datasets]
+
+    def query(self, sql, job_config=None):
+        import pyarrow as pa
+
+        dataset = re.search(r"`[^`]*?\.([^`.]+)\.(?:INFORMATION_SCHEMA|__TABLES__)", sql).group(1)
+        if "__TABLES__" in sql:
+            modified = self.modified[dataset]
+            return FixtureJob(pa.table({"table_id": list(modified), "last_modified_time": list(modified.values())}))
+        names = None
+        for param in getattr(job_config, "query_parameters", None) or []:
+            if param.name == "table_names":
+                names = sorted(param.values)
+        self.column_queries.append((dataset, names))
+        rows = [
+            (name, column, data_type, "YES", position)
+            for name, columns in sorted(self.datasets[dataset].items()) if names is None or name in names
+            for position, (column, data_type) in enumerate(columns, 1)
+        ]
+        fields = ["table_name", "column_name", "data_type", "is_nullable", "ordinal_position"]
+        return FixtureJob(pa.table({field: [row[i] for row in rows] for i, field in enumerate(fields)}))
+
+
+def self_check(fixture=DEFAULT_FIXTURE_DIR):
+    """
+    Harvest two in-memory datasets through FakeClient (no BigQuery library or
+    credentials) into temporary snapshots, then replay the recorded metadata
+    fixture through incremental snapshot refresh. Returns the failing checks.
+    """
+    failures = []
+
+    def expect(name, got, want):
+        if got != want:
+            failures.append(f"{name}: got {got!r}, expected {want!r}")
+
+    datasets = {
+        "netflix_dw": {"dim_plan": [("plan_key", "INT64"), ("plan_name", "STRING")],
+                       "fact_plan_change": [("plan_change_id", "STRING"), ("to_plan_key", "INT64")]},
+        "netflix_dw_stage": {"stg_plan": [("plan_name", "STRING")]},
+    }
+    client = FakeClient(datasets)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {d: os.path.join(tmp, f"{d}_schema_snapshot.json") for d in datasets}
+        expect("list_datasets", list_datasets(client, PROJECT_ID), sorted(datasets))
+        harvested = harvest_schemas(PROJECT_ID, sorted(datasets), paths, client=client)
+        for dataset_id, tables in datasets.items():
+            fetched, refreshed, error = harvested[dataset_id]
+            expect(f"{dataset_id} error", error, None)
+            expect(f"{dataset_id} columns", {name: [c["name"] for c in columns] for name, columns in (fetched or {}).items()},
+                   {name: [c[0] for c in columns] for name, columns in tables.items()})
+            snapshot = load_schema_snapshot(paths[dataset_id]) or {}
+            expect(f"{dataset_id} snapshot", (snapshot.get("dataset"), sorted(snapshot.get("tables", {}))),
+                   (dataset_id, sorted(tables)))
+        expect("COLUMNS queries", sorted(client.column_queries),
+               [(d, sorted(tables)) for d, tables in sorted(datasets.items())])
+    expect("output dirs", [dataset_output_dir("out", d, True) for d in sorted(datasets)],
+           [os.path.join("out", d) for d in sorted(datasets)])
+    expect("single-dataset output dir", dataset_output_dir("out", "netflix_dw", False), "out")
+
+    client = FixtureClient(fixture)
+    dataset_id = client.meta["dataset"]
+    recorded = dict(sorted(decode_columns(client.tables["COLUMNS"]).items()))
+    changed, dropped = list(recorded)[:2]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{dataset_id}_schema_snapshot.json")
+        tables, refreshed = refresh_schema_snapshot(client.project, dataset_id, path, client=client)
+        expect("fixture first refresh", refreshed, list(recorded))
+        expect("fixture columns match COLUMNS.arrow", tables == recorded, True)
+        client.queries.clear()
+        tables, refreshed = refresh_schema_snapshot(client.project, dataset_id, path, client=client)
+        expect("fixture unchanged refresh", (refreshed, client.queries, tables == recorded), ([], ["__TABLES__"], True))
+        client.modified[changed] += 1
+        del client.modified[dropped]
+        tables, refreshed = refresh_schema_snapshot(client.project, dataset_id, path, client=client)
+        expect("fixture changed refresh", (refreshed, list(tables)), ([changed], [t for t in recorded if t != dropped]))
+        expect("fixture changed columns", tables.get(changed), recorded[changed])
+
+    # decode_metadata() on the recorded views, then --stats harvests replayed incrementally
+    client = FixtureClient(fixture)
+    tables, stats = decode_metadata(dict(client.tables))
+    columns = client.tables["COLUMNS"].to_pydict()
+    storage = client.tables["TABLE_STORAGE"].to_pydict()
+    expect("decoded tables", (sorted(tables), tables == recorded), (list(recorded), True))
+    expect("decoded partition keys", {t: e["partition_by"] for t, e in stats.items() if e["partition_by"]},
+           {t: c for t, c, p in zip(columns["table_name"], columns["column_name"], columns["is_partitioning_column"])
+            if p == "YES"})
+    expect("decoded row counts", {t: stats[t]["rows"] for t in storage["table_name"]},
+           dict(zip(storage["table_name"], storage["total_rows"])))
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {dataset_id: os.path.join(tmp, f"{dataset_id}_schema_snapshot.json")}
+
+        def harvest():
+            client.queries.clear()
+            harvested_tables, harvested_stats, refreshed, _, error = harvest_stats(
+                client.project, [dataset_id], paths, client)[dataset_id]
+            return error, refreshed, harvested_tables == recorded, harvested_stats == stats
+
+        expect("stats first harvest", harvest(), (None, list(recorded), True, True))
+        expect("stats unchanged harvest", harvest(), (None, [], True, True))
+        expect("stats unchanged views", sorted(client.queries),
+               ["COLUMNS", "PARTITIONS", "TABLE_OPTIONS", "TABLE_STORAGE", "__TABLES__"])
+        client.modified[changed] += 1
+        expect("stats changed harvest", harvest(), (None, [changed], True, True))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate ERD from BigQuery datasets")
+    parser.add_argument("--output", default="BQ_erd_generated", help="Output directory (one subdirectory per dataset when several)")
+    parser.add_argument("--project", default="project-534688f2-c3a9-4bff-95a", help="GCP Project ID")
+    parser.add_argument("--dataset", nargs="+", default=["netflix_dw"], help="One or more BigQuery Dataset IDs")
+    parser.add_argument("--all-datasets", action="store_true", help="Harvest every dataset in the project")
+    parser.add_argument("--region", help="Fetch all datasets with one region-level INFORMATION_SCHEMA query (e.g. eu, us)")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="Datasets fetched concurrently")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of diagrams to render in parallel")
+    parser.add_argument("--snapshot", help="Schema snapshot file for a single dataset (default: scripts/<dataset>_schema_snapshot.json)")
+    parser.add_argument("--offline", action="store_true", help="Render from the schema snapshot without querying BigQuery")
+    parser.add_argument("--stream", action="store_true", help="Pipe the full ERD straight into dot stdin (skips the render cache)")
+    parser.add_argument("--ddl", nargs="?", const=DEFAULT_DDL_PATH, help="Render from a BigQuery DDL file instead of querying (default: Netflix_BigQuery_DDL.sql)")
+    parser.add_argument("--full-refresh", action="store_true", help="Ignore the snapshot and re-read every table")
+    parser.add_argument("--stats", action="store_true", help="Annotate table and star diagrams with row counts, bytes and partition/cluster keys")
+    parser.add_argument("--fixture", nargs="?", const=DEFAULT_FIXTURE_DIR, help="Render from a recorded metadata fixture instead of BigQuery (implies --stats)")
+    add_cache_arguments(parser)
+    add_backend_argument(parser)
+    add_tile_arguments(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--self-check", action="store_true",
+                        help="Harvest in-memory datasets and replay --fixture through snapshot refresh, then exit")
+    
+    args = parser.parse_args()
+    if args.self_check:
+        failures = self_check(args.fixture or DEFAULT_FIXTURE_DIR)
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        print(f"  {'✓' if not failures else '✗'} {len(failures)} self-check(s) failed")
+        return
+    with profiling(args):
+        run(args)
+
+
 if __name__ == "__main__":
     main()
-
@@ -9,6 +9,11 @@ Two methods supported:
 Usage:
     python generate_erd.py --method quickdbd > quickdbd_schema.txt
     python generate_erd.py --method metadata > schema_metadata.sql
+    python generate_erd.py --method star-schemas --output star-schemas --jobs 8
+    python generate_erd.py --method star-schemas --output star-schemas --ddl
+    python generate_erd.py --method star-schemas --output star-schemas --render-backend pygraphviz
+    python generate_erd.py --method bigquery-erd --output scripts --tiled --jobs 8
+    python generate_erd.py --method serve --port 8765
     
 References:
 - QuickDBD: https://www.quickdatabasediagrams.com/
@@ -18,6 +23,12 @@ References:
 
 import argparse
 
+from ddl_parser import DEFAULT_DDL_PATH, load_ddl_schema
+from erd_profile import add_profile_arguments, count, profiling, span
+from erd_render import add_backend_argument, add_cache_arguments, cache_from_args, resolve_backend
+from erd_tiles import add_tile_arguments
+from erd_server import add_server_arguments, serve_from_args
+
 # Netflix DW Schema Definition
 SCHEMA = {
     "dimensions": {
@@ -399,8 +410,9 @@ SCHEMA = {
 }
 
 
-def generate_quickdbd_format():
+def generate_quickdbd_format(schema=None):
     """Generate QuickDBD format for visual ERD tool."""
+    schema = schema or SCHEMA
     output = []
     output.append("# Netflix Data Warehouse ERD")
     output.append("# Paste this into https://www.quickdatabasediagrams.com/")
@@ -409,7 +421,7 @@ def generate_quickdbd_format():
     output.append("")
     
     # Generate dimensions
-    for table_name, table_def in SCHEMA["dimensions"].items():
+    for table_name, table_def in schema["dimensions"].items():
         output.append(f"{table_name}")
         output.append("-")
         for col in table_def["columns"]:
@@ -429,7 +441,7 @@ def generate_quickdbd_format():
     output.append("")
     
     # Generate facts
-    for table_name, table_def in SCHEMA["facts"].items():
+    for table_name, table_def in schema["facts"].items():
         output.append(f"{table_name}")
         output.append("-")
         for col in table_def["columns"]:
@@ -477,15 +489,16 @@ ORDER BY table_name, column_name;
     return "\n".join(output)
 
 
-def generate_bq_erd_descriptions():
+def generate_bq_erd_descriptions(schema=None):
     """Generate SQL to add FK descriptions for bigquery-erd package."""
+    schema = schema or SCHEMA
     output = []
     output.append("-- SQL statements to add FK descriptions for bigquery-erd")
     output.append("-- Run these to enable automatic ERD generation")
     output.append("-- Reference: https://pypi.org/project/bigquery-erd/")
     output.append("")
     
-    all_tables = {**SCHEMA["dimensions"], **SCHEMA["facts"]}
+    all_tables = {**schema["dimensions"], **schema["facts"]}
     
     for table_name, table_def in all_tables.items():
         for col in table_def["columns"]:
@@ -500,56 +513,59 @@ ALTER COLUMN {col_name} SET OPTIONS (description='-> {fk_ref}');
     return "\n".join(output)
 
 
-def generate_erd_image(output_file="netflix_dw_erd.png"):
+def write_erd_dot(writer, schema=None):
+    """Stream DOT source for the full ERD of the built-in schema into a DotWriter."""
+    schema = schema or SCHEMA
+    from dot_writer import column_rows
+    
+    writer.begin(
+        "ERD",
+        'graph [rankdir=LR, splines=ortho, nodesep=0.8];',
+        'node [shape=none, fontname="Helvetica", fontsize=10];',
+        'edge [arrowhead=crow, arrowtail=none];',
+    )
+    
+    # Add dimension tables
+    for table_name, table_def in schema["dimensions"].items():
+        writer.table_node(table_name, column_rows(table_def["columns"]), "lightblue")
+    
+    # Add fact tables
+    for table_name, table_def in schema["facts"].items():
+        writer.table_node(table_name, column_rows(table_def["columns"]), "lightyellow")
+    
+    # Add relationships (FK -> PK)
+    for table_name, col_name, target_table, target_col in schema_relations(schema):
+        writer.edge(table_name, col_name, target_table, target_col)
+    
+    writer.end()
+
+
+def schema_relations(schema=None):
+    """Return (table, column, target_table, target_column) for every FK in the schema."""
+    schema = schema or SCHEMA
+    relations = []
+    for table_name, table_def in {**schema["dimensions"], **schema["facts"]}.items():
+        for col in table_def["columns"]:
+            if len(col) >= 4 and "FK" in col[2]:
+                # col[3] is like "dim_date.date_key"
+                target_table, target_col = col[3].split(".")
+                relations.append((table_name, col[0], target_table, target_col))
+    return relations
+
+
+def generate_erd_image(output_file="netflix_dw_erd.png", cache=None, stream=False, backend="subprocess", tiles=None):
     """
     Generate ERD image from built-in schema using graphviz.
+    With `stream`, DOT is written straight into the stdin of `dot` (no cache).
+    With `tiles` (render_tiled keyword arguments: workers, budget, max_tables),
+    the ERD is laid out as subject-area tiles stitched into an overview.
     Requires: pip install graphviz
               brew install graphviz
     """
     try:
         import graphviz
-        
-        # Build DOT content from built-in schema
-        dot_lines = [
-            'digraph ERD {',
-            '  graph [rankdir=LR, splines=ortho, nodesep=0.8];',
-            '  node [shape=none, fontname="Helvetica", fontsize=10];',
-            '  edge [arrowhead=crow, arrowtail=none];',
-            ''
-        ]
-        
-        # Add dimension tables
-        for table_name, table_def in SCHEMA["dimensions"].items():
-            cols_html = "".join([
-                f'<TR><TD ALIGN="LEFT" PORT="{c[0]}">{c[0]}</TD><TD ALIGN="LEFT">{c[1]}</TD></TR>'
-                for c in table_def["columns"]
-            ])
-            dot_lines.append(f'  {table_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0">')
-            dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="lightblue"><B>{table_name}</B></TD></TR>')
-            dot_lines.append(f'    {cols_html}')
-            dot_lines.append(f'  </TABLE>>];')
-        
-        # Add fact tables
-        for table_name, table_def in SCHEMA["facts"].items():
-            cols_html = "".join([
-                f'<TR><TD ALIGN="LEFT" PORT="{c[0]}">{c[0]}</TD><TD ALIGN="LEFT">{c[1]}</TD></TR>'
-                for c in table_def["columns"]
-            ])
-            dot_lines.append(f'  {table_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0">')
-            dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="lightyellow"><B>{table_name}</B></TD></TR>')
-            dot_lines.append(f'    {cols_html}')
-            dot_lines.append(f'  </TABLE>>];')
-        
-        # Add relationships (FK -> PK)
-        for table_name, table_def in {**SCHEMA["dimensions"], **SCHEMA["facts"]}.items():
-            for col in table_def["columns"]:
-                if len(col) >= 4 and "FK" in col[2]:
-                    # col[3] is like "dim_date.date_key"
-                    target_table, target_col = col[3].split(".")
-                    dot_lines.append(f'  {table_name}:{col[0]} -> {target_table}:{target_col};')
-        
-        dot_lines.append('}')
-        dot_content = "\n".join(dot_lines)
+        from dot_writer import dot_to_string
+        from erd_render import render_dot
         
         # Determine output format
         output_base = output_file.rsplit('.', 1)[0]
@@ -558,8 +574,24 @@ def generate_erd_image(output_file="netflix_dw_erd.png"):
         print(f"Generating ERD with {len(SCHEMA['dimensions'])} dimensions, {len(SCHEMA['facts'])} facts...")
         print(f"Rendering to: {output_file}")
         
-        graph = graphviz.Source(dot_content)
-        graph.render(output_base, format=output_format, cleanup=True)
+        count("tables", len(SCHEMA["dimensions"]) + len(SCHEMA["facts"]))
+        count("columns", sum(len(t["columns"]) for t in {**SCHEMA["dimensions"], **SCHEMA["facts"]}.values()))
+        if tiles is not None:
+            from erd_tiles import print_tiled, render_tiled
+            
+            tables = {name: table_def["columns"] for name, table_def in {**SCHEMA["dimensions"], **SCHEMA["facts"]}.items()}
+            failures = print_tiled(render_tiled(
+                tables, schema_relations(), output_base, output_format, cache=cache, backend=backend, **tiles
+            ))
+            if failures:
+                print(f"{failures} tile(s) failed to render")
+                return False
+        elif stream:
+            render_dot(write_erd_dot, output_base, output_format)
+        else:
+            with span("build_dot", diagram="full_erd"):
+                dot_content = dot_to_string(write_erd_dot)
+            render_dot(dot_content, output_base, output_format, cache=cache, backend=backend)
         
         print(f"ERD saved to {output_file}")
         return True
@@ -576,79 +608,97 @@ def generate_erd_image(output_file="netflix_dw_erd.png"):
         return False
 
 
-def generate_star_schema_diagrams(output_dir="scripts"):
+def write_star_schema_dot(writer, fact_name, fact_def, schema=None):
+    """
+    Stream DOT source for one fact table in the center with its connected
+    dimensions into a DotWriter. Returns the connected dimension count.
+    """
+    from dot_writer import column_rows
+    schema = schema or SCHEMA
+    
+    # Find all dimensions this fact connects to
+    connected_dims = set()
+    fk_relations = []
+    
+    for col in fact_def["columns"]:
+        if len(col) >= 4 and "FK" in col[2]:
+            target_table, target_col = col[3].split(".")
+            connected_dims.add(target_table)
+            fk_relations.append((col[0], target_table, target_col))
+    
+    # Build DOT for this star schema
+    writer.begin(
+        "star_schema",
+        'graph [rankdir=LR, splines=ortho, nodesep=0.5, ranksep=1.5];',
+        'node [shape=none, fontname="Helvetica", fontsize=11];',
+        'edge [arrowhead=crow, arrowtail=none, color="#666666"];',
+    )
+    
+    # Add fact table (center, yellow)
+    writer.table_node(fact_name, column_rows(fact_def["columns"]), "#FFD700", "#FFFACD", border=2)
+    
+    # Add connected dimension tables (blue)
+    for dim_name in sorted(connected_dims):
+        if dim_name in schema["dimensions"]:
+            dim_def = schema["dimensions"][dim_name]
+            writer.table_node(dim_name, column_rows(dim_def["columns"]), "#87CEEB", "#E6F3FF")
+    
+    # Add FK relationships
+    for fk_col, target_table, target_col in fk_relations:
+        writer.edge(fact_name, fk_col, target_table, target_col)
+    
+    writer.end()
+    return len(connected_dims)
+
+
+def build_star_schema_dot(fact_name, fact_def, schema=None):
+    """
+    Build DOT source for one fact table in the center with its connected dimensions.
+    Returns (dot_content, connected_dim_count).
+    """
+    from dot_writer import dot_to_string
+    
+    return dot_to_string(write_star_schema_dot, fact_name, fact_def, schema)
+
+
+def generate_star_schema_diagrams(output_dir="scripts", jobs=1, cache=None, backend="subprocess"):
     """
     Generate individual star schema diagrams for each fact table.
     Each diagram shows one fact table in the center with its connected dimensions.
+    All DOT sources are built first; `jobs` > 1 renders them in parallel and
+    `cache` (an erd_render.RenderCache) skips diagrams whose DOT is unchanged.
     """
     try:
         import graphviz
         import os
+        from erd_render import render_many
         
         os.makedirs(output_dir, exist_ok=True)
         
-        generated_files = []
-        
+        render_jobs = []
+        dim_counts = []
         for fact_name, fact_def in SCHEMA["facts"].items():
-            # Find all dimensions this fact connects to
-            connected_dims = set()
-            fk_relations = []
-            
-            for col in fact_def["columns"]:
-                if len(col) >= 4 and "FK" in col[2]:
-                    target_table, target_col = col[3].split(".")
-                    connected_dims.add(target_table)
-                    fk_relations.append((col[0], target_table, target_col))
-            
-            # Build DOT for this star schema
-            dot_lines = [
-                'digraph star_schema {',
-                '  graph [rankdir=LR, splines=ortho, nodesep=0.5, ranksep=1.5];',
-                '  node [shape=none, fontname="Helvetica", fontsize=11];',
-                '  edge [arrowhead=crow, arrowtail=none, color="#666666"];',
-                ''
-            ]
-            
-            # Add fact table (center, yellow)
-            fact_cols_html = "".join([
-                f'<TR><TD ALIGN="LEFT" PORT="{c[0]}">{c[0]}</TD><TD ALIGN="LEFT">{c[1]}</TD></TR>'
-                for c in fact_def["columns"]
-            ])
-            dot_lines.append(f'  {fact_name} [label=<<TABLE BORDER="2" CELLBORDER="0" CELLSPACING="0" BGCOLOR="#FFFACD">')
-            dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="#FFD700"><B>{fact_name}</B></TD></TR>')
-            dot_lines.append(f'    {fact_cols_html}')
-            dot_lines.append(f'  </TABLE>>];')
-            
-            # Add connected dimension tables (blue)
-            for dim_name in sorted(connected_dims):
-                if dim_name in SCHEMA["dimensions"]:
-                    dim_def = SCHEMA["dimensions"][dim_name]
-                    dim_cols_html = "".join([
-                        f'<TR><TD ALIGN="LEFT" PORT="{c[0]}">{c[0]}</TD><TD ALIGN="LEFT">{c[1]}</TD></TR>'
-                        for c in dim_def["columns"]
-                    ])
-                    dot_lines.append(f'  {dim_name} [label=<<TABLE BORDER="1" CELLBORDER="0" CELLSPACING="0" BGCOLOR="#E6F3FF">')
-                    dot_lines.append(f'    <TR><TD COLSPAN="2" BGCOLOR="#87CEEB"><B>{dim_name}</B></TD></TR>')
-                    dot_lines.append(f'    {dim_cols_html}')
-                    dot_lines.append(f'  </TABLE>>];')
-            
-            # Add FK relationships
-            for fk_col, target_table, target_col in fk_relations:
-                dot_lines.append(f'  {fact_name}:{fk_col} -> {target_table}:{target_col};')
-            
-            dot_lines.append('}')
-            dot_content = "\n".join(dot_lines)
-            
-            # Render
-            output_base = os.path.join(output_dir, f"star_{fact_name}")
-            graph = graphviz.Source(dot_content)
-            graph.render(output_base, format='png', cleanup=True)
-            
-            output_file = f"{output_base}.png"
+            with span("build_dot", diagram=f"star_{fact_name}"):
+                dot_content, dim_count = build_star_schema_dot(fact_name, fact_def)
+            render_jobs.append((os.path.join(output_dir, f"star_{fact_name}"), dot_content))
+            dim_counts.append(dim_count)
+        
+        generated_files = []
+        results = render_many(render_jobs, workers=jobs, cache=cache, backend=backend)
+        for fact_name, dim_count, (output_file, error) in zip(SCHEMA["facts"], dim_counts, results):
+            if error is not None:
+                print(f"  ✗ {fact_name}: {error}")
+                continue
             generated_files.append(output_file)
-            print(f"  ✓ {fact_name} → {len(connected_dims)} dims → {output_file}")
+            print(f"  ✓ {fact_name} → {dim_count} dims → {output_file}")
         
+        failed = len(render_jobs) - len(generated_files)
+        if failed:
+            print(f"\n{failed} star schema diagram(s) failed to render")
         print(f"\nGenerated {len(generated_files)} star schema diagrams in {output_dir}/")
+        if cache is not None:
+            cache.evict()
+            print(cache.summary())
         return generated_files
         
     except ImportError as e:
@@ -662,39 +712,38 @@ def generate_star_schema_diagrams(output_dir="scripts"):
         return []
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Generate ERD for Netflix DW")
-    parser.add_argument(
-        "--method", 
-        choices=["quickdbd", "metadata", "descriptions", "bigquery-erd", "star-schemas", "all"],
-        default="all",
-        help="Output format: star-schemas generates one diagram per fact table"
-    )
-    parser.add_argument(
-        "--project", 
-        default="project-534688f2-c3a9-4bff-95a",
-        help="GCP Project ID"
-    )
-    parser.add_argument(
-        "--output", 
-        default="scripts",
-        help="Output file (for bigquery-erd) or directory (for star-schemas)"
-    )
-    
-    args = parser.parse_args()
+def run(args):
+    """Run the selected --method."""
+    if args.ddl:
+        with span("load_ddl", path=args.ddl):
+            SCHEMA.update(load_ddl_schema(args.ddl))
     
     if args.method == "quickdbd":
-        print(generate_quickdbd_format())
+        with span("generate_quickdbd_format"):
+            print(generate_quickdbd_format())
     elif args.method == "metadata":
         print(generate_bq_metadata_queries(args.project))
     elif args.method == "descriptions":
-        print(generate_bq_erd_descriptions())
+        with span("generate_bq_erd_descriptions"):
+            print(generate_bq_erd_descriptions())
     elif args.method == "bigquery-erd":
         output = args.output if args.output.endswith('.png') else f"{args.output}/netflix_dw_erd.png"
-        generate_erd_image(output)
+        cache = cache_from_args(args)
+        tiles = None
+        if args.tiled:
+            tiles = {"workers": args.jobs, "budget": args.tile_budget, "max_tables": args.tile_max_tables}
+        generate_erd_image(
+            output, cache=cache, stream=args.stream, backend=resolve_backend(args.render_backend), tiles=tiles
+        )
+        if cache is not None:
+            cache.evict()
     elif args.method == "star-schemas":
         print("Generating individual star schema diagrams...")
-        generate_star_schema_diagrams(args.output)
+        generate_star_schema_diagrams(
+            args.output, jobs=args.jobs, cache=cache_from_args(args), backend=resolve_backend(args.render_backend)
+        )
+    elif args.method == "serve":
+        serve_from_args(SCHEMA, args)
     else:
         print("=" * 60)
         print("QUICKDBD FORMAT (paste into quickdatabasediagrams.com)")
@@ -712,6 +761,52 @@ def main():
         print(generate_bq_erd_descriptions())
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate ERD for Netflix DW")
+    parser.add_argument(
+        "--method", 
+        choices=["quickdbd", "metadata", "descriptions", "bigquery-erd", "star-schemas", "serve", "all"],
+        default="all",
+        help="Output format: star-schemas generates one diagram per fact table, serve runs the render server"
+    )
+    parser.add_argument(
+        "--project", 
+        default="project-534688f2-c3a9-4bff-95a",
+        help="GCP Project ID"
+    )
+    parser.add_argument(
+        "--output", 
+        default="scripts",
+        help="Output file (for bigquery-erd) or directory (for star-schemas)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of diagrams to render in parallel (star-schemas, or tiles with --tiled)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Pipe the full ERD straight into dot stdin instead of building it in memory (bigquery-erd, skips cache)"
+    )
+    parser.add_argument(
+        "--ddl",
+        nargs="?",
+        const=DEFAULT_DDL_PATH,
+        help="Build SCHEMA from a BigQuery DDL file instead of the dict below (default: Netflix_BigQuery_DDL.sql)"
+    )
+    add_cache_arguments(parser)
+    add_backend_argument(parser)
+    add_tile_arguments(parser)
+    add_profile_arguments(parser)
+    add_server_arguments(parser)
+    
+    args = parser.parse_args()
+    with profiling(args):
+        run(args)
+
+
 if __name__ == "__main__":
     main()
 
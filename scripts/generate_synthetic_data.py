@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for the Netflix Data Warehouse.
+
+Driven by SCHEMA in generate_erd.py: dimensions are filled first (in FK
+dependency order), then every fact foreign key is sampled from the
+surrogate keys that were actually generated, so all rows join cleanly.
+Columns are produced in NumPy batches and facts are written chunk by
+chunk, so memory stays bounded by --chunk-size no matter how many rows.
+
+Usage:
+    python scripts/generate_synthetic_data.py --output synthetic_data
+    python scripts/generate_synthetic_data.py --output synthetic_data --rows 5000000 --skew 1.5 --seed 7
+    python scripts/generate_synthetic_data.py --fact-rows fact_viewing_session=20000000 --format parquet
+
+Requires: pip install numpy
+Optional: pip install pyarrow   (faster CSV, Parquet output)
+"""
+
+import argparse
+import csv
+import os
+import time
+
+from calendar_dims import CalendarLookup, date_dimension, time_dimension
+from generate_erd import SCHEMA
+
+DEFAULT_START_DATE = "2023-01-01"
+DEFAULT_END_DATE = "2024-12-31"
+DEFAULT_FACT_ROWS = 1_000_000
+DEFAULT_CHUNK_SIZE = 500_000
+
+# Base dimension sizes (scaled by --dim-scale); dim_date/dim_time/dim_term/
+# dim_referral_depth have fixed contents
+DEFAULT_DIM_ROWS = {
+    "dim_user": 100_000,
+    "dim_profile": 250_000,
+    "dim_geography": 500,
+    "dim_plan": 12,
+    "dim_device": 50_000,
+    "dim_content": 20_000,
+    "dim_rights_holder": 200,
+    "dim_partner_store": 300,
+    "dim_promotion": 50,
+    "dim_payment_method": 8,
+    "dim_currency": 5,
+    "dim_voucher": 100_000,
+    "dim_status": 20,
+    "dim_prospect": 100_000,
+}
+FIXED_DIMS = {"dim_date", "dim_time", "dim_term", "dim_referral_depth"}
+
+TERM_MONTHS = [1, 3, 12, 24]
+MAX_REFERRAL_DEPTH = 10
+
+# Low-cardinality STRING columns get realistic values instead of "<col>_<n>"
+VOCAB = {
+    "gender": ["F", "M", "U"],
+    "age_band": ["0-17", "18-24", "25-34", "35-44", "45-54", "55-64", "65+"],
+    "signup_channel": ["web", "ios", "android", "smart_tv", "partner_store", "referral"],
+    "device_type": ["smart_tv", "mobile", "tablet", "desktop", "set_top_box"],
+    "os": ["tizen", "webos", "android", "ios", "windows", "macos"],
+    "content_type": ["movie", "show", "channel", "documentary", "kids"],
+    "genre": ["drama", "comedy", "action", "thriller", "documentary", "kids", "sport", "news"],
+    "contract_type": ["revenue_share", "flat_fee", "minimum_guarantee"],
+    "promotion_type": ["VOUCHER", "TV_BUNDLE", "REFERRAL", "NONE"],
+    "voucher_type": ["gift_1uah", "tv_bundle"],
+    "status_group": ["subscription", "voucher", "playback", "device", "profile"],
+    "provider": ["visa", "mastercard", "apple_pay", "google_pay", "liqpay"],
+    "chain": ["Foxtrot", "Comfy", "Eldorado", "Rozetka", "Allo"],
+    "country_code": ["UA", "PL", "DE", "MD", "RO", "CZ"],
+}
+# *_count columns are unit event counters, except these real measures
+NON_UNIT_COUNTS = {"households_count"}
+UNIQUE_STRING_SUFFIXES = ("_id", "_code", "_hash", "title", "name", "description", "hhmmss")
+
+
+def parse_row_overrides(values):
+    """Parse ["fact_x=100", ...] into {"fact_x": 100}."""
+    overrides = {}
+    for value in values or []:
+        name, _, count = value.partition("=")
+        overrides[name] = int(count)
+    return overrides
+
+
+def _fk_target(col):
+    """Return (table, column) of an FK definition tuple, or None."""
+    if len(col) >= 4 and "FK" in col[2]:
+        return tuple(col[3].split("."))
+    return None
+
+
+def dimension_order():
+    """Dimensions sorted so every FK target is generated before its referrers."""
+    dims = SCHEMA["dimensions"]
+    ordered, seen = [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for col in dims[name]["columns"]:
+            target = _fk_target(col)
+            if target and target[0] in dims and target[0] != name:
+                visit(target[0])
+        ordered.append(name)
+
+    for name in dims:
+        visit(name)
+    return ordered
+
+
+def sample_keys(rng, keys, size, skew=0.0):
+    """
+    Sample `size` surrogate keys from `keys`.
+    skew=0 is uniform; larger values concentrate rows on a few hot members
+    (u ** (1 + skew) over the key array, a cheap Zipf-like power law).
+    """
+    import numpy as np
+
+    if skew <= 0:
+        return keys[rng.integers(0, len(keys), size)]
+    idx = (len(keys) * rng.random(size) ** (1.0 + skew)).astype(np.int64)
+    return keys[np.minimum(idx, len(keys) - 1)]
+
+
+def _random_values(rng, col_name, col_type, size, start, end, offset=0):
+    """Vectorized filler for a non-key column."""
+    import numpy as np
+
+    if col_type == "INT64":
+        return rng.integers(0, 1000, size)
+    if col_type == "NUMERIC":
+        return np.round(rng.gamma(2.0, 5.0, size), 2)
+    if col_type == "BOOL":
+        return rng.random(size) < 0.5
+    if col_type == "DATE":
+        return start + rng.integers(0, (end - start).astype(np.int64) + 1, size).astype("timedelta64[D]")
+    if col_type == "TIMESTAMP":
+        span = ((end + 1) - start).astype("timedelta64[s]").astype(np.int64)
+        return start.astype("datetime64[s]") + rng.integers(0, span, size).astype("timedelta64[s]")
+    if col_name in VOCAB:
+        return np.array(VOCAB[col_name], dtype=object)[rng.integers(0, len(VOCAB[col_name]), size)]
+    if col_name.endswith(UNIQUE_STRING_SUFFIXES):
+        return np.char.add(f"{col_name}_", np.arange(offset, offset + size).astype(str)).astype(object)
+    return np.char.add(f"{col_name}_", rng.integers(0, 20, size).astype(str)).astype(object)
+
+
+def _fixed_dimension(name, start, end):
+    """Contents of the dimensions that are not random: date, time, term, depth."""
+    import numpy as np
+
+    if name == "dim_date":
+        return date_dimension(start, end)
+    if name == "dim_time":
+        return time_dimension()
+    if name == "dim_term":
+        return {"term_key": np.arange(1, len(TERM_MONTHS) + 1), "term_months": np.array(TERM_MONTHS)}
+    if name == "dim_referral_depth":
+        depth = np.arange(1, MAX_REFERRAL_DEPTH + 1)
+        return {"depth_key": depth, "depth": depth}
+    raise KeyError(name)
+
+
+def generate_dimensions(rng, start, end, dim_rows=None, dim_scale=1.0):
+    """
+    Generate every dimension in memory. Returns {dim_name: {column: array}}.
+    SCD2 dimensions get one current version per business key.
+    """
+    import numpy as np
+
+    dim_rows = {**DEFAULT_DIM_ROWS, **(dim_rows or {})}
+    dims = {}
+    for name in dimension_order():
+        if name in FIXED_DIMS:
+            dims[name] = _fixed_dimension(name, start, end)
+            continue
+
+        base = dim_rows.get(name, 1000)
+        # Small lookup dims (plans, currencies, statuses) keep their size
+        size = base if base < 100 else max(1, int(base * dim_scale))
+        data = {}
+        for col in SCHEMA["dimensions"][name]["columns"]:
+            col_name, col_type = col[0], col[1]
+            target = _fk_target(col)
+            if len(col) >= 3 and "PK" in col[2]:
+                data[col_name] = np.arange(1, size + 1)
+            elif target:
+                data[col_name] = sample_keys(rng, dims[target[0]][target[1]], size)
+            elif col_name == "is_current":
+                data[col_name] = np.ones(size, dtype=bool)
+            elif col_name == "effective_end_ts":
+                data[col_name] = np.full(size, np.datetime64("NaT"), dtype="datetime64[s]")
+            else:
+                data[col_name] = _random_values(rng, col_name, col_type, size, start, end)
+        if name == "dim_profile" and "dim_user" in dims:
+            # Profiles belong to generated users
+            data["user_id"] = sample_keys(rng, dims["dim_user"]["user_id"], size)
+        dims[name] = data
+    return dims
+
+
+def _time_prefixes(columns):
+    """Map a TIMESTAMP column to its prefix when derived <prefix>_date/_date_key/_time_key exist."""
+    names = {c[0] for c in columns}
+    prefixes = {}
+    for col in columns:
+        if col[1] == "TIMESTAMP" and col[0].endswith("_ts"):
+            prefix = col[0][:-3]
+            if f"{prefix}_date" in names or f"{prefix}_date_key" in names:
+                prefixes[col[0]] = prefix
+    return prefixes
+
+
+def generate_fact_chunks(fact_name, total_rows, dims, rng, start, end, skew=0.0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield {column: array} chunks for one fact, FK-consistent with `dims`.
+
+    Date/time keys agree with their DATE/TIMESTAMP columns (start_ts ->
+    start_date, start_date_key, start_time_key), months_purchased follows
+    term_key, and PK,FK columns (voucher lifecycle) never repeat a key.
+    """
+    import numpy as np
+
+    columns = SCHEMA["facts"][fact_name]["columns"]
+    names = {c[0] for c in columns}
+    ts_prefixes = _time_prefixes(columns)
+    date_key_values = dims["dim_date"]["date_key"]
+    calendar = CalendarLookup(start, end)
+
+    unique_fk = [c for c in columns if len(c) >= 3 and "PK" in c[2] and _fk_target(c)]
+    if unique_fk:
+        table, key_col = _fk_target(unique_fk[0])
+        unique_pool = rng.permutation(dims[table][key_col])
+        total_rows = min(total_rows, len(unique_pool))
+
+    offset = 0
+    while offset < total_rows:
+        size = min(chunk_size, total_rows - offset)
+        data = {}
+        derived = set()
+
+        # Timestamps first, so their date/time keys can be derived
+        for ts_col, prefix in ts_prefixes.items():
+            ts = _random_values(rng, ts_col, "TIMESTAMP", size, start, end)
+            data[ts_col] = ts
+            if f"{prefix}_date" in names:
+                data[f"{prefix}_date"] = ts.astype("datetime64[D]")
+                derived.add(f"{prefix}_date")
+            if f"{prefix}_date_key" in names:
+                data[f"{prefix}_date_key"] = calendar.date_keys(ts)
+                derived.add(f"{prefix}_date_key")
+            if f"{prefix}_time_key" in names:
+                data[f"{prefix}_time_key"] = calendar.time_keys(ts)
+                derived.add(f"{prefix}_time_key")
+
+        for col in columns:
+            col_name, col_type = col[0], col[1]
+            if col_name in data:
+                continue
+            target = _fk_target(col)
+            if col in unique_fk:
+                data[col_name] = unique_pool[offset:offset + size]
+            elif len(col) >= 3 and "PK" in col[2]:
+                data[col_name] = np.char.add(f"{fact_name}-", np.arange(offset, offset + size).astype(str)).astype(object)
+            elif target == ("dim_date", "date_key"):
+                data[col_name] = sample_keys(rng, date_key_values, size)
+            elif target:
+                data[col_name] = sample_keys(rng, dims[target[0]][target[1]], size, skew)
+            elif col_type == "TIMESTAMP" and col_name.startswith("end") and "start_ts" in data:
+                data[col_name] = data["start_ts"] + rng.integers(60, 4 * 3600, size).astype("timedelta64[s]")
+            else:
+                data[col_name] = _random_values(rng, col_name, col_type, size, start, end, offset)
+
+        # DATE columns paired with an FK'd <date>_key take the key's date
+        for col in columns:
+            if col[1] == "DATE" and f"{col[0]}_key" in data and col[0] not in derived:
+                data[col[0]] = calendar.dates(data[f"{col[0]}_key"])
+
+        if "months_purchased" in data and "term_key" in data:
+            data["months_purchased"] = np.array(TERM_MONTHS)[data["term_key"] - 1]
+        if {"price_amount", "discount_amount", "net_amount"} <= names:
+            data["discount_amount"] = np.round(data["price_amount"] * rng.random(size) * 0.3, 2)
+            data["net_amount"] = np.round(data["price_amount"] - data["discount_amount"], 2)
+        for col_name in names - NON_UNIT_COUNTS:
+            if col_name.endswith("_count"):
+                data[col_name] = np.ones(size, dtype=np.int64)
+
+        yield {c[0]: data[c[0]] for c in columns}
+        offset += size
+
+
+def _format_column(values):
+    """Array -> list of CSV strings (NaT becomes an empty field)."""
+    import numpy as np
+
+    if values.dtype.kind == "M":
+        unit = "D" if values.dtype == np.dtype("datetime64[D]") else "s"
+        text = np.datetime_as_string(values, unit=unit)
+        return np.where(np.isnat(values), "", text).tolist()
+    return values.tolist()
+
+
+def write_table(path, column_names, chunks, output_format="csv"):
+    """Write column-dict chunks to CSV or Parquet one chunk at a time. Returns row count."""
+    rows = 0
+    if output_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.table({name: chunk[name] for name in column_names})
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        pa = None
+
+    with open(path, "wb" if pa else "w", **({} if pa else {"newline": "", "encoding": "utf-8"})) as f:
+        if pa is None:
+            writer = csv.writer(f)
+            writer.writerow(column_names)
+        for i, chunk in enumerate(chunks):
+            if pa is not None:
+                table = pa.table({name: chunk[name] for name in column_names})
+                pacsv.write_csv(table, f, pacsv.WriteOptions(include_header=(i == 0)))
+                rows += table.num_rows
+            else:
+                columns = [_format_column(chunk[name]) for name in column_names]
+                writer.writerows(zip(*columns))
+                rows += len(columns[0])
+    return rows
+
+
+def generate_dataset(output_dir, fact_rows=None, default_fact_rows=DEFAULT_FACT_ROWS, dim_rows=None,
+                     dim_scale=1.0, skew=0.0, seed=42, chunk_size=DEFAULT_CHUNK_SIZE,
+                     output_format="csv", start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                     facts=None):
+    """
+    Generate all dimensions, then each fact, into output_dir/<table>.<format>.
+    Returns {table_name: row_count}.
+    """
+    import numpy as np
+
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    start, end = np.datetime64(start_date, "D"), np.datetime64(end_date, "D")
+    fact_rows = fact_rows or {}
+    counts = {}
+
+    dims = generate_dimensions(rng, start, end, dim_rows, dim_scale)
+    for name, data in dims.items():
+        path = os.path.join(output_dir, f"{name}.{output_format}")
+        counts[name] = write_table(path, list(data), [data], output_format)
+        print(f"  ✓ {name} ({counts[name]:,} rows)")
+
+    for fact_name in facts or SCHEMA["facts"]:
+        total = fact_rows.get(fact_name, default_fact_rows)
+        started = time.perf_counter()
+        chunks = generate_fact_chunks(fact_name, total, dims, rng, start, end, skew, chunk_size)
+        path = os.path.join(output_dir, f"{fact_name}.{output_format}")
+        column_names = [c[0] for c in SCHEMA["facts"][fact_name]["columns"]]
+        counts[fact_name] = write_table(path, column_names, chunks, output_format)
+        elapsed = time.perf_counter() - started
+        print(f"  ✓ {fact_name} ({counts[fact_name]:,} rows, {counts[fact_name] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate FK-consistent synthetic data for Netflix DW")
+    parser.add_argument("--output", default="synthetic_data", help="Output directory")
+    parser.add_argument("--rows", type=int, default=DEFAULT_FACT_ROWS, help="Rows per fact table")
+    parser.add_argument("--fact-rows", nargs="*", metavar="FACT=N", help="Per-fact row counts, e.g. fact_viewing_session=5000000")
+    parser.add_argument("--dim-rows", nargs="*", metavar="DIM=N", help="Per-dimension row counts, e.g. dim_user=1000000")
+    parser.add_argument("--dim-scale", type=float, default=1.0, help="Multiply the default dimension sizes")
+    parser.add_argument("--facts", nargs="*", help="Only generate these facts")
+    parser.add_argument("--skew", type=float, default=0.0, help="FK skew: 0 = uniform, 1-3 = a few hot members")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows generated and written per batch")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output file format")
+    parser.add_argument("--start-date", default=DEFAULT_START_DATE, help="First date of generated activity")
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE, help="Last date of generated activity")
+
+    args = parser.parse_args()
+
+    try:
+        import numpy
+    except ImportError:
+        print("Error: pip install numpy")
+        return
+    if args.format == "parquet":
+        try:
+            import pyarrow
+        except ImportError:
+            print("Error: pip install pyarrow (required for --format parquet)")
+            return
+
+    print(f"Generating synthetic data into {args.output}/ (seed={args.seed}, skew={args.skew})")
+    started = time.perf_counter()
+    counts = generate_dataset(
+        args.output,
+        fact_rows=parse_row_overrides(args.fact_rows),
+        default_fact_rows=args.rows,
+        dim_rows=parse_row_overrides(args.dim_rows),
+        dim_scale=args.dim_scale,
+        skew=args.skew,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        output_format=args.format,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        facts=args.facts,
+    )
+    print(f"\nGenerated {sum(counts.values()):,} rows in {len(counts)} tables in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Local Netflix DW on an embedded DuckDB database.
+
+Creates all tables from SCHEMA (generate_erd.py), loads CSV/Parquet files
+produced by generate_synthetic_data.py (or any files named <table>.csv /
+<table>.parquet), and runs the README's analytic questions as a timed
+benchmark suite. No BigQuery project or network access is needed.
+
+Usage:
+    python scripts/local_dw.py --generate-rows 1000000 --benchmark
+    python scripts/local_dw.py --database netflix_dw.duckdb --data synthetic_data --benchmark --repeat 5
+    python scripts/local_dw.py --database netflix_dw.duckdb --benchmark --json bench_results.json
+    python scripts/local_dw.py --ddl --generate-rows 100000 --benchmark
+
+Requires: pip install duckdb numpy
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from ddl_parser import DEFAULT_DDL_PATH, load_ddl_schema
+from generate_erd import SCHEMA
+
+# BigQuery -> DuckDB column types
+TYPE_MAP = {
+    "INT64": "BIGINT",
+    "STRING": "VARCHAR",
+    "NUMERIC": "DECIMAL(38, 9)",
+    "BOOL": "BOOLEAN",
+    "DATE": "DATE",
+    "TIMESTAMP": "TIMESTAMP",
+}
+
+# The analytic questions from README.md, one query each
+BENCHMARK_QUERIES = {
+    "subscriptions_by_plan_term_region": """
+        SELECT p.plan_name, t.term_months, g.region,
+               COUNT(*) AS subscriptions, SUM(e.net_amount) AS net_amount
+        FROM fact_subscription_event e
+        JOIN dim_plan p ON p.plan_key = e.plan_key
+        JOIN dim_term t ON t.term_key = e.term_key
+        JOIN dim_geography g ON g.geo_key = e.geo_key
+        GROUP BY 1, 2, 3
+        ORDER BY subscriptions DESC
+    """,
+    "active_subscriptions_at_month_start_by_region": """
+        WITH subs AS (
+            SELECT geo_key, event_date AS start_date,
+                   CAST(event_date + to_months(CAST(months_purchased AS INTEGER)) AS DATE) AS end_date
+            FROM fact_subscription_event
+        )
+        SELECT d.calendar_date AS month_start, g.region, COUNT(*) AS active_subscriptions
+        FROM dim_date d
+        JOIN subs s ON s.start_date <= d.calendar_date AND s.end_date > d.calendar_date
+        JOIN dim_geography g ON g.geo_key = s.geo_key
+        WHERE d.month_start_flag
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """,
+    "content_purchases_by_rights_holder_per_month": """
+        SELECT date_trunc('month', tx.tx_date) AS month, rh.name AS rights_holder, c.content_type,
+               COUNT(*) AS transactions, SUM(tx.gross_amount) AS gross, SUM(tx.royalty_amount) AS royalty
+        FROM fact_content_tx tx
+        JOIN dim_rights_holder rh ON rh.rights_holder_key = tx.rights_holder_key
+        JOIN dim_content c ON c.content_key = tx.content_key
+        GROUP BY 1, 2, 3
+        ORDER BY 1, gross DESC
+    """,
+    "plan_transitions_and_churn_per_month": """
+        SELECT date_trunc('month', pc.change_date) AS month,
+               fp.plan_name AS from_plan, tp.plan_name AS to_plan,
+               COUNT(*) AS changes, SUM(CASE WHEN pc.churn_flag THEN 1 ELSE 0 END) AS churned
+        FROM fact_plan_change pc
+        JOIN dim_plan fp ON fp.plan_key = pc.from_plan_key
+        JOIN dim_plan tp ON tp.plan_key = pc.to_plan_key
+        GROUP BY 1, 2, 3
+        ORDER BY 1, changes DESC
+    """,
+    "vouchers_by_store_and_prospect_profile": """
+        SELECT ps.chain, ps.store_name, pr.age_band, pr.gender, SUM(vs.voucher_sale_count) AS vouchers
+        FROM fact_voucher_sale vs
+        JOIN dim_partner_store ps ON ps.partner_store_key = vs.partner_store_key
+        JOIN dim_prospect pr ON pr.prospect_key = vs.prospect_key
+        GROUP BY 1, 2, 3, 4
+        ORDER BY vouchers DESC
+    """,
+    "voucher_conversion_lags": """
+        SELECT ps.chain,
+               COUNT(*) AS vouchers,
+               SUM(CASE WHEN l.is_activated_flag AND NOT l.is_converted_flag THEN 1 ELSE 0 END) AS in_activation,
+               SUM(CASE WHEN l.is_converted_flag THEN 1 ELSE 0 END) AS converted,
+               AVG(l.lag_sale_to_activation_days) AS avg_sale_to_activation_days,
+               AVG(l.lag_activation_to_conversion_days) AS avg_activation_to_conversion_days
+        FROM fact_voucher_lifecycle l
+        JOIN dim_partner_store ps ON ps.partner_store_key = l.partner_store_key
+        GROUP BY 1
+        ORDER BY vouchers DESC
+    """,
+    "referral_top_referrers_and_bonuses": """
+        WITH friends AS (
+            SELECT referrer_user_key AS user_key, SUM(referral_count) AS friends
+            FROM fact_referral_edge GROUP BY 1
+        ), bonuses AS (
+            SELECT beneficiary_user_key AS user_key, SUM(bonus_amount) AS bonus
+            FROM fact_referral_bonus_tx GROUP BY 1
+        )
+        SELECT u.user_id, f.friends, COALESCE(b.bonus, 0) AS bonus
+        FROM friends f
+        JOIN dim_user u ON u.user_key = f.user_key
+        LEFT JOIN bonuses b ON b.user_key = f.user_key
+        ORDER BY f.friends DESC
+        LIMIT 100
+    """,
+    "tv_bundle_subscriptions_by_partner_store": """
+        SELECT ps.chain, ps.store_name, SUM(e.signup_count) AS bundle_signups
+        FROM fact_subscription_event e
+        JOIN dim_promotion pr ON pr.promotion_key = e.promotion_key
+        JOIN dim_partner_store ps ON ps.partner_store_key = e.partner_store_key
+        WHERE pr.promotion_type = 'TV_BUNDLE'
+        GROUP BY 1, 2
+        ORDER BY bundle_signups DESC
+    """,
+    "region_coverage_vs_demographics": """
+        WITH subs AS (
+            SELECT geo_key, COUNT(DISTINCT user_key) AS subscribers
+            FROM fact_subscription_event GROUP BY 1
+        ), demo AS (
+            SELECT geo_key, MAX(population) AS population
+            FROM fact_region_demographics GROUP BY 1
+        )
+        SELECT g.region, SUM(s.subscribers) AS subscribers, SUM(d.population) AS population,
+               SUM(s.subscribers) / NULLIF(SUM(d.population), 0) AS coverage
+        FROM demo d
+        JOIN dim_geography g ON g.geo_key = d.geo_key
+        LEFT JOIN subs s ON s.geo_key = d.geo_key
+        GROUP BY 1
+        ORDER BY coverage
+    """,
+    "most_watched_content": """
+        SELECT c.title, c.content_type, SUM(v.watch_seconds) / 3600.0 AS watch_hours
+        FROM fact_viewing_session v
+        JOIN dim_content c ON c.content_key = v.content_key
+        GROUP BY 1, 2
+        ORDER BY watch_hours DESC
+        LIMIT 100
+    """,
+    "viewing_by_demographics_device_day_part": """
+        SELECT p.age_band, p.gender, d.device_type, t.day_part, c.genre,
+               SUM(v.watch_seconds) / 3600.0 AS watch_hours
+        FROM fact_viewing_session v
+        JOIN dim_profile p ON p.profile_key = v.profile_key
+        JOIN dim_device d ON d.device_key = v.device_key
+        JOIN dim_time t ON t.time_key = v.start_time_key
+        JOIN dim_content c ON c.content_key = v.content_key
+        GROUP BY 1, 2, 3, 4, 5
+        ORDER BY watch_hours DESC
+    """,
+    "concurrent_streams_from_distinct_geos": """
+        SELECT a.profile_key, COUNT(DISTINCT b.geo_key) + 1 AS geos, COUNT(*) AS overlapping_sessions
+        FROM fact_viewing_session a
+        JOIN fact_viewing_session b
+          ON b.profile_key = a.profile_key
+         AND b.start_date = a.start_date
+         AND b.session_id > a.session_id
+         AND b.start_ts < a.end_ts
+         AND a.start_ts < b.end_ts
+         AND b.geo_key <> a.geo_key
+        GROUP BY 1
+        ORDER BY geos DESC, overlapping_sessions DESC
+        LIMIT 100
+    """,
+}
+
+
+def connect(database=":memory:"):
+    """Open (or create) a DuckDB database."""
+    import duckdb
+
+    return duckdb.connect(database)
+
+
+def all_tables(schema=SCHEMA):
+    return {**schema["dimensions"], **schema["facts"]}
+
+
+def create_schema(con, schema=SCHEMA, replace=False):
+    """Create every dimension and fact table from a SCHEMA-shaped dict (NOT NULL kept when present)."""
+    for table_name, table_def in all_tables(schema).items():
+        not_null = set(table_def.get("not_null", []))
+        columns = ",\n  ".join(
+            f"{c[0]} {TYPE_MAP.get(c[1], c[1])}{' NOT NULL' if c[0] in not_null else ''}"
+            for c in table_def["columns"]
+        )
+        verb = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+        con.execute(f"{verb} {table_name} (\n  {columns}\n)")
+
+
+def register_arrays(con, name, arrays):
+    """Expose a {column: NumPy array} dict to DuckDB as a view (via Arrow when installed)."""
+    try:
+        import pyarrow as pa
+
+        con.register(name, pa.table(arrays))
+    except ImportError:
+        con.register(name, arrays)
+
+
+def find_table_file(data_dir, table_name):
+    """Return the <table>.parquet or <table>.csv path in data_dir, or None."""
+    for ext in ("parquet", "csv"):
+        path = os.path.join(data_dir, f"{table_name}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def file_reader_sql(path):
+    """DuckDB table function reading a CSV, Parquet or JSONL file."""
+    escaped = path.replace("'", "''")
+    if path.endswith(".parquet"):
+        return f"read_parquet('{escaped}')"
+    if path.endswith((".jsonl", ".ndjson", ".json")):
+        return f"read_json_auto('{escaped}', format='newline_delimited')"
+    return f"read_csv_auto('{escaped}', header=true)"
+
+
+def load_table(con, table_name, path, column_names):
+    """
+    Append one CSV/Parquet file to a table, matching columns by name; table
+    columns the file lacks (e.g. the DDL's etl_* columns) stay NULL. Returns rows loaded.
+    """
+    reader = file_reader_sql(path)
+    present = {row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {reader}").fetchall()}
+    cols = ", ".join(c for c in column_names if c in present)
+    before = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    con.execute(f"INSERT INTO {table_name} ({cols}) SELECT {cols} FROM {reader}")
+    return con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0] - before
+
+
+def load_tables(con, data_dir, schema=SCHEMA):
+    """Load every table that has a file in data_dir. Returns {table: rows loaded}."""
+    counts = {}
+    for table_name, table_def in all_tables(schema).items():
+        path = find_table_file(data_dir, table_name)
+        if path is None:
+            continue
+        started = time.perf_counter()
+        counts[table_name] = load_table(con, table_name, path, [c[0] for c in table_def["columns"]])
+        print(f"  ✓ {table_name} ({counts[table_name]:,} rows, {time.perf_counter() - started:.2f}s)")
+    return counts
+
+
+def run_benchmarks(con, queries=None, repeat=3):
+    """
+    Time each benchmark query. Returns a list of
+    {"name", "rows", "min_ms", "median_ms", "runs_ms"} dicts in query order.
+    """
+    results = []
+    for name, sql in (queries or BENCHMARK_QUERIES).items():
+        runs = []
+        rows = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(con.execute(sql).fetchall())
+            runs.append((time.perf_counter() - started) * 1000)
+        results.append({
+            "name": name,
+            "rows": rows,
+            "min_ms": round(min(runs), 3),
+            "median_ms": round(statistics.median(runs), 3),
+            "runs_ms": [round(r, 3) for r in runs],
+        })
+        print(f"  ✓ {name:<48} {min(runs):>9.1f}ms  ({rows:,} rows)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local DuckDB backend and benchmark suite for Netflix DW")
+    parser.add_argument("--database", default=":memory:", help="DuckDB database file (default: in-memory)")
+    parser.add_argument("--data", help="Directory of <table>.csv/.parquet files to load")
+    parser.add_argument("--generate-rows", type=int, help="Generate this many synthetic rows per fact and load them")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for --generate-rows")
+    parser.add_argument("--replace", action="store_true", help="Drop and recreate tables before loading")
+    parser.add_argument("--benchmark", action="store_true", help="Run the analytic benchmark suite")
+    parser.add_argument("--queries", nargs="*", help="Only run these benchmark queries")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark query")
+    parser.add_argument("--json", help="Write benchmark results to this JSON file")
+    parser.add_argument("--ddl", nargs="?", const=DEFAULT_DDL_PATH,
+                        help="Create tables from a BigQuery DDL file (types, NOT NULL, etl columns) instead of SCHEMA")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+    except ImportError:
+        print("Error: pip install duckdb")
+        return
+
+    con = connect(args.database)
+    schema = load_ddl_schema(args.ddl) if args.ddl else SCHEMA
+    create_schema(con, schema, replace=args.replace)
+    print(f"Created {len(all_tables(schema))} tables in {args.database}{f' from {args.ddl}' if args.ddl else ''}")
+
+    if args.generate_rows:
+        from generate_synthetic_data import generate_dataset
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            print(f"\nGenerating {args.generate_rows:,} rows per fact...")
+            generate_dataset(data_dir, default_fact_rows=args.generate_rows, seed=args.seed, output_format="parquet")
+            print("\nLoading...")
+            load_tables(con, data_dir, schema)
+    elif args.data:
+        print(f"\nLoading {args.data}/...")
+        load_tables(con, args.data, schema)
+
+    if args.benchmark:
+        queries = BENCHMARK_QUERIES
+        if args.queries:
+            queries = {name: BENCHMARK_QUERIES[name] for name in args.queries}
+        print(f"\nRunning {len(queries)} benchmark queries x{args.repeat}...")
+        results = run_benchmarks(con, queries, args.repeat)
+        total = sum(r["min_ms"] for r in results)
+        print(f"\nTotal (best runs): {total:.1f}ms")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({
+                    "database": args.database,
+                    "duckdb_version": duckdb.__version__,
+                    "row_counts": {t: con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in all_tables(schema)},
+                    "results": results,
+                }, f, indent=2)
+            print(f"Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Partition and cluster advisor for the Netflix DW fact tables.
+
+Reads the schema (partition and cluster choices from Netflix_BigQuery_DDL.sql)
+and a workload of per-table filter / group-by columns, estimates bytes
+scanned by every query under the current layout and under alternative
+layouts, and prints ranked recommendations with the DDL to apply them.
+
+Workload sources:
+    --workload FILE   JSONL, one query per line, either structured
+                      {"table": "fact_viewing_session", "filters": {"start_date": "range", "user_key": "eq"},
+                       "group_by": ["content_key"], "columns": [...], "count": 120}
+                      ("filters" may also be a plain list, or map columns to a selectivity)
+                      or raw SQL: {"query": "SELECT ...", "count": 40}
+    (default)         the local_dw.py benchmark suite, parsed by DuckDB
+
+Cost model (BigQuery on-demand billing reads whole referenced columns from
+the partitions and blocks left after pruning):
+    bytes = rows x width of referenced columns x partition fraction x cluster fraction
+    - partition fraction: selectivity of the filter on the partition column
+    - cluster fraction: product of selectivities over the longest prefix of
+      cluster columns that the query filters on, never below one storage
+      block (--block-mb) per scanned partition
+Equality filters select 1/NDV, date ranges --range-days of the table's days,
+other ranges 25%. With --database, row counts, NDVs and day spans come from
+the local warehouse; otherwise every table is assumed to hold --rows rows.
+
+Usage:
+    python scripts/partition_advisor.py
+    python scripts/partition_advisor.py --database netflix_dw.duckdb --top 3
+    python scripts/partition_advisor.py --workload query_log.jsonl --json advice.json
+
+Requires: pip install duckdb
+"""
+
+import argparse
+import itertools
+import json
+import math
+import re
+
+from ddl_parser import DEFAULT_DDL_PATH, load_ddl_schema
+from dw_common import TYPE_BYTES, format_bytes, is_select_node, select_nodes, table_columns
+
+MAX_CLUSTER_COLUMNS = 4  # BigQuery limit
+MAX_CANDIDATE_COLUMNS = 8
+DEFAULT_ROWS = 1_000_000
+DEFAULT_DAYS = 730
+DEFAULT_RANGE_DAYS = 30
+DEFAULT_EQ_SELECTIVITY = 0.01
+DEFAULT_RANGE_SELECTIVITY = 0.25
+DEFAULT_BLOCK_MB = 64
+DATASET_PLACEHOLDER = "YOUR_PROJECT.YOUR_DATASET"
+
+# FLOAT64 (and nested types) cannot be clustering columns
+CLUSTERABLE_TYPES = {"INT64", "NUMERIC", "BIGNUMERIC", "BOOL", "DATE", "DATETIME", "TIMESTAMP", "STRING"}
+DATE_TYPES = {"DATE", "DATETIME", "TIMESTAMP"}
+PARTITION_EXPRESSIONS = {"DATE": "{col}", "TIMESTAMP": "DATE({col})", "DATETIME": "DATETIME_TRUNC({col}, DAY)"}
+
+_EQUALITY = {"COMPARE_EQUAL", "COMPARE_IN"}
+_RANGE = {"COMPARE_LESSTHAN", "COMPARE_GREATERTHAN", "COMPARE_LESSTHANOREQUALTO",
+          "COMPARE_GREATERTHANOREQUALTO", "COMPARE_BETWEEN"}
+
+
+def partition_column(partition_by):
+    """Column behind a PARTITION BY expression (`start_date`, `DATE(start_ts)`)."""
+    if not partition_by:
+        return None
+    match = re.search(r"\(\s*(\w+)", partition_by)
+    return match.group(1) if match else partition_by.strip()
+
+
+# --- Workload ---------------------------------------------------------------
+
+def _column_refs(expr):
+    """column_names lists referenced by an expression, not descending into subqueries."""
+    if isinstance(expr, dict):
+        if expr.get("class") == "COLUMN_REF":
+            yield expr["column_names"]
+            return
+        for key, value in expr.items():
+            if key != "subquery" and not is_select_node(value):
+                yield from _column_refs(value)
+    elif isinstance(expr, list):
+        for value in expr:
+            yield from _column_refs(value)
+
+
+def _scope(from_table, scope):
+    """Fill {alias: table} from a FROM clause."""
+    if not isinstance(from_table, dict):
+        return scope
+    if from_table.get("type") == "BASE_TABLE":
+        scope[from_table.get("alias") or from_table["table_name"]] = from_table["table_name"]
+    elif from_table.get("type") == "JOIN":
+        _scope(from_table.get("left"), scope)
+        _scope(from_table.get("right"), scope)
+    return scope
+
+
+def _unwrap(expr):
+    while isinstance(expr, dict) and expr.get("class") == "CAST":
+        expr = expr["child"]
+    return expr
+
+
+def _predicates(where):
+    """(column_names, "eq"/"range") for column-vs-constant predicates under top-level ANDs."""
+    if not isinstance(where, dict):
+        return
+    kind = where.get("type")
+    if kind == "CONJUNCTION_AND":
+        for child in where["children"]:
+            yield from _predicates(child)
+        return
+    if kind in _EQUALITY or kind in _RANGE:
+        if kind == "COMPARE_IN":
+            column, others = _unwrap(where["children"][0]), where["children"][1:]
+        elif kind == "COMPARE_BETWEEN":
+            column, others = _unwrap(where["input"]), [where["lower"], where["upper"]]
+        else:
+            left, right = _unwrap(where["left"]), _unwrap(where["right"])
+            column, others = (left, [right]) if left.get("class") == "COLUMN_REF" else (right, [left])
+        if column.get("class") == "COLUMN_REF" and not any(True for _ in _column_refs(others)):
+            yield column["column_names"], "eq" if kind in _EQUALITY else "range"
+
+
+def sql_usage(sql, columns_by_table, count=1):
+    """Per-table usage records ({table, filters, group_by, columns, count}) of one SQL query."""
+    import duckdb
+
+    tree = json.loads(duckdb.connect().execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+    if tree.get("error"):
+        raise ValueError(tree.get("error_message", "cannot parse query"))
+
+    usages = []
+    for node in select_nodes(tree["statements"]):
+        scope = {alias: table for alias, table in _scope(node.get("from_table"), {}).items()
+                 if table in columns_by_table}
+        if not scope:
+            continue
+
+        def resolve(names):
+            if len(names) >= 2:
+                table = scope.get(names[-2])
+                return (table, names[-1]) if table and names[-1] in columns_by_table[table] else None
+            owners = [table for table in scope.values() if names[0] in columns_by_table[table]]
+            return (owners[0], names[0]) if owners else None
+
+        records = {table: {"table": table, "filters": {}, "group_by": [], "columns": set(), "count": count}
+                   for table in set(scope.values())}
+        for names in _column_refs({k: v for k, v in node.items() if k != "cte_map"}):
+            ref = resolve(names)
+            if ref:
+                records[ref[0]]["columns"].add(ref[1])
+        for names, kind in _predicates(node.get("where_clause")):
+            ref = resolve(names)
+            if ref:
+                records[ref[0]]["filters"][ref[1]] = kind
+        for expr in node.get("group_expressions", []):
+            if expr.get("class") == "CONSTANT":  # GROUP BY 1
+                expr = node["select_list"][int(expr["value"]["value"]) - 1]
+            for names in _column_refs(expr):
+                ref = resolve(names)
+                if ref and ref[1] not in records[ref[0]]["group_by"]:
+                    records[ref[0]]["group_by"].append(ref[1])
+        usages += [r for r in records.values() if r["columns"]]
+    return usages
+
+
+def load_workload(path, columns_by_table):
+    """Usage records from a JSONL workload log."""
+    usages = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            count = entry.get("count", 1)
+            if "query" in entry:
+                usages += sql_usage(entry["query"], columns_by_table, count)
+                continue
+            table = entry["table"]
+            if table not in columns_by_table:
+                print(f"  ! line {line_no}: unknown table {table}, skipped")
+                continue
+            filters = entry.get("filters", {})
+            if isinstance(filters, list):
+                filters = {column: "eq" for column in filters}
+            group_by = list(entry.get("group_by", []))
+            columns = set(entry.get("columns") or list(filters) + group_by)
+            usages.append({"table": table, "filters": filters, "group_by": group_by,
+                           "columns": columns, "count": count})
+    return usages
+
+
+def benchmark_workload(columns_by_table):
+    """Usage records of the local_dw.py benchmark suite."""
+    from local_dw import BENCHMARK_QUERIES
+
+    usages = []
+    for sql in BENCHMARK_QUERIES.values():
+        usages += sql_usage(sql, columns_by_table)
+    return usages
+
+
+# --- Statistics -------------------------------------------------------------
+
+def table_stats(con, columns_by_table, usages):
+    """{table: {"rows", "ndv": {column: n}}} from the local warehouse for the tables in the workload."""
+    stats = {}
+    for table in sorted({u["table"] for u in usages}):
+        try:
+            present = {row[0] for row in con.execute(f"DESCRIBE {table}").fetchall()}
+        except Exception as e:
+            print(f"  ! {table}: {e}")
+            continue
+        wanted = sorted(({c for u in usages if u["table"] == table for c in u["filters"]}
+                         | {c for c, t in columns_by_table[table].items() if t in DATE_TYPES}) & present)
+        selects = ["count(*)"] + [f"approx_count_distinct(CAST({c} AS DATE))" if columns_by_table[table][c] in DATE_TYPES
+                                  else f"approx_count_distinct({c})" for c in wanted]
+        row = con.execute(f"SELECT {', '.join(selects)} FROM {table}").fetchone()
+        stats[table] = {"rows": row[0], "ndv": {c: n for c, n in zip(wanted, row[1:]) if n}}
+    return stats
+
+
+# --- Cost model -------------------------------------------------------------
+
+class CostModel:
+    """Estimated bytes scanned for one table's workload under a (partition, cluster) layout."""
+
+    def __init__(self, columns, usages, stats=None, rows=DEFAULT_ROWS, range_days=DEFAULT_RANGE_DAYS,
+                 block_mb=DEFAULT_BLOCK_MB):
+        self.columns = columns
+        self.usages = usages
+        self.rows = (stats or {}).get("rows") or rows
+        self.ndv = (stats or {}).get("ndv", {})
+        self.range_days = range_days
+        self.block_bytes = block_mb * 1024 * 1024
+        self.row_bytes = sum(TYPE_BYTES.get(t, 8) for t in columns.values())
+
+    def days(self, column):
+        return max(1, self.ndv.get(column) or DEFAULT_DAYS)
+
+    def selectivity(self, column, kind):
+        if isinstance(kind, (int, float)):
+            return min(1.0, max(float(kind), 0.0))
+        is_date = self.columns.get(column) in DATE_TYPES
+        if kind == "eq":
+            ndv = self.days(column) if is_date else self.ndv.get(column)
+            return 1.0 / ndv if ndv else DEFAULT_EQ_SELECTIVITY
+        if is_date:
+            return min(1.0, self.range_days / self.days(column))
+        return DEFAULT_RANGE_SELECTIVITY
+
+    def query_bytes(self, usage, partition, cluster):
+        width = sum(TYPE_BYTES.get(self.columns.get(c), 8) for c in usage["columns"])
+        fraction = 1.0
+        partitions = 1
+        if partition:
+            partitions = self.days(partition)
+            if partition in usage["filters"]:
+                fraction = max(self.selectivity(partition, usage["filters"][partition]), 1.0 / partitions)
+
+        cluster_fraction = 1.0
+        for column in cluster:
+            if column not in usage["filters"]:
+                break
+            cluster_fraction *= self.selectivity(column, usage["filters"][column])
+        blocks = self.rows * self.row_bytes / partitions / self.block_bytes
+        cluster_fraction = max(cluster_fraction, 1.0 / blocks if blocks > 1 else 1.0)
+        return usage["count"] * self.rows * width * fraction * cluster_fraction
+
+    def total_bytes(self, partition, cluster):
+        return sum(self.query_bytes(u, partition, cluster) for u in self.usages)
+
+    def group_locality(self, cluster):
+        """Queries whose GROUP BY includes the leading cluster column (tie-breaker only)."""
+        return sum(u["count"] for u in self.usages if cluster and cluster[0] in u["group_by"])
+
+
+def candidate_layouts(model, current_partition, current_cluster, allow_unpartitioned=False):
+    """(partition, cluster) pairs: current and filtered date partitions x ordered cluster prefixes."""
+    weights = {}
+    for usage in model.usages:
+        for column, kind in usage["filters"].items():
+            gain = -math.log(max(model.selectivity(column, kind), 1e-12))
+            weights[column] = weights.get(column, 0.0) + usage["count"] * gain
+
+    partitions = {current_partition} | {c for c in weights if model.columns.get(c) in DATE_TYPES}
+    if allow_unpartitioned or current_partition is None:
+        partitions.add(None)
+
+    clusterable = [c for c in sorted(weights, key=weights.get, reverse=True)
+                   if model.columns.get(c) in CLUSTERABLE_TYPES]
+    pool = list(dict.fromkeys(clusterable[:MAX_CANDIDATE_COLUMNS] + list(current_cluster[:MAX_CLUSTER_COLUMNS])))
+
+    layouts = {(current_partition, tuple(current_cluster))}
+    for partition in partitions:
+        columns = [c for c in pool if c != partition]
+        for size in range(0, MAX_CLUSTER_COLUMNS + 1):
+            for cluster in itertools.permutations(columns, size):
+                layouts.add((partition, cluster))
+    return layouts
+
+
+def advise_table(table, model, current_partition, current_cluster, top=3, allow_unpartitioned=False):
+    """Current layout cost plus the `top` cheapest alternatives."""
+    current_cluster = tuple(current_cluster)
+    current = (current_partition, current_cluster)
+    current_bytes = model.total_bytes(*current)
+
+    scored = []
+    for partition, cluster in candidate_layouts(model, current_partition, current_cluster, allow_unpartitioned):
+        if len(cluster) > MAX_CLUSTER_COLUMNS:
+            continue
+        scored.append((model.total_bytes(partition, cluster), -model.group_locality(cluster),
+                       len(cluster), (partition, cluster) != current, partition or "", cluster))
+    scored.sort()
+
+    recommendations = []
+    for total, _, _, _, partition, cluster in scored:
+        layout = (partition or None, cluster)
+        if layout == current or total >= current_bytes:
+            continue
+        # Skip layouts whose trailing cluster columns change nothing
+        if any(r["cluster"] == list(cluster[:len(r["cluster"])]) and r["partition"] == layout[0]
+               for r in recommendations):
+            continue
+        recommendations.append({
+            "partition": layout[0],
+            "cluster": list(cluster),
+            "bytes": total,
+            "saving": 1 - total / current_bytes if current_bytes else 0.0,
+        })
+        if len(recommendations) >= top:
+            break
+
+    return {
+        "table": table,
+        "queries": sum(u["count"] for u in model.usages),
+        "rows": model.rows,
+        "current": {"partition": current_partition, "cluster": list(current_cluster), "bytes": current_bytes,
+                    "valid": len(current_cluster) <= MAX_CLUSTER_COLUMNS},
+        "recommendations": recommendations,
+    }
+
+
+def layout_ddl(table, partition, cluster, columns, dataset=DATASET_PLACEHOLDER):
+    """CREATE OR REPLACE TABLE ... AS SELECT rewriting a table into a new layout."""
+    lines = [f"CREATE OR REPLACE TABLE `{dataset}.{table}`"]
+    if partition:
+        lines.append(f"PARTITION BY {PARTITION_EXPRESSIONS[columns.get(partition)].format(col=partition)}")
+    if cluster:
+        lines.append(f"CLUSTER BY {', '.join(cluster)}")
+    lines.append(f"AS SELECT * FROM `{dataset}.{table}`;")
+    return "\n".join(lines)
+
+
+def advise(schema, usages, stats=None, top=3, rows=DEFAULT_ROWS, range_days=DEFAULT_RANGE_DAYS,
+           block_mb=DEFAULT_BLOCK_MB, allow_unpartitioned=False):
+    """Advice for every fact table in the workload, largest saving first."""
+    columns_by_table = table_columns(schema)
+    results = []
+    for table in sorted({u["table"] for u in usages} & set(schema["facts"])):
+        definition = schema["facts"][table]
+        model = CostModel(columns_by_table[table], [u for u in usages if u["table"] == table],
+                          (stats or {}).get(table), rows, range_days, block_mb)
+        current_partition = partition_column(definition.get("partition_by"))
+        results.append(advise_table(table, model, current_partition, definition.get("cluster_by", []),
+                                      top, allow_unpartitioned))
+
+    def best_saving(result):
+        best = result["recommendations"][0]["bytes"] if result["recommendations"] else result["current"]["bytes"]
+        return result["current"]["bytes"] - best
+
+    results.sort(key=best_saving, reverse=True)
+    return results
+
+
+def print_advice(results, columns_by_table, dataset=DATASET_PLACEHOLDER):
+    for result in results:
+        current = result["current"]
+        print(f"\n{result['table']} ({result['queries']:,} weighted scans, {result['rows']:,} rows)")
+        note = "" if current["valid"] else f"  ✗ more than {MAX_CLUSTER_COLUMNS} cluster columns"
+        print(f"  current   PARTITION BY {current['partition'] or '-'} CLUSTER BY "
+              f"{', '.join(current['cluster']) or '-'}: {format_bytes(current['bytes'])}{note}")
+        for rank, rec in enumerate(result["recommendations"], 1):
+            print(f"  #{rank:<8} PARTITION BY {rec['partition'] or '-'} CLUSTER BY "
+                  f"{', '.join(rec['cluster']) or '-'}: {format_bytes(rec['bytes'])} ({-rec['saving']:+.0%})")
+        if not result["recommendations"]:
+            print("  no layout scans less for this workload")
+        else:
+            best = result["recommendations"][0]
+            ddl = layout_ddl(result["table"], best["partition"], best["cluster"],
+                             columns_by_table[result["table"]], dataset)
+            print("\n    " + ddl.replace("\n", "\n    "))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend PARTITION BY / CLUSTER BY from a query workload")
+    parser.add_argument("--ddl", default=DEFAULT_DDL_PATH, help="BigQuery DDL with the current layouts")
+    parser.add_argument("--workload", help="JSONL workload log (default: the local_dw.py benchmark queries)")
+    parser.add_argument("--database", help="Local DuckDB warehouse for row counts and NDVs (see local_dw.py)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows per table without --database")
+    parser.add_argument("--range-days", type=int, default=DEFAULT_RANGE_DAYS, help="Days read by a date-range filter")
+    parser.add_argument("--block-mb", type=int, default=DEFAULT_BLOCK_MB, help="Smallest prunable block per partition")
+    parser.add_argument("--allow-unpartitioned", action="store_true",
+                        help="Also consider dropping partitioning (loses partition expiry and pruning guarantees)")
+    parser.add_argument("--top", type=int, default=3, help="Alternatives per table")
+    parser.add_argument("--dataset", default=DATASET_PLACEHOLDER, help="project.dataset used in the DDL output")
+    parser.add_argument("--json", help="Write the advice to this JSON file")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+    except ImportError:
+        print("Error: pip install duckdb")
+        return
+
+    schema = load_ddl_schema(args.ddl)
+    columns_by_table = table_columns(schema)
+    usages = load_workload(args.workload, columns_by_table) if args.workload else benchmark_workload(columns_by_table)
+    print(f"{len(usages)} table scan(s) in the workload"
+          f" ({'log ' + args.workload if args.workload else 'local_dw.py benchmark queries'})")
+
+    stats = None
+    if args.database:
+        from local_dw import connect
+
+        stats = table_stats(connect(args.database), columns_by_table, usages)
+
+    results = advise(schema, usages, stats, args.top, args.rows, args.range_days, args.block_mb,
+                     args.allow_unpartitioned)
+    print_advice(results, columns_by_table, args.dataset)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
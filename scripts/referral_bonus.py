@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Referral bonus engine: fact_referral_edge -> fact_referral_bonus_tx.
+
+Each new referral pays 50 UAH to the referrer (depth 1) and 5 UAH to every
+ancestor of the referrer, at any depth (depth 2, 3, ...), with the depth
+stored as depth_key from dim_referral_depth.
+
+The referral pyramid is kept in the warehouse as referral_tree (one row per
+referred user: parent and link sequence) and loaded into dense NumPy
+arrays indexed by user_key. New edges are processed in referral order; the
+ancestors of all edges in a batch are found together by pointer jumping
+(every step advances all still-active chains at once), so the work is
+proportional to the bonus rows emitted, not to the size of the pyramid.
+A link only counts for edges processed after it (link_seq), so an edge
+never pays users who joined the chain later.
+
+A user is referred at most once: later edges for the same referred user are
+recorded as "duplicate", and edges that would close a loop as "cycle".
+
+Usage:
+    python scripts/referral_bonus.py --database netflix_dw.duckdb
+    python scripts/referral_bonus.py --database netflix_dw.duckdb --full --verify
+    python scripts/referral_bonus.py --database netflix_dw.duckdb --new-edges edges_2025_01.parquet
+    python scripts/referral_bonus.py --self-check
+
+Requires: pip install duckdb numpy
+"""
+
+import argparse
+import time
+
+EDGE_TABLE = "fact_referral_edge"
+BONUS_TABLE = "fact_referral_bonus_tx"
+TREE_TABLE = "referral_tree"
+PROCESSED_TABLE = "referral_processed_edges"
+
+DIRECT_BONUS = 50
+ANCESTOR_BONUS = 5
+DEFAULT_BATCH_SIZE = 250_000
+
+
+def create_state_tables(con):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TREE_TABLE} (
+            user_key BIGINT, parent_user_key BIGINT, link_seq BIGINT
+        )
+    """)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {PROCESSED_TABLE} (edge_id VARCHAR, status VARCHAR)")
+
+
+class ReferralTree:
+    """Dense parent/link_seq arrays indexed by user_key (-1 = no referrer)."""
+
+    def __init__(self, size=0):
+        import numpy as np
+
+        self.parent = np.full(size, -1, dtype=np.int64)
+        self.link_seq = np.zeros(size, dtype=np.int64)
+        self.last_seq = 0
+
+    def grow(self, size):
+        """Make room for user keys below `size` (capacity doubles)."""
+        import numpy as np
+
+        if size <= len(self.parent):
+            return
+        capacity = max(size, 2 * len(self.parent))
+        extra = capacity - len(self.parent)
+        self.parent = np.concatenate([self.parent, np.full(extra, -1, dtype=np.int64)])
+        self.link_seq = np.concatenate([self.link_seq, np.zeros(extra, dtype=np.int64)])
+
+    @classmethod
+    def load(cls, con):
+        tree = cls()
+        rows = con.execute(f"SELECT user_key, parent_user_key, link_seq FROM {TREE_TABLE}").fetchnumpy()
+        if len(rows["user_key"]):
+            users = rows["user_key"]
+            tree.grow(int(max(users.max(), rows["parent_user_key"].max())) + 1)
+            tree.parent[users] = rows["parent_user_key"]
+            tree.link_seq[users] = rows["link_seq"]
+            tree.last_seq = int(rows["link_seq"].max())
+        return tree
+
+    def walk(self, start, seq, stop_at=None, max_steps=None):
+        """
+        Ancestors of start[i] as of edge sequence seq[i], start[i] itself at depth 1.
+        Returns (edge index, ancestor, depth) arrays plus the edge indexes whose walk
+        reached stop_at[i] (a loop). Walks longer than max_steps raise RuntimeError.
+        """
+        import numpy as np
+
+        edge = np.arange(len(start))
+        node = np.asarray(start, dtype=np.int64)
+        edges, nodes, depths, looped = [], [], [], []
+        depth = 1
+        while len(edge):
+            if stop_at is not None:
+                hit = node == stop_at[edge]
+                if hit.any():
+                    looped.append(edge[hit])
+                    edge, node = edge[~hit], node[~hit]
+            edges.append(edge)
+            nodes.append(node)
+            depths.append(np.full(len(edge), depth, dtype=np.int64))
+
+            up = self.parent[node]
+            linked = up >= 0
+            linked[linked] = self.link_seq[node[linked]] < seq[edge[linked]]
+            edge, node = edge[linked], up[linked]
+            depth += 1
+            if max_steps is not None and depth > max_steps and len(edge):
+                if looped:
+                    break  # walking around a loop another edge closed; link() drops it and retries
+                raise RuntimeError(f"referral chain longer than {max_steps}; the tree has a loop")
+
+        empty = np.array([], dtype=np.int64)
+        looped = np.concatenate(looped) if looped else empty
+        if not edges:
+            # Nothing to walk, e.g. a batch whose edges are all duplicates
+            return empty, empty, empty, looped
+        return np.concatenate(edges), np.concatenate(nodes), np.concatenate(depths), looped
+
+    def link(self, referrer, referred, seq):
+        """
+        Attach a batch of edges (in processing order). Returns (status array, walk)
+        where status is "linked", "duplicate" or "cycle" per edge and walk is the
+        (edge, ancestor, depth) arrays for the linked edges.
+        """
+        import numpy as np
+
+        self.grow(int(max(referrer.max(), referred.max())) + 1)
+        # Users referred before this batch are never re-parented
+        unreferred = self.parent[referred] < 0
+        cycle = referrer == referred
+
+        # An acyclic chain visits every linked user at most once, plus the root
+        max_steps = int((self.parent >= 0).sum()) + len(referred) + 2
+        accepted = np.array([], dtype=np.int64)
+        while True:
+            self.parent[referred[accepted]] = -1
+            # Each user is referred once: the first edge that does not close a loop wins
+            candidates = np.flatnonzero(unreferred & ~cycle)
+            _, first = np.unique(referred[candidates], return_index=True)
+            accepted = np.sort(candidates[first])
+
+            self.parent[referred[accepted]] = referrer[accepted]
+            self.link_seq[referred[accepted]] = seq[accepted]
+            walk_edge, ancestor, depth, looped = self.walk(
+                referrer[accepted], seq[accepted], stop_at=referred[accepted], max_steps=max_steps
+            )
+            if not len(looped):
+                break
+            cycle[accepted[looped]] = True
+
+        status = np.full(len(referred), "duplicate", dtype=object)
+        status[cycle] = "cycle"
+        status[accepted] = "linked"
+        walk_edge = accepted[walk_edge]
+        self.last_seq = max(self.last_seq, int(seq.max()))
+        return status, (walk_edge, ancestor, depth)
+
+
+def depth_keys(con, max_depth):
+    """Array mapping depth -> depth_key, adding dim_referral_depth rows for new depths."""
+    import numpy as np
+
+    rows = con.execute("SELECT depth, depth_key FROM dim_referral_depth").fetchall()
+    known = dict(rows)
+    next_key = max(known.values(), default=0) + 1
+    for depth in range(1, max_depth + 1):
+        if depth not in known:
+            con.execute("INSERT INTO dim_referral_depth (depth_key, depth) VALUES (?, ?)", [next_key, depth])
+            known[depth] = next_key
+            next_key += 1
+    mapping = np.zeros(max_depth + 1, dtype=np.int64)
+    for depth, key in known.items():
+        if depth <= max_depth:
+            mapping[depth] = key
+    return mapping
+
+
+def uah_currency_key(con):
+    row = con.execute("SELECT min(currency_key) FROM dim_currency WHERE iso_currency_code = 'UAH'").fetchone()
+    return row[0]
+
+
+def process_new_edges(con, direct_bonus=DIRECT_BONUS, ancestor_bonus=ANCESTOR_BONUS, currency_key=None,
+                      batch_size=DEFAULT_BATCH_SIZE, full=False, batch_id=None):
+    """
+    Pay bonuses for every edge in fact_referral_edge not yet processed.
+    Returns {"edges", "linked", "duplicate", "cycle", "bonus_rows", "max_depth"}.
+    """
+    import numpy as np
+    from local_dw import register_arrays
+
+    create_state_tables(con)
+    if full:
+        for table in (BONUS_TABLE, TREE_TABLE, PROCESSED_TABLE):
+            con.execute(f"DELETE FROM {table}")
+    if currency_key is None:
+        currency_key = uah_currency_key(con)
+
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _new_edges AS
+        SELECT row_number() OVER (ORDER BY referral_date, edge_id) - 1 AS pos, e.*
+        FROM (
+            SELECT edge_id, referral_date, referral_date_key, referrer_user_key, referred_user_key, promotion_key
+            FROM {EDGE_TABLE}
+            ANTI JOIN {PROCESSED_TABLE} USING (edge_id)
+        ) e
+    """)
+    edges = con.execute("SELECT referrer_user_key, referred_user_key FROM _new_edges ORDER BY pos").fetchnumpy()
+    total = len(edges["referred_user_key"])
+    counts = {"edges": total, "linked": 0, "duplicate": 0, "cycle": 0, "bonus_rows": 0, "max_depth": 0}
+    if total == 0:
+        return counts
+
+    tree = ReferralTree.load(con)
+    etl_columns = {row[0] for row in con.execute(f"DESCRIBE {BONUS_TABLE}").fetchall()}
+    etl, etl_values = ("", "")
+    if "etl_batch_id" in etl_columns:
+        etl, etl_values = ", etl_inserted_ts, etl_batch_id", ", current_timestamp, ?"
+
+    for offset in range(0, total, batch_size):
+        referrer = edges["referrer_user_key"][offset:offset + batch_size].astype(np.int64)
+        referred = edges["referred_user_key"][offset:offset + batch_size].astype(np.int64)
+        seq = tree.last_seq + 1 + np.arange(len(referred), dtype=np.int64)
+
+        status, (walk_edge, beneficiary, depth) = tree.link(referrer, referred, seq)
+        keys = depth_keys(con, int(depth.max(initial=1)))
+        linked = np.flatnonzero(status == "linked")
+
+        register_arrays(con, "_bonus_rows", {
+            "pos": walk_edge + offset,
+            "beneficiary_user_key": beneficiary,
+            "depth": depth,
+            "depth_key": keys[depth],
+            "bonus_amount": np.where(depth == 1, direct_bonus, ancestor_bonus).astype(np.float64),
+        })
+        register_arrays(con, "_links", {
+            "pos": linked + offset,
+            "link_seq": seq[linked],
+        })
+        register_arrays(con, "_edge_status", {
+            "pos": np.arange(offset, offset + len(referred)),
+            "status": status.astype(str),
+        })
+
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute(f"""
+                INSERT INTO {BONUS_TABLE} (
+                    bonus_tx_id, bonus_date, bonus_date_key, beneficiary_user_key, originating_user_key,
+                    depth_key, promotion_key, currency_key, bonus_amount, bonus_count{etl}
+                )
+                SELECT e.edge_id || '-' || b.depth, e.referral_date, e.referral_date_key,
+                       b.beneficiary_user_key, e.referred_user_key, b.depth_key, e.promotion_key,
+                       ?, b.bonus_amount, 1{etl_values}
+                FROM _bonus_rows b JOIN _new_edges e USING (pos)
+            """, [currency_key] + ([batch_id] if etl else []))
+            con.execute(f"""
+                INSERT INTO {TREE_TABLE} (user_key, parent_user_key, link_seq)
+                SELECT e.referred_user_key, e.referrer_user_key, l.link_seq
+                FROM _links l JOIN _new_edges e USING (pos)
+            """)
+            con.execute(f"""
+                INSERT INTO {PROCESSED_TABLE}
+                SELECT e.edge_id, s.status FROM _edge_status s JOIN _new_edges e USING (pos)
+            """)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            for view in ("_bonus_rows", "_links", "_edge_status"):
+                con.unregister(view)
+
+        for name in ("linked", "duplicate", "cycle"):
+            counts[name] += int((status == name).sum())
+        counts["bonus_rows"] += len(walk_edge)
+        counts["max_depth"] = max(counts["max_depth"], int(depth.max(initial=0)))
+    return counts
+
+
+def verify_bonuses(con, direct_bonus=DIRECT_BONUS, ancestor_bonus=ANCESTOR_BONUS):
+    """
+    Recompute every bonus with a plain per-edge walk over the linked edges and
+    compare per-beneficiary totals with fact_referral_bonus_tx. Returns mismatches.
+    """
+    links = con.execute(f"""
+        SELECT t.user_key, t.parent_user_key FROM {TREE_TABLE} t ORDER BY t.link_seq
+    """).fetchall()
+    parent = {}
+    expected = {}
+    for referred, referrer in links:
+        parent[referred] = referrer
+        expected[referrer] = expected.get(referrer, 0) + direct_bonus
+        node = parent.get(referrer)
+        while node is not None:
+            expected[node] = expected.get(node, 0) + ancestor_bonus
+            node = parent.get(node)
+
+    actual = dict(con.execute(f"""
+        SELECT beneficiary_user_key, CAST(SUM(bonus_amount) AS BIGINT) FROM {BONUS_TABLE} GROUP BY 1
+    """).fetchall())
+    return sum(1 for user in set(expected) | set(actual) if expected.get(user) != actual.get(user))
+
+
+def self_check():
+    """
+    Replay small edge sequences through ReferralTree, one batch per list, and
+    compare statuses and bonus depths. Returns the names of failing cases.
+    """
+    import numpy as np
+
+    cases = {
+        # (batches of (referrer, referred)), expected statuses, expected depths per batch
+        "chain": ([[(1, 2), (2, 3), (3, 4)]], ["linked"] * 3, [[1, 1, 2, 1, 2, 3]]),
+        "duplicate-only batch": ([[(1, 2)], [(3, 2)]], ["linked", "duplicate"], [[1], []]),
+        "batch size 1": ([[(1, 2)], [(2, 3)], [(4, 3)], [(3, 1)]],
+                         ["linked", "linked", "duplicate", "cycle"], [[1], [1, 2], [], []]),
+        "self-referral": ([[(5, 5)]], ["cycle"], [[]]),
+        # A root gaining a referrer after its descendants were linked, one edge per run
+        "late roots": ([[(k + 1, k)] for k in range(8)] + [[(0, 100)]], ["linked"] * 9,
+                       [[1]] * 8 + [list(range(1, 10))]),
+    }
+    failures = []
+    for name, (batches, expected_status, expected_depths) in cases.items():
+        tree = ReferralTree()
+        statuses, depths = [], []
+        try:
+            for batch in batches:
+                referrer, referred = (np.array(column, dtype=np.int64) for column in zip(*batch))
+                seq = tree.last_seq + 1 + np.arange(len(referred), dtype=np.int64)
+                status, (_, _, depth) = tree.link(referrer, referred, seq)
+                statuses += status.tolist()
+                depths.append(sorted(depth.tolist()))
+        except Exception as e:
+            failures.append(f"{name}: {e!r}")
+            continue
+        if statuses != expected_status or depths != [sorted(d) for d in expected_depths]:
+            failures.append(f"{name}: got {statuses} {depths}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute transitive referral bonuses into fact_referral_bonus_tx")
+    parser.add_argument("--database", default="netflix_dw.duckdb", help="DuckDB database file (see local_dw.py)")
+    parser.add_argument("--new-edges", help="CSV/Parquet file of new fact_referral_edge rows to append first")
+    parser.add_argument("--full", action="store_true", help="Drop all bonuses and the tree, then reprocess every edge")
+    parser.add_argument("--direct-bonus", type=float, default=DIRECT_BONUS, help="UAH paid to the referrer")
+    parser.add_argument("--ancestor-bonus", type=float, default=ANCESTOR_BONUS, help="UAH paid to every ancestor")
+    parser.add_argument("--currency-key", type=int, help="currency_key for bonus rows (default: the UAH row of dim_currency)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Edges linked per pass")
+    parser.add_argument("--batch-id", help="etl_batch_id for written rows (DDL-created tables)")
+    parser.add_argument("--verify", action="store_true", help="Recheck bonus totals with a per-edge walk")
+    parser.add_argument("--self-check", action="store_true", help="Replay small edge cases in memory and exit")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+        import numpy
+    except ImportError:
+        print("Error: pip install duckdb numpy")
+        return
+
+    if args.self_check:
+        failures = self_check()
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        print(f"  {'✓' if not failures else '✗'} {len(failures)} self-check case(s) failed")
+        return
+
+    from generate_erd import SCHEMA
+    from local_dw import connect, create_schema, load_table
+
+    con = connect(args.database)
+    create_schema(con)
+
+    if args.new_edges:
+        columns = [c[0] for c in SCHEMA["facts"][EDGE_TABLE]["columns"]]
+        loaded = load_table(con, EDGE_TABLE, args.new_edges, columns)
+        print(f"Appended {loaded:,} edges from {args.new_edges}")
+
+    started = time.perf_counter()
+    result = process_new_edges(
+        con, args.direct_bonus, args.ancestor_bonus, args.currency_key,
+        batch_size=args.batch_size, full=args.full, batch_id=args.batch_id,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"{result['edges']:,} new edge(s): {result['linked']:,} linked, {result['duplicate']:,} duplicate, "
+          f"{result['cycle']:,} cycle")
+    print(f"Wrote {result['bonus_rows']:,} bonus rows (max depth {result['max_depth']}) in {elapsed:.2f}s")
+
+    if args.verify:
+        mismatches = verify_bonuses(con, args.direct_bonus, args.ancestor_bonus)
+        print(f"  {'✓' if mismatches == 0 else '✗'} {mismatches} beneficiary total(s) differ from a per-edge walk")
+
+
+if __name__ == "__main__":
+    main()
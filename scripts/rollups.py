@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Aggregate rollups over the fact tables, with a query rewriter.
+
+A rollup groups one fact by some of its columns and sums its measures,
+plus _rows (the number of fact rows per group). Group columns are written as:
+
+    content_key                 a fact column, kept as is
+    month(tx_date)              a date column truncated to day/week/month/quarter/year
+    start_time_key.day_part     dimension attributes through a foreign key: the
+                                key becomes the smallest dimension key with the
+                                same attributes, so the query's join still works
+
+Rollups are materialized as tables in the local warehouse. Refreshes are
+incremental: fact rows not yet seen (by primary key, in rollup_processed_rows)
+are aggregated and merged into the groups they touch, so the primary key
+must be unique and non-NULL (refresh stops otherwise). Rows that are updated
+or deleted in place, or keys reused after a delete, need --full.
+
+The rewriter parses a query with DuckDB (json_serialize_sql) and, in every
+SELECT that reads exactly one fact, replaces the fact with the smallest
+rollup that can answer it: every fact column the query touches must be a
+group column (truncated dates only under a date_trunc to the same or a
+coarser grain, representative keys only in their dimension join, using only
+the rolled-up attributes), and measures may only appear as SUM(measure).
+COUNT(*) becomes SUM(_rows), and SUM/COUNT of other expressions are
+weighted by _rows. MIN, MAX and DISTINCT aggregates of group columns are
+unchanged; DISTINCT aggregates of measures cannot be rewritten. Bytes
+scanned are estimated as rows x width of the referenced fact columns.
+
+Usage:
+    python scripts/rollups.py --database netflix_dw.duckdb --refresh
+    python scripts/rollups.py --database netflix_dw.duckdb --refresh --full
+    python scripts/rollups.py --database netflix_dw.duckdb --rewrite "SELECT content_key, SUM(watch_seconds) FROM fact_viewing_session GROUP BY 1"
+    python scripts/rollups.py --database netflix_dw.duckdb --benchmark
+
+Requires: pip install duckdb
+"""
+
+import argparse
+import copy
+import json
+import re
+import time
+
+from generate_erd import SCHEMA
+from dw_common import TYPE_BYTES, format_bytes, is_select_node, select_nodes, table_columns
+
+ROLLUPS = {
+    "rollup_viewing_content_daily": {
+        "fact": "fact_viewing_session",
+        "group_by": ["content_key", "start_date_key", "start_time_key.day_part"],
+        "measures": ["watch_seconds", "session_count"],
+    },
+    "rollup_viewing_audience": {
+        "fact": "fact_viewing_session",
+        "group_by": ["profile_key.age_band", "profile_key.gender", "device_key.device_type",
+                     "start_time_key.day_part", "content_key.genre"],
+        "measures": ["watch_seconds", "session_count"],
+    },
+    "rollup_content_tx_monthly": {
+        "fact": "fact_content_tx",
+        "group_by": ["month(tx_date)", "rights_holder_key", "content_key.content_type"],
+        "measures": ["gross_amount", "net_amount", "royalty_amount", "tx_count"],
+    },
+    "rollup_plan_change_monthly": {
+        "fact": "fact_plan_change",
+        "group_by": ["month(change_date)", "from_plan_key", "to_plan_key", "churn_flag"],
+        "measures": ["delta_mrr", "change_count"],
+    },
+    "rollup_subscription_plan_region": {
+        "fact": "fact_subscription_event",
+        "group_by": ["plan_key", "term_key", "geo_key.region"],
+        "measures": ["net_amount", "signup_count"],
+    },
+    "rollup_subscription_store_promotion": {
+        "fact": "fact_subscription_event",
+        "group_by": ["partner_store_key", "promotion_key.promotion_type"],
+        "measures": ["net_amount", "signup_count"],
+    },
+}
+
+DEFINITIONS_TABLE = "rollup_definitions"
+PROCESSED_TABLE = "rollup_processed_rows"
+ROW_COUNT = "_rows"
+
+# date_trunc grains a truncated column can still answer
+COARSER_GRAINS = {
+    "day": {"day", "week", "month", "quarter", "year"},
+    "week": {"week"},
+    "month": {"month", "quarter", "year"},
+    "quarter": {"quarter", "year"},
+    "year": {"year"},
+}
+# Aggregates whose result does not depend on how many fact rows a group stands for
+_UNWEIGHTED = {"min", "max", "any_value", "arbitrary", "bool_and", "bool_or"}
+
+
+class NoMatch(Exception):
+    """The query cannot be answered from this rollup."""
+
+
+class Rollup:
+    """A parsed rollup declaration."""
+
+    def __init__(self, name, fact, group_by, measures, schema=SCHEMA):
+        self.name = name
+        self.fact = fact
+        self.measures = list(measures)
+        self.columns = {c[0]: c for c in schema["facts"][fact]["columns"]}
+        self.primary_key = schema["facts"][fact]["columns"][0][0]
+        self.plain, self.grains, self.attributes = [], {}, {}
+        for spec in group_by:
+            grain = re.fullmatch(r"(\w+)\((\w+)\)", spec)
+            if grain:
+                if grain.group(1) not in COARSER_GRAINS:
+                    raise ValueError(f"{name}: unknown grain in {spec!r}")
+                self.grains[grain.group(2)] = grain.group(1)
+            elif "." in spec:
+                key, attribute = spec.split(".", 1)
+                self.attributes.setdefault(key, []).append(attribute)
+            else:
+                self.plain.append(spec)
+        for column in self.plain + list(self.grains) + list(self.attributes) + self.measures:
+            if column not in self.columns:
+                raise ValueError(f"{name}: {fact} has no column {column!r}")
+        self.dimensions = {}
+        for key in self.attributes:
+            if len(self.columns[key]) < 4:
+                raise ValueError(f"{name}: {key} is not a foreign key")
+            dimension, dim_key = self.columns[key][3].split(".")
+            self.dimensions[key] = (dimension, dim_key)
+
+    def definition(self):
+        return json.dumps({"fact": self.fact, "plain": self.plain, "grains": self.grains,
+                           "attributes": self.attributes, "measures": self.measures}, sort_keys=True)
+
+    def select_sql(self, source):
+        """Aggregate `source` (the fact or a subset of its rows) into rollup rows."""
+        from local_dw import TYPE_MAP
+
+        joins, groups = [], [f"f.{c}" for c in self.plain]
+        for column, grain in self.grains.items():
+            column_type = TYPE_MAP.get(self.columns[column][1], self.columns[column][1])
+            groups.append(f"CAST(date_trunc('{grain}', f.{column}) AS {column_type}) AS {column}")
+        for key, attributes in self.attributes.items():
+            dimension, dim_key = self.dimensions[key]
+            joins.append(f"""LEFT JOIN (
+                SELECT {dim_key}, min({dim_key}) OVER (PARTITION BY {', '.join(attributes)}) AS representative
+                FROM {dimension}) r_{key} ON r_{key}.{dim_key} = f.{key}""")
+            groups.append(f"coalesce(r_{key}.representative, f.{key}) AS {key}")
+        sums = [f"CAST(sum(f.{m}) AS {TYPE_MAP.get(self.columns[m][1], self.columns[m][1])}) AS {m}"
+                for m in self.measures]
+        return f"""
+            SELECT {', '.join(groups + sums)}, count(*) AS {ROW_COUNT}
+            FROM {source} f {' '.join(joins)}
+            GROUP BY ALL
+        """
+
+    def group_columns(self):
+        return self.plain + list(self.grains) + list(self.attributes)
+
+
+def load_rollups(declarations=None, schema=SCHEMA):
+    return [Rollup(name, schema=schema, **spec) for name, spec in (declarations or ROLLUPS).items()]
+
+
+# --- Materialization --------------------------------------------------------
+
+def create_state_tables(con):
+    con.execute(f"CREATE TABLE IF NOT EXISTS {DEFINITIONS_TABLE} (rollup VARCHAR, definition VARCHAR)")
+    con.execute(f"CREATE TABLE IF NOT EXISTS {PROCESSED_TABLE} (fact VARCHAR, row_id VARCHAR)")
+
+
+def _table_exists(con, name):
+    return con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [name]).fetchone()[0] > 0
+
+
+def key_problems(con, fact, primary_key):
+    """(NULL keys, duplicated keys) of a fact; refresh tracks processed rows by primary key."""
+    return con.execute(f"""
+        SELECT count(*) - count({primary_key}), count({primary_key}) - count(DISTINCT {primary_key})
+        FROM {fact}
+    """).fetchone()
+
+
+def refresh(con, rollups, full=False):
+    """
+    Bring every rollup up to date with its fact. Rollups that are new, changed
+    or forced with `full` are rebuilt; the rest merge only the unseen fact rows.
+    Returns {rollup: {"mode", "fact_rows" (rows aggregated), "rows", "seconds"}}.
+    Raises ValueError if a fact has NULL or duplicated primary keys.
+    """
+    create_state_tables(con)
+    definitions = dict(con.execute(f"SELECT rollup, definition FROM {DEFINITIONS_TABLE}").fetchall())
+    results = {}
+    by_fact = {}
+    for rollup in rollups:
+        by_fact.setdefault(rollup.fact, []).append(rollup)
+
+    for fact, members in by_fact.items():
+        primary_key = members[0].primary_key
+        nulls, duplicates = key_problems(con, fact, primary_key)
+        if nulls or duplicates:
+            raise ValueError(f"{fact}: {nulls:,} row(s) with NULL {primary_key} and {duplicates:,} duplicated "
+                             f"{primary_key} value(s); rollups track refreshed rows by primary key")
+        con.execute("BEGIN TRANSACTION")
+        try:
+            if full:
+                con.execute(f"DELETE FROM {PROCESSED_TABLE} WHERE fact = ?", [fact])
+            con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE _rollup_new_rows AS
+                SELECT f.* FROM {fact} f
+                ANTI JOIN (SELECT row_id FROM {PROCESSED_TABLE} WHERE fact = '{fact}') p
+                  ON p.row_id = CAST(f.{primary_key} AS VARCHAR)
+            """)
+            new_rows = con.execute("SELECT count(*) FROM _rollup_new_rows").fetchone()[0]
+            for rollup in members:
+                started = time.perf_counter()
+                rebuild = full or definitions.get(rollup.name) != rollup.definition() or not _table_exists(con, rollup.name)
+                if rebuild:
+                    con.execute(f"CREATE OR REPLACE TABLE {rollup.name} AS {rollup.select_sql(fact)}")
+                    con.execute(f"DELETE FROM {DEFINITIONS_TABLE} WHERE rollup = ?", [rollup.name])
+                    con.execute(f"INSERT INTO {DEFINITIONS_TABLE} VALUES (?, ?)", [rollup.name, rollup.definition()])
+                elif new_rows:
+                    merge_delta(con, rollup)
+                fact_rows = con.execute(f"SELECT count(*) FROM {fact}").fetchone()[0] if rebuild else new_rows
+                results[rollup.name] = {
+                    "mode": "full" if rebuild else "incremental", "fact_rows": fact_rows,
+                    "rows": con.execute(f"SELECT count(*) FROM {rollup.name}").fetchone()[0],
+                    "seconds": time.perf_counter() - started,
+                }
+            con.execute(f"INSERT INTO {PROCESSED_TABLE} SELECT '{fact}', CAST({primary_key} AS VARCHAR) FROM _rollup_new_rows")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.execute("DROP TABLE IF EXISTS _rollup_new_rows")
+    return results
+
+
+def merge_delta(con, rollup):
+    """Add the aggregated _rollup_new_rows to the rollup groups they touch."""
+    groups = rollup.group_columns()
+    same_group = " AND ".join(f"r.{c} IS NOT DISTINCT FROM d.{c}" for c in groups) or "true"
+    sums = ", ".join(f"sum({c}) AS {c}" for c in rollup.measures + [ROW_COUNT])
+    con.execute(f"CREATE OR REPLACE TEMP TABLE _rollup_delta AS {rollup.select_sql('_rollup_new_rows')}")
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_merged AS
+        SELECT {', '.join(groups + [sums])} FROM (
+            SELECT r.* FROM {rollup.name} r SEMI JOIN _rollup_delta d ON {same_group}
+            UNION ALL BY NAME
+            SELECT * FROM _rollup_delta
+        ) GROUP BY ALL
+    """)
+    con.execute(f"DELETE FROM {rollup.name} r USING _rollup_delta d WHERE {same_group}")
+    con.execute(f"INSERT INTO {rollup.name} BY NAME SELECT * FROM _rollup_merged")
+    con.execute("DROP TABLE _rollup_delta")
+    con.execute("DROP TABLE _rollup_merged")
+
+
+# --- Query rewriting --------------------------------------------------------
+
+def _base_tables(from_table, tables):
+    """[BASE_TABLE nodes] of a FROM clause made only of tables and joins (None otherwise)."""
+    if not isinstance(from_table, dict) or tables is None:
+        return None
+    if from_table.get("type") == "BASE_TABLE":
+        return tables + [from_table]
+    if from_table.get("type") == "JOIN":
+        return _base_tables(from_table["right"], _base_tables(from_table["left"], tables))
+    return None
+
+
+def _equalities(condition):
+    """(left, right) of the equality comparisons under top-level ANDs."""
+    if not isinstance(condition, dict):
+        return
+    if condition.get("type") == "CONJUNCTION_AND":
+        for child in condition["children"]:
+            yield from _equalities(child)
+    elif condition.get("type") == "COMPARE_EQUAL":
+        yield condition["left"], condition["right"]
+
+
+class QueryRewriter:
+    """Rewrites aggregate queries to read materialized rollups instead of facts."""
+
+    def __init__(self, con, rollups, schema=SCHEMA):
+        self.con = con
+        self.columns = table_columns(schema)
+        self.facts = set(schema["facts"])
+        self.rows = {name: con.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+                     for name in {r.fact for r in rollups} | {r.name for r in rollups} if _table_exists(con, name)}
+        # Smallest rollup first
+        self.rollups = sorted((r for r in rollups if r.name in self.rows), key=lambda r: self.rows[r.name])
+        self.aggregates = {r[0] for r in con.execute(
+            "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'").fetchall()}
+
+    # Expression <-> SQL through a one-column SELECT
+    def sql_of(self, expr):
+        tree = json.loads(self.con.execute("SELECT json_serialize_sql('SELECT 1')").fetchone()[0])
+        tree["statements"][0]["node"]["select_list"] = [expr]
+        return self.con.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0][len("SELECT "):]
+
+    def expr_of(self, sql, alias=""):
+        tree = json.loads(self.con.execute("SELECT json_serialize_sql(?)", [f"SELECT {sql}"]).fetchone()[0])
+        expr = tree["statements"][0]["node"]["select_list"][0]
+        expr["alias"] = alias
+        return expr
+
+    def rewrite(self, sql):
+        """(rewritten SQL or None, [{"fact", "rollup", "bytes_before", "bytes_after"}])."""
+        tree = json.loads(self.con.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        if tree.get("error"):
+            raise ValueError(tree.get("error_message", "cannot parse query"))
+        uses = []
+        # Innermost first, so an outer node's copy already holds its rewritten subqueries
+        for node in reversed(list(select_nodes(tree["statements"]))):
+            use = self.rewrite_node(node)
+            if use:
+                uses.append(use)
+        if not uses:
+            return None, []
+        return self.con.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0], uses
+
+    def rewrite_node(self, node):
+        tables = _base_tables(node.get("from_table"), [])
+        if not tables:
+            return None
+        fact_tables = [t for t in tables if t["table_name"] in self.facts]
+        if len(fact_tables) != 1:
+            return None
+        fact_table = fact_tables[0]
+        for rollup in self.rollups:
+            if rollup.fact != fact_table["table_name"]:
+                continue
+            candidate = copy.deepcopy(node)
+            try:
+                used = _NodeRewrite(self, rollup, candidate).run()
+            except NoMatch:
+                continue
+            node.clear()
+            node.update(candidate)
+            width = sum(TYPE_BYTES.get(rollup.columns[c][1], 8) for c in used if c != ROW_COUNT)
+            return {
+                "fact": rollup.fact, "rollup": rollup.name,
+                "bytes_before": self.rows[rollup.fact] * width,
+                "bytes_after": self.rows[rollup.name] * (width + TYPE_BYTES["INT64"] * (ROW_COUNT in used)),
+            }
+        return None
+
+
+class _NodeRewrite:
+    """Checks one SELECT node against one rollup and rewrites it in place (NoMatch otherwise)."""
+
+    def __init__(self, rewriter, rollup, node):
+        self.rewriter = rewriter
+        self.rollup = rollup
+        self.node = node
+        self.tables = _base_tables(node["from_table"], [])
+        self.scope = {t.get("alias") or t["table_name"]: t["table_name"] for t in self.tables}
+        self.fact_table = next(t for t in self.tables if t["table_name"] == rollup.fact)
+        self.alias = self.fact_table.get("alias") or rollup.fact
+        self.allowed = set()  # id() of column refs already checked by their context
+        self.dimension_aliases = {}  # alias joined on a representative key -> its rolled-up attributes
+        self.used = set()
+        self.has_aggregate = False
+
+    def run(self):
+        self.check_joins(self.node["from_table"])
+        for key, value in list(self.node.items()):
+            if key not in ("from_table", "cte_map"):
+                self.node[key] = self.visit(value, None)
+        if not self.has_aggregate:
+            raise NoMatch
+        self.fact_table["table_name"] = self.rollup.name
+        self.fact_table["alias"] = self.alias
+        return self.used
+
+    def resolve(self, names):
+        """(alias, table, column) of a column reference inside this node, or None."""
+        if len(names) >= 2:
+            table = self.scope.get(names[-2])
+            return (names[-2], table, names[-1]) if table else None
+        owners = [(alias, table) for alias, table in self.scope.items()
+                  if names[0] in self.rewriter.columns.get(table, {})]
+        return (owners[0][0], owners[0][1], names[0]) if owners else None
+
+    def check_joins(self, from_table):
+        if from_table.get("type") != "JOIN":
+            return
+        self.check_joins(from_table["left"])
+        self.check_joins(from_table["right"])
+        for left, right in _equalities(from_table.get("condition")):
+            for fact_side, dim_side in ((left, right), (right, left)):
+                if fact_side.get("class") != "COLUMN_REF" or dim_side.get("class") != "COLUMN_REF":
+                    continue
+                fact_ref, dim_ref = self.resolve(fact_side["column_names"]), self.resolve(dim_side["column_names"])
+                if not fact_ref or not dim_ref or fact_ref[1] != self.rollup.fact:
+                    continue
+                key = fact_ref[2]
+                if key in self.rollup.dimensions and self.rollup.dimensions[key] == (dim_ref[1], dim_ref[2]):
+                    self.allowed.update((id(fact_side), id(dim_side)))
+                    self.dimension_aliases[dim_ref[0]] = set(self.rollup.attributes[key])
+        from_table["condition"] = self.visit(from_table.get("condition"), None)
+
+    def visit(self, expr, parent):
+        if isinstance(expr, list):
+            return [self.visit(e, parent) for e in expr]
+        if not isinstance(expr, dict) or is_select_node(expr):
+            return expr
+        kind = expr.get("class")
+        if kind == "COLUMN_REF":
+            self.check_column(expr, parent)
+            return expr
+        if kind == "WINDOW":
+            raise NoMatch
+        if kind == "FUNCTION" and expr["function_name"] in self.rewriter.aggregates:
+            return self.rewrite_aggregate(expr)
+        return {key: value if key == "subquery" else self.visit(value, expr) for key, value in expr.items()}
+
+    def check_column(self, expr, parent):
+        ref = self.resolve(expr["column_names"])
+        if not ref:
+            return
+        alias, table, column = ref
+        if alias in self.dimension_aliases:
+            if column not in self.dimension_aliases[alias] and id(expr) not in self.allowed:
+                raise NoMatch
+            return
+        if table != self.rollup.fact:
+            return
+        self.used.add(column)
+        if column in self.rollup.plain or id(expr) in self.allowed:
+            return
+        if column in self.rollup.grains:
+            children = (parent or {}).get("children", [])
+            if (parent and parent.get("function_name") == "date_trunc" and len(children) == 2
+                    and children[1] is expr and children[0].get("class") == "CONSTANT"
+                    and str(children[0]["value"]["value"]).lower() in COARSER_GRAINS[self.rollup.grains[column]]):
+                return
+        raise NoMatch
+
+    def measure(self, expr):
+        if expr.get("class") != "COLUMN_REF":
+            return False
+        ref = self.resolve(expr["column_names"])
+        return bool(ref) and ref[1] == self.rollup.fact and ref[2] in self.rollup.measures
+
+    def rewrite_aggregate(self, expr):
+        self.has_aggregate = True
+        name, children = expr["function_name"], expr["children"]
+        if expr.get("filter") or expr.get("order_bys", {}).get("orders"):
+            raise NoMatch
+        if name == "count_star":
+            self.used.add(ROW_COUNT)
+            return self.rewriter.expr_of(f"sum({self.alias}.{ROW_COUNT})", expr["alias"])
+        if name == "sum" and len(children) == 1 and self.measure(children[0]):
+            # SUM(DISTINCT m) over pre-summed groups sums different values
+            if expr.get("distinct"):
+                raise NoMatch
+            self.allowed.add(id(children[0]))
+            self.visit(children[0], expr)
+            return expr
+        expr["children"] = self.visit(children, expr)
+        if expr.get("distinct") or name in _UNWEIGHTED:
+            return expr
+        self.used.add(ROW_COUNT)
+        if name == "sum" and len(children) == 1:
+            return self.rewriter.expr_of(f"sum(({self.rewriter.sql_of(children[0])}) * {self.alias}.{ROW_COUNT})", expr["alias"])
+        if name == "count" and len(children) == 1:
+            return self.rewriter.expr_of(
+                f"sum(CASE WHEN ({self.rewriter.sql_of(children[0])}) IS NOT NULL THEN {self.alias}.{ROW_COUNT} ELSE 0 END)",
+                expr["alias"])
+        raise NoMatch
+
+
+# --- CLI ----------------------------------------------------------------------
+
+def same_results(con, first_sql, second_sql):
+    """True when two queries return the same multiset of rows."""
+    differing = con.execute(f"""
+        SELECT count(*) FROM (
+            (SELECT * FROM ({first_sql}) EXCEPT ALL SELECT * FROM ({second_sql}))
+            UNION ALL
+            (SELECT * FROM ({second_sql}) EXCEPT ALL SELECT * FROM ({first_sql}))
+        )
+    """).fetchone()[0]
+    return differing == 0
+
+
+def best_time(con, sql, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        con.execute(sql).fetchall()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def print_uses(uses):
+    for use in uses:
+        saved = use["bytes_before"] - use["bytes_after"]
+        print(f"    {use['fact']} -> {use['rollup']}: {format_bytes(use['bytes_before'])} -> "
+              f"{format_bytes(use['bytes_after'])} scanned ({format_bytes(saved)} saved)")
+
+
+def benchmark(con, rewriter, queries, repeat=3):
+    """Run each query as written and rewritten; print timings, bytes saved and whether results agree."""
+    total_saved = 0
+    for name, sql in queries.items():
+        rewritten, uses = rewriter.rewrite(sql)
+        if not rewritten:
+            print(f"  - {name}: no rollup applies")
+            continue
+        original_s, rollup_s = best_time(con, sql, repeat), best_time(con, rewritten, repeat)
+        agree = same_results(con, sql, rewritten)
+        print(f"  {'✓' if agree else '✗'} {name}: {original_s * 1000:.1f} ms -> {rollup_s * 1000:.1f} ms"
+              f"{'' if agree else ' (results differ)'}")
+        print_uses(uses)
+        total_saved += sum(u["bytes_before"] - u["bytes_after"] for u in uses)
+    print(f"  Estimated bytes saved: {format_bytes(total_saved)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup tables over the facts and an aggregate query rewriter")
+    parser.add_argument("--database", default="netflix_dw.duckdb", help="DuckDB database file (see local_dw.py)")
+    parser.add_argument("--rollups", help="JSON file of rollup declarations (default: ROLLUPS)")
+    parser.add_argument("--refresh", action="store_true", help="Materialize new rollups and merge new fact rows")
+    parser.add_argument("--full", action="store_true", help="With --refresh: rebuild every rollup")
+    parser.add_argument("--rewrite", metavar="SQL", help="Print the rollup rewrite of a query")
+    parser.add_argument("--benchmark", action="store_true", help="Rewrite and time the local_dw.py benchmark queries")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query with --benchmark")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+    except ImportError:
+        print("Error: pip install duckdb")
+        return
+
+    from local_dw import BENCHMARK_QUERIES, connect, create_schema
+
+    declarations = None
+    if args.rollups:
+        with open(args.rollups) as f:
+            declarations = json.load(f)
+    rollups = load_rollups(declarations)
+
+    con = connect(args.database)
+    create_schema(con)
+
+    if args.refresh:
+        try:
+            results = refresh(con, rollups, args.full)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        for name, result in results.items():
+            print(f"  ✓ {name}: {result['mode']}, {result['fact_rows']:,} fact rows -> "
+                  f"{result['rows']:,} rollup rows ({result['seconds']:.2f}s)")
+
+    rewriter = QueryRewriter(con, rollups)
+    if args.rewrite:
+        rewritten, uses = rewriter.rewrite(args.rewrite)
+        if rewritten:
+            print(rewritten)
+            print_uses(uses)
+        else:
+            print("No rollup can answer this query")
+    if args.benchmark:
+        benchmark(con, rewriter, BENCHMARK_QUERIES, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Accumulating-snapshot merger for fact_voucher_lifecycle.
+
+One row per voucher_key, filled in as milestones arrive: sale (from the
+fact_voucher_sale stream), activation and conversion (a voucher redeemed into
+a subscription). Each run merges one batch of the three event streams:
+
+    1. The streams are reduced to one delta row per voucher; the earliest
+       event of each milestone wins, so replaying a day is harmless.
+    2. The sale_date partitions holding the touched vouchers are looked up
+       (voucher_key and sale_date only), plus the partitions of new sales.
+    3. Existing rows of touched vouchers are read from those partitions only,
+       merged with the deltas in one set-based statement, and written back
+       with a DELETE + INSERT in one transaction. Lags, flags, status and
+       date keys are recomputed for those rows alone.
+
+Vouchers activated or converted before their sale arrives get a row without
+sale_date (the NULL partition); it moves to its sale_date partition when the
+sale shows up.
+
+Usage:
+    python scripts/voucher_lifecycle.py --database netflix_dw.duckdb --date 2025-01-15 --activations act_2025_01_15.csv
+    python scripts/voucher_lifecycle.py --database netflix_dw.duckdb --sales sales.parquet --conversions conv.parquet
+    python scripts/voucher_lifecycle.py --database netflix_dw.duckdb --verify
+
+Stream files (CSV/Parquet) need these columns:
+    sales        voucher_key, voucher_code, sale_date, prospect_key, geo_key, partner_store_key, promotion_key
+    activations  voucher_key, activation_date
+    conversions  voucher_key, conversion_date, converted_subscription_id
+
+Requires: pip install duckdb
+"""
+
+import argparse
+import time
+
+LIFECYCLE_TABLE = "fact_voucher_lifecycle"
+SALE_TABLE = "fact_voucher_sale"
+EVENT_TABLE = "fact_subscription_event"
+
+# dim_status rows (status_group = 'voucher') for each milestone reached
+VOUCHER_STATUSES = ("SOLD", "ACTIVATED", "CONVERTED")
+
+SALE_COLUMNS = ["voucher_key", "voucher_code", "sale_date", "prospect_key", "geo_key", "partner_store_key", "promotion_key"]
+ACTIVATION_COLUMNS = ["voucher_key", "activation_date"]
+CONVERSION_COLUMNS = ["voucher_key", "conversion_date", "converted_subscription_id"]
+
+_DATE_KEY_SQL = "CAST(strftime({col}, '%Y%m%d') AS BIGINT)"
+
+
+def voucher_status_keys(con):
+    """{status_code: status_key} for VOUCHER_STATUSES, adding dim_status rows that are missing."""
+    rows = con.execute("""
+        SELECT status_code, status_key FROM dim_status WHERE status_group = 'voucher'
+    """).fetchall()
+    keys = dict(rows)
+    next_key = (con.execute("SELECT coalesce(max(status_key), 0) FROM dim_status").fetchone()[0] or 0) + 1
+    for code in VOUCHER_STATUSES:
+        if code not in keys:
+            con.execute("INSERT INTO dim_status (status_key, status_code, status_group) VALUES (?, ?, 'voucher')",
+                        [next_key, code])
+            keys[code] = next_key
+            next_key += 1
+    return keys
+
+
+def stage_streams(con, sales=None, activations=None, conversions=None, date=None):
+    """
+    Create temp tables _voucher_sales, _voucher_activations and
+    _voucher_conversions from stream files, or, for `date`, from that day's
+    fact_voucher_sale rows and voucher-redeeming fact_subscription_event rows.
+    Returns {stream: rows}.
+    """
+    from local_dw import file_reader_sql
+
+    def stage(name, columns, path, warehouse_sql):
+        cols = ", ".join(columns)
+        # Typed like the lifecycle columns, so CSV inference cannot change the merge's types
+        con.execute(f"CREATE OR REPLACE TEMP TABLE {name} AS SELECT {cols} FROM {LIFECYCLE_TABLE} WHERE false")
+        if path:
+            con.execute(f"INSERT INTO {name} ({cols}) SELECT {cols} FROM {file_reader_sql(path)}")
+        elif date and warehouse_sql:
+            con.execute(f"INSERT INTO {name} ({cols}) {warehouse_sql}", [date])
+        return con.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+
+    return {
+        "sales": stage("_voucher_sales", SALE_COLUMNS, sales, f"""
+            SELECT {', '.join(SALE_COLUMNS)} FROM {SALE_TABLE}
+            WHERE sale_date = CAST(? AS DATE) AND voucher_key IS NOT NULL
+        """),
+        "activations": stage("_voucher_activations", ACTIVATION_COLUMNS, activations, None),
+        "conversions": stage("_voucher_conversions", CONVERSION_COLUMNS, conversions, f"""
+            SELECT voucher_key, event_date AS conversion_date, subscription_id AS converted_subscription_id
+            FROM {EVENT_TABLE}
+            WHERE event_date = CAST(? AS DATE) AND voucher_key IS NOT NULL
+        """),
+    }
+
+
+def _lifecycle_columns(con):
+    """Lifecycle columns that exist (SCHEMA tables lack the DDL's etl_* columns)."""
+    return {row[0] for row in con.execute(f"DESCRIBE {LIFECYCLE_TABLE}").fetchall()}
+
+
+def merge_streams(con, batch_id=None):
+    """
+    Upsert the staged streams into fact_voucher_lifecycle.
+    Returns {"vouchers", "inserted", "updated", "partitions"}.
+    """
+    status = voucher_status_keys(con)
+
+    # One delta row per voucher; the earliest event of each milestone wins
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE _voucher_delta AS
+        WITH sales AS (
+            SELECT * EXCLUDE (rn) FROM (
+                SELECT *, row_number() OVER (PARTITION BY voucher_key ORDER BY sale_date, voucher_code) AS rn
+                FROM _voucher_sales WHERE voucher_key IS NOT NULL AND sale_date IS NOT NULL
+            ) WHERE rn = 1
+        ), activations AS (
+            SELECT voucher_key, min(activation_date) AS activation_date
+            FROM _voucher_activations WHERE voucher_key IS NOT NULL AND activation_date IS NOT NULL
+            GROUP BY voucher_key
+        ), conversions AS (
+            SELECT * EXCLUDE (rn) FROM (
+                SELECT *, row_number() OVER (
+                    PARTITION BY voucher_key ORDER BY conversion_date, converted_subscription_id) AS rn
+                FROM _voucher_conversions WHERE voucher_key IS NOT NULL AND conversion_date IS NOT NULL
+            ) WHERE rn = 1
+        )
+        SELECT * FROM sales
+        FULL JOIN activations USING (voucher_key)
+        FULL JOIN conversions USING (voucher_key)
+    """)
+
+    # Partitions holding touched vouchers; only voucher_key and sale_date are read here
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _voucher_existing AS
+        SELECT l.* FROM {LIFECYCLE_TABLE} l
+        WHERE (l.sale_date IN (
+                   SELECT DISTINCT sale_date FROM {LIFECYCLE_TABLE}
+                   WHERE voucher_key IN (SELECT voucher_key FROM _voucher_delta)
+               ) OR l.sale_date IS NULL)
+          AND l.voucher_key IN (SELECT voucher_key FROM _voucher_delta)
+    """)
+
+    etl, etl_values, inserted_ts = "", "", ""
+    if "etl_batch_id" in _lifecycle_columns(con):
+        etl = ", etl_inserted_ts, etl_updated_ts, etl_batch_id"
+        etl_values = ", coalesce(inserted_ts, current_timestamp), current_timestamp, ?"
+        inserted_ts = ", l.etl_inserted_ts AS inserted_ts"
+
+    # A new sale replaces the sale attributes only when it is earlier than the stored one
+    take_sale = "(d.sale_date IS NOT NULL AND (l.sale_date IS NULL OR d.sale_date < l.sale_date))"
+
+    def sale_attr(col):
+        return f"CASE WHEN {take_sale} THEN d.{col} ELSE l.{col} END"
+
+    take_conversion = "(d.conversion_date IS NOT NULL AND (l.conversion_date IS NULL OR d.conversion_date < l.conversion_date))"
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _voucher_merged AS
+        SELECT voucher_key, voucher_code, sale_date, activation_date, conversion_date,
+               prospect_key, geo_key, partner_store_key, promotion_key, converted_subscription_id,
+               CASE WHEN conversion_date IS NOT NULL THEN {status['CONVERTED']}
+                    WHEN activation_date IS NOT NULL THEN {status['ACTIVATED']}
+                    ELSE {status['SOLD']} END AS status_key,
+               date_diff('day', sale_date, activation_date) AS lag_sale_to_activation_days,
+               date_diff('day', activation_date, conversion_date) AS lag_activation_to_conversion_days,
+               activation_date IS NOT NULL AS is_activated_flag,
+               conversion_date IS NOT NULL AS is_converted_flag,
+               is_new{', inserted_ts' if etl else ''}
+        FROM (
+            SELECT d.voucher_key,
+                   coalesce({sale_attr('voucher_code')}, l.voucher_code, d.voucher_code) AS voucher_code,
+                   {sale_attr('sale_date')} AS sale_date,
+                   least(l.activation_date, d.activation_date) AS activation_date,
+                   least(l.conversion_date, d.conversion_date) AS conversion_date,
+                   {sale_attr('prospect_key')} AS prospect_key,
+                   {sale_attr('geo_key')} AS geo_key,
+                   {sale_attr('partner_store_key')} AS partner_store_key,
+                   {sale_attr('promotion_key')} AS promotion_key,
+                   CASE WHEN {take_conversion} THEN d.converted_subscription_id
+                        ELSE l.converted_subscription_id END AS converted_subscription_id,
+                   l.voucher_key IS NULL AS is_new{inserted_ts}
+            FROM _voucher_delta d
+            LEFT JOIN _voucher_existing l USING (voucher_key)
+        )
+    """)
+
+    counts = con.execute("""
+        SELECT count(*), count(*) FILTER (WHERE is_new),
+               (SELECT count(DISTINCT coalesce(sale_date, DATE '0001-01-01')) FROM (
+                   SELECT sale_date FROM _voucher_existing UNION ALL SELECT sale_date FROM _voucher_merged))
+        FROM _voucher_merged
+    """).fetchone()
+
+    insert_columns = """voucher_key, voucher_code, sale_date, sale_date_key, activation_date, activation_date_key,
+               conversion_date, conversion_date_key, prospect_key, geo_key, partner_store_key, promotion_key,
+               status_key, converted_subscription_id, lag_sale_to_activation_days,
+               lag_activation_to_conversion_days, is_activated_flag, is_converted_flag"""
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute(f"""
+            DELETE FROM {LIFECYCLE_TABLE}
+            WHERE (sale_date IN (SELECT DISTINCT sale_date FROM _voucher_existing) OR sale_date IS NULL)
+              AND voucher_key IN (SELECT voucher_key FROM _voucher_existing)
+        """)
+        con.execute(f"""
+            INSERT INTO {LIFECYCLE_TABLE} ({insert_columns}{etl})
+            SELECT voucher_key, voucher_code, sale_date, {_DATE_KEY_SQL.format(col='sale_date')},
+                   activation_date, {_DATE_KEY_SQL.format(col='activation_date')},
+                   conversion_date, {_DATE_KEY_SQL.format(col='conversion_date')},
+                   prospect_key, geo_key, partner_store_key, promotion_key,
+                   status_key, converted_subscription_id, lag_sale_to_activation_days,
+                   lag_activation_to_conversion_days, is_activated_flag, is_converted_flag{etl_values}
+            FROM _voucher_merged
+        """, [batch_id] if etl else None)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return {"vouchers": counts[0], "inserted": counts[1], "updated": counts[0] - counts[1], "partitions": counts[2]}
+
+
+def verify_lifecycle(con):
+    """Count rows with a duplicate voucher_key or derived columns that disagree with the milestone dates."""
+    return con.execute(f"""
+        SELECT
+            (SELECT count(*) - count(DISTINCT voucher_key) FROM {LIFECYCLE_TABLE})
+          + (SELECT count(*) FROM {LIFECYCLE_TABLE}
+             WHERE lag_sale_to_activation_days IS DISTINCT FROM date_diff('day', sale_date, activation_date)
+                OR lag_activation_to_conversion_days IS DISTINCT FROM date_diff('day', activation_date, conversion_date)
+                OR is_activated_flag IS DISTINCT FROM (activation_date IS NOT NULL)
+                OR is_converted_flag IS DISTINCT FROM (conversion_date IS NOT NULL)
+                OR sale_date_key IS DISTINCT FROM {_DATE_KEY_SQL.format(col='sale_date')}
+                OR activation_date_key IS DISTINCT FROM {_DATE_KEY_SQL.format(col='activation_date')}
+                OR conversion_date_key IS DISTINCT FROM {_DATE_KEY_SQL.format(col='conversion_date')})
+    """).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge voucher sale/activation/conversion streams into fact_voucher_lifecycle")
+    parser.add_argument("--database", default="netflix_dw.duckdb", help="DuckDB database file (see local_dw.py)")
+    parser.add_argument("--date", help="Take this day's sales and conversions from the warehouse (YYYY-MM-DD)")
+    parser.add_argument("--sales", help="CSV/Parquet sale events")
+    parser.add_argument("--activations", help="CSV/Parquet activation events")
+    parser.add_argument("--conversions", help="CSV/Parquet conversion events")
+    parser.add_argument("--batch-id", help="etl_batch_id for written rows (DDL-created tables)")
+    parser.add_argument("--verify", action="store_true", help="Check keys, lags, flags and date keys")
+
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+    except ImportError:
+        print("Error: pip install duckdb")
+        return
+
+    from local_dw import connect, create_schema
+
+    con = connect(args.database)
+    create_schema(con)
+
+    if args.date or args.sales or args.activations or args.conversions:
+        started = time.perf_counter()
+        staged = stage_streams(con, args.sales, args.activations, args.conversions, args.date)
+        result = merge_streams(con, batch_id=args.batch_id)
+        elapsed = time.perf_counter() - started
+        print(f"Merged {staged['sales']:,} sale(s), {staged['activations']:,} activation(s), "
+              f"{staged['conversions']:,} conversion(s) in {elapsed:.2f}s")
+        print(f"  {result['vouchers']:,} voucher(s): {result['inserted']:,} new, {result['updated']:,} updated; "
+              f"{result['partitions']:,} sale_date partition(s) rewritten")
+
+    if args.verify:
+        mismatches = verify_lifecycle(con)
+        print(f"  {'✓' if mismatches == 0 else '✗'} {mismatches} row(s) with duplicate keys or stale lags/flags")
+
+
+if __name__ == "__main__":
+    main()